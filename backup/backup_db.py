@@ -1,8 +1,148 @@
-import shutil
+"""
+Online backups of the SQLite database.
+
+The copy is made with sqlite3's backup API rather than a file copy, so it
+is always a consistent snapshot and it never holds the database for the
+whole run: pages are copied in batches with a short sleep in between,
+letting tills keep writing. A write from another connection makes SQLite
+restart the copy, so under steady traffic a paced copy might never end;
+after MAX_RESTARTS restarts the rest is copied in a single step instead
+(with WAL enabled that step does not block writers either).
+
+Every copy is checked with PRAGMA integrity_check before it is moved to
+its final name, so a finished backup file is known to be good. Copies are
+switched to the rollback journal (journal_mode=DELETE): a backup is then
+one self-contained file, with no -wal/-shm sidecars to copy along or to
+leave behind.
+"""
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
 from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+PAGES_PER_STEP = 256        # 1 MiB per batch with 4 KiB pages
+SLEEP_BETWEEN_STEPS = 0.05  # seconds the source is left alone between batches
+MAX_RESTARTS = 3
+
+
+class BackupError(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+@dataclass
+class BackupResult:
+    path: Path
+    size: int
+    pages: int
+    seconds: float
+
+
+def backup_dir():
+    return Path(getattr(settings, 'BACKUP_DIR', settings.BASE_DIR / 'backup'))
+
+
+def database_path(alias='default'):
+    db = connections[alias].settings_dict
+    if db['ENGINE'] != 'django.db.backends.sqlite3':
+        raise BackupError(f"Database '{alias}' is not SQLite; use the server's own backup tools.")
+    return Path(db['NAME'])
+
+
+def sidecars(path):
+    """The -wal and -shm files SQLite keeps next to a WAL-mode database."""
+    path = Path(path)
+    return [path.with_name(path.name + suffix) for suffix in ('-wal', '-shm')]
+
+
+def integrity_check(path):
+    """Return the problems PRAGMA integrity_check reports for `path` ([] when ok)."""
+    # opening a WAL-mode file creates -wal/-shm even when read-only
+    existing = [file for file in sidecars(path) if file.exists()]
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = [row[0] for row in con.execute("PRAGMA integrity_check")]
+    finally:
+        con.close()
+        for file in sidecars(path):
+            if file not in existing:
+                file.unlink(missing_ok=True)
+    return [] if rows == ['ok'] else rows
+
+
+def copy_database(source, destination, pages=PAGES_PER_STEP, sleep=SLEEP_BETWEEN_STEPS, progress=None):
+    """
+    Copy the live database at `source` into `destination` with the backup
+    API, `pages` pages at a time. `progress(remaining, total)` is called
+    after every batch. Returns the number of pages copied.
+    """
+    state = {'remaining': None, 'restarts': 0}
+
+    def step(status, remaining, total):
+        # the remaining count only goes up when the copy was restarted
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state['remaining'] = remaining
+        if progress:
+            progress(remaining, total)
+
+    # a read-write handle: read-only ones cannot attach to a WAL database
+    # that has no -shm file yet; the backup only ever reads from it
+    src = sqlite3.connect(f"file:{source}?mode=rw", uri=True)
+    dst = sqlite3.connect(destination)
+    try:
+        try:
+            src.backup(dst, pages=pages, progress=step, sleep=sleep)
+        except _TooManyRestarts:
+            src.backup(dst, pages=-1)
+        # the copy inherits the source's WAL mode; make it a single file
+        dst.execute("PRAGMA journal_mode=DELETE")
+        return dst.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+
+
+def backup_database(destination=None, pages=PAGES_PER_STEP, sleep=SLEEP_BETWEEN_STEPS, verify=True,
+                    progress=None, alias='default'):
+    """
+    Back up the database to `destination` (a timestamped file in
+    backup_dir() by default) and return a BackupResult. The copy is written
+    to a temporary name and only renamed once it passed the integrity
+    check; a failing copy is removed and BackupError raised.
+    """
+    source = database_path(alias)
+    if destination is None:
+        destination = backup_dir() / f'db_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.sqlite3'
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial = destination.with_name(destination.name + '.partial')
+
+    start = time.perf_counter()
+    try:
+        page_count = copy_database(source, partial, pages=pages, sleep=sleep, progress=progress)
+        if verify:
+            problems = integrity_check(partial)
+            if problems:
+                raise BackupError("Integrity check failed on the copy: " + "; ".join(problems[:10]))
+        os.replace(partial, destination)
+    finally:
+        for file in (partial, *sidecars(partial)):
+            file.unlink(missing_ok=True)
 
-def backup_database():
-    src = 'db.sqlite3'
-    dst = f'backup/db_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.sqlite3'
-    shutil.copy(src, dst)
-    print(f"Backup created: {dst}")
\ No newline at end of file
+    return BackupResult(
+        path=destination,
+        size=destination.stat().st_size,
+        pages=page_count,
+        seconds=time.perf_counter() - start,
+    )
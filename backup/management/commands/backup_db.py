@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from backup.backup_db import (
+    PAGES_PER_STEP, SLEEP_BETWEEN_STEPS, BackupError, backup_database, integrity_check,
+)
+from backup.snapshots import CODECS, create_snapshot, prune_snapshots
+
+
+class Command(BaseCommand):
+    help = "Take an online backup of the SQLite database and verify it with PRAGMA integrity_check."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Backup file to write (default: a timestamped file in BACKUP_DIR).")
+        parser.add_argument('--pages', type=int, default=PAGES_PER_STEP,
+                            help="Pages copied per step (default: %(default)s).")
+        parser.add_argument('--sleep', type=float, default=SLEEP_BETWEEN_STEPS,
+                            help="Seconds to pause between steps so writers can get in (default: %(default)s).")
+        parser.add_argument('--no-verify', action='store_true', help="Skip the integrity check of the copy.")
+        parser.add_argument('--check', metavar='FILE',
+                            help="Only run the integrity check on an existing backup file.")
+        parser.add_argument('--incremental', action='store_true',
+                            help="Store a compressed snapshot holding only the pages changed since earlier "
+                                 "snapshots, then apply the retention policy.")
+        parser.add_argument('--compression', choices=sorted(CODECS), default='gzip',
+                            help="Codec for new snapshot chunks (default: %(default)s; zstd needs zstandard).")
+        parser.add_argument('--keep-hourly', type=int, help="Override BACKUP_RETENTION['hourly'].")
+        parser.add_argument('--keep-daily', type=int, help="Override BACKUP_RETENTION['daily'].")
+        parser.add_argument('--keep-weekly', type=int, help="Override BACKUP_RETENTION['weekly'].")
+        parser.add_argument('--no-prune', action='store_true', help="Do not apply the retention policy.")
+
+    def handle(self, *args, **options):
+        if options['check']:
+            problems = integrity_check(options['check'])
+            for problem in problems[:20]:
+                self.stdout.write(problem)
+            if problems:
+                raise CommandError(f"{options['check']} failed the integrity check.")
+            self.stdout.write(self.style.SUCCESS(f"{options['check']}: ok"))
+            return
+
+        def progress(remaining, total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {total - remaining}/{total} pages")
+
+        if options['incremental']:
+            return self.snapshot(options)
+
+        try:
+            result = backup_database(
+                options['output'],
+                pages=options['pages'],
+                sleep=options['sleep'],
+                verify=not options['no_verify'],
+                progress=progress,
+            )
+        except BackupError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backup created: {result.path} ({result.pages} pages, {result.size / 1048576:.1f} MiB, "
+            f"{result.seconds:.2f}s)"
+        ))
+
+    def snapshot(self, options):
+        try:
+            manifest = create_snapshot(options['compression'], pages=options['pages'], sleep=options['sleep'])
+        except BackupError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot {manifest['id']}: {len(manifest['chunks'])} chunks, {manifest['new_chunks']} new "
+            f"({manifest['stored_bytes'] / 1048576:.2f} MiB stored for {manifest['size'] / 1048576:.1f} MiB), "
+            f"{manifest['seconds']:.2f}s"
+        ))
+        if options['no_prune']:
+            return
+        removed, removed_chunks = prune_snapshots(
+            hourly=options['keep_hourly'], daily=options['keep_daily'], weekly=options['keep_weekly'],
+        )
+        if removed or removed_chunks:
+            self.stdout.write(f"Pruned {len(removed)} snapshot(s) and {removed_chunks} unreferenced chunk(s).")
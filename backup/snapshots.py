@@ -0,0 +1,270 @@
+"""
+Incremental, compressed snapshots of the SQLite database.
+
+A snapshot is a consistent online copy (see backup_db.backup_database)
+cut into fixed-size runs of pages. Each run is stored once, compressed,
+under the SHA-256 of its contents; a JSON manifest lists the hashes that
+make up the file, plus the hash of the whole file. Pages that did not
+change since an earlier snapshot hash the same and are not stored again,
+so a snapshot only costs the runs that were written to since.
+
+Every manifest restores on its own, so pruning old snapshots is just
+deleting manifests and then the chunks no manifest refers to any more.
+
+    BACKUP_DIR/snapshots/manifests/<id>.json
+    BACKUP_DIR/snapshots/chunks/<hash[:2]>/<hash>.gz | .zst
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from django.conf import settings
+
+from .backup_db import BackupError, backup_database, backup_dir, integrity_check, sidecars
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+PAGES_PER_CHUNK = 256
+DEFAULT_RETENTION = {'hourly': 24, 'daily': 7, 'weekly': 4}
+
+CODECS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+@dataclass
+class RestoreResult:
+    snapshot: str
+    path: Path
+    size: int
+    seconds: float
+
+
+def snapshot_dir():
+    return backup_dir() / 'snapshots'
+
+
+def _manifest_dir():
+    return snapshot_dir() / 'manifests'
+
+
+def _chunk_path(digest, suffix):
+    return snapshot_dir() / 'chunks' / digest[:2] / f'{digest}{suffix}'
+
+
+def _find_chunk(digest):
+    for suffix in CODECS.values():
+        path = _chunk_path(digest, suffix)
+        if path.exists():
+            return path
+    return None
+
+
+def _compress(data, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(path):
+    data = path.read_bytes()
+    if path.suffix == '.zst':
+        if zstandard is None:
+            raise BackupError(f"{path.name} is zstd-compressed but the zstandard package is not installed.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _write_atomically(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + '.partial')
+    partial.write_bytes(data)
+    os.replace(partial, path)
+
+
+def list_snapshots():
+    """Manifests, oldest first."""
+    manifests = []
+    for path in sorted(_manifest_dir().glob('*.json')):
+        manifests.append(json.loads(path.read_text()))
+    return manifests
+
+
+def load_manifest(snapshot_id):
+    if snapshot_id == 'latest':
+        snapshots = list_snapshots()
+        if not snapshots:
+            raise BackupError("There are no snapshots yet.")
+        return snapshots[-1]
+    path = _manifest_dir() / f'{snapshot_id}.json'
+    if not path.exists():
+        raise BackupError(f"Snapshot {snapshot_id} does not exist.")
+    return json.loads(path.read_text())
+
+
+def create_snapshot(codec='gzip', pages=None, sleep=None):
+    """
+    Take an online copy and store the chunks that are not in the store yet.
+    Returns the manifest dict (with new_chunks / stored_bytes for this run).
+    """
+    if codec not in CODECS:
+        raise BackupError(f"Unknown compression {codec!r}; choose from {', '.join(CODECS)}.")
+    if codec == 'zstd' and zstandard is None:
+        raise BackupError("zstd compression needs the zstandard package; use gzip or install it.")
+
+    now = datetime.now(timezone.utc)
+    snapshot_id = now.strftime('%Y%m%dT%H%M%S%fZ')
+    copy_path = snapshot_dir() / f'{snapshot_id}.sqlite3'
+    options = {key: value for key, value in (('pages', pages), ('sleep', sleep)) if value is not None}
+    start = time.perf_counter()
+    copy = backup_database(copy_path, **options)
+
+    try:
+        with open(copy_path, 'rb') as f:
+            header = f.read(100)
+            page_size = int.from_bytes(header[16:18], 'big')
+            page_size = 65536 if page_size == 1 else page_size
+            f.seek(0)
+
+            whole = hashlib.sha256()
+            chunks, new_chunks, stored_bytes = [], 0, 0
+            while True:
+                data = f.read(page_size * PAGES_PER_CHUNK)
+                if not data:
+                    break
+                whole.update(data)
+                digest = hashlib.sha256(data).hexdigest()
+                chunks.append(digest)
+                if _find_chunk(digest) is None:
+                    packed = _compress(data, codec)
+                    _write_atomically(_chunk_path(digest, CODECS[codec]), packed)
+                    new_chunks += 1
+                    stored_bytes += len(packed)
+    finally:
+        copy_path.unlink()
+
+    manifest = {
+        'id': snapshot_id,
+        'created': now.isoformat(),
+        'codec': codec,
+        'page_size': page_size,
+        'pages': copy.pages,
+        'size': copy.size,
+        'sha256': whole.hexdigest(),
+        'pages_per_chunk': PAGES_PER_CHUNK,
+        'chunks': chunks,
+        'new_chunks': new_chunks,
+        'stored_bytes': stored_bytes,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+    _write_atomically(_manifest_dir() / f'{snapshot_id}.json', json.dumps(manifest, indent=1).encode())
+    return manifest
+
+
+def restore_snapshot(snapshot_id, destination):
+    """
+    Rebuild the database file of a snapshot at `destination`, checking
+    every chunk hash, the whole-file hash and PRAGMA integrity_check.
+    """
+    manifest = load_manifest(snapshot_id)
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial = destination.with_name(destination.name + '.partial')
+
+    start = time.perf_counter()
+    try:
+        whole = hashlib.sha256()
+        with open(partial, 'wb') as out:
+            for digest in manifest['chunks']:
+                path = _find_chunk(digest)
+                if path is None:
+                    raise BackupError(f"Chunk {digest} of snapshot {manifest['id']} is missing.")
+                data = _decompress(path)
+                if hashlib.sha256(data).hexdigest() != digest:
+                    raise BackupError(f"Chunk {digest} of snapshot {manifest['id']} is corrupt.")
+                whole.update(data)
+                out.write(data)
+        if whole.hexdigest() != manifest['sha256']:
+            raise BackupError(f"Restored file does not match the hash of snapshot {manifest['id']}.")
+        problems = integrity_check(partial)
+        if problems:
+            raise BackupError("Integrity check failed on the restored file: " + "; ".join(problems[:10]))
+        os.replace(partial, destination)
+    finally:
+        for file in (partial, *sidecars(partial)):
+            file.unlink(missing_ok=True)
+
+    return RestoreResult(
+        snapshot=manifest['id'],
+        path=destination,
+        size=destination.stat().st_size,
+        seconds=time.perf_counter() - start,
+    )
+
+
+def snapshots_to_keep(snapshots, hourly, daily, weekly):
+    """
+    Ids to keep under grandfather-father-son rotation: the newest snapshot
+    of each of the last `hourly` hours, `daily` days and `weekly` ISO weeks
+    that have one. The newest snapshot is always kept.
+    """
+    keep = set()
+    if snapshots:
+        keep.add(snapshots[-1]['id'])
+    rules = (
+        (hourly, lambda created: created.strftime('%Y%m%d%H')),
+        (daily, lambda created: created.strftime('%Y%m%d')),
+        (weekly, lambda created: created.strftime('%G%V')),
+    )
+    for limit, bucket in rules:
+        seen = set()
+        for manifest in reversed(snapshots):
+            key = bucket(datetime.fromisoformat(manifest['created']))
+            if key in seen:
+                continue
+            if len(seen) == limit:
+                break
+            seen.add(key)
+            keep.add(manifest['id'])
+    return keep
+
+
+def prune_snapshots(hourly=None, daily=None, weekly=None):
+    """
+    Apply the retention policy (BACKUP_RETENTION, overridable per call)
+    and delete chunks left without a manifest. Returns (removed snapshot
+    ids, removed chunk count).
+    """
+    policy = {**DEFAULT_RETENTION, **getattr(settings, 'BACKUP_RETENTION', {})}
+    hourly = policy['hourly'] if hourly is None else hourly
+    daily = policy['daily'] if daily is None else daily
+    weekly = policy['weekly'] if weekly is None else weekly
+
+    snapshots = list_snapshots()
+    keep = snapshots_to_keep(snapshots, hourly, daily, weekly)
+    removed = [manifest['id'] for manifest in snapshots if manifest['id'] not in keep]
+    for snapshot_id in removed:
+        (_manifest_dir() / f'{snapshot_id}.json').unlink()
+
+    referenced = set()
+    for manifest in snapshots:
+        if manifest['id'] in keep:
+            referenced.update(manifest['chunks'])
+    removed_chunks = 0
+    # chunks written within the last hour may belong to a snapshot in progress
+    cutoff = time.time() - timedelta(hours=1).total_seconds()
+    for path in (snapshot_dir() / 'chunks').glob('*/*'):
+        digest = path.name.split('.')[0]
+        if digest not in referenced and path.stat().st_mtime < cutoff:
+            path.unlink()
+            removed_chunks += 1
+    return removed, removed_chunks
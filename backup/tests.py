@@ -1,3 +1,59 @@
-from django.test import TestCase
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+
+from .backup_db import backup_database, integrity_check
+from .snapshots import create_snapshot, restore_snapshot, snapshot_dir
+
+
+class BackupFilesTests(SimpleTestCase):
+    """Backups are single files: no -wal/-shm or .partial files are left next to them."""
+
+    def setUp(self):
+        self.tmp = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.source = self.tmp / 'live' / 'db.sqlite3'
+        self.source.parent.mkdir()
+        # a live WAL database with uncheckpointed writes, like the shop's
+        self.live = sqlite3.connect(self.source)
+        self.addCleanup(self.live.close)
+        self.live.execute("PRAGMA journal_mode=WAL")
+        self.live.execute("CREATE TABLE sale (id INTEGER PRIMARY KEY, total TEXT)")
+        self.live.executemany("INSERT INTO sale (total) VALUES (?)", [(f'{i}.00',) for i in range(500)])
+        self.live.commit()
+        self.enterContext(mock.patch('backup.backup_db.database_path', return_value=self.source))
+        self.enterContext(override_settings(BACKUP_DIR=self.tmp / 'backups'))
+
+    def files(self, directory):
+        return sorted(path.relative_to(directory).as_posix() for path in directory.rglob('*') if path.is_file())
+
+    def assertSingleFile(self, path):
+        con = sqlite3.connect(path)
+        try:
+            self.assertEqual(con.execute("PRAGMA journal_mode").fetchone()[0], 'delete')
+            self.assertEqual(con.execute("SELECT count(*) FROM sale").fetchone()[0], 500)
+        finally:
+            con.close()
+
+    def test_backup_directory_holds_only_the_backup(self):
+        result = backup_database(self.tmp / 'backups' / 'db_backup.sqlite3', sleep=0)
+        self.assertEqual(self.files(self.tmp / 'backups'), ['db_backup.sqlite3'])
+        self.assertSingleFile(result.path)
+
+    def test_snapshot_and_restore_leave_no_sidecars(self):
+        manifest = create_snapshot()
+        self.assertFalse([name for name in self.files(snapshot_dir()) if not name.startswith(('chunks/', 'manifests/'))])
+
+        restored = self.tmp / 'restored' / 'db.sqlite3'
+        restore_snapshot(manifest['id'], restored)
+        self.assertEqual(self.files(restored.parent), ['db.sqlite3'])
+        self.assertSingleFile(restored)
+
+    def test_integrity_check_of_a_wal_file_cleans_up(self):
+        copy = self.tmp / 'copy.sqlite3'
+        self.live.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        copy.write_bytes(self.source.read_bytes())  # still WAL mode in its header
+        self.assertEqual(integrity_check(copy), [])
+        self.assertEqual([path.name for path in self.tmp.iterdir() if path.is_file()], ['copy.sqlite3'])
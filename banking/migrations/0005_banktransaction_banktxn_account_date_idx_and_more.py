@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0004_bankaccount_bankdetail_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['account', '-date', '-id'], name='banktxn_account_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['-date', '-id'], name='banktxn_date_id_idx'),
+        ),
+    ]
@@ -60,5 +60,11 @@ class BankTransaction(models.Model):
     date = models.DateField(default=timezone.now)
     description = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', '-date', '-id'], name='banktxn_account_date_idx'),
+            models.Index(fields=['-date', '-id'], name='banktxn_date_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.transaction_type} {self.amount} on {self.date}"
\ No newline at end of file
@@ -1,9 +1,11 @@
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, render
 from .models import Bank
 
 
-def add_bank(request):
-    return render(request, 'banking/add_bank.html')
+def add_bank(request, pk=None):
+    # also routed as update/ and view/ for an existing bank
+    bank = get_object_or_404(Bank, pk=pk) if pk is not None else None
+    return render(request, 'banking/add_bank.html', {'bank': bank})
 
 def bank_list(request):
     banks = Bank.objects.all()
@@ -91,4 +91,19 @@ class PayLedgerForm(forms.ModelForm):
             'date': forms.DateInput(attrs={'type': 'date', 'class': 'input input-md input-bordered w-full'}),
             'credit_amount': forms.NumberInput(attrs={'class': 'input input-md input-bordered w-full', 'step': '0.01', 'min': '0'}),
             'detail': forms.Textarea(attrs={'class': 'textarea textarea-bordered w-full h-24', 'placeholder': 'Optional details'}),
-        }
\ No newline at end of file
+        }
+
+
+class StatementForm(forms.Form):
+    FORMAT_CHOICES = (('csv', 'CSV'), ('xlsx', 'Excel (XLSX)'), ('pdf', 'PDF'))
+
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'input input-sm input-bordered'}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'input input-sm input-bordered'}))
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, required=False, widget=forms.Select(attrs={'class': 'select select-sm select-bordered'}))
+
+    def clean(self):
+        cleaned = super().clean()
+        start, end = cleaned.get('start'), cleaned.get('end')
+        if start and end and start > end:
+            raise forms.ValidationError("Start date must be on or before the end date.")
+        return cleaned
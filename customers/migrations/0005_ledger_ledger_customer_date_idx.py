@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0004_alter_ledger_options_remove_ledger_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ledger',
+            index=models.Index(fields=['customer', '-date', '-id'], name='ledger_customer_date_idx'),
+        ),
+    ]
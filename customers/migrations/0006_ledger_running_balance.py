@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum, Window
+
+
+def backfill_balances(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Ledger = apps.get_model('customers', 'Ledger')
+    CustomerBalance = apps.get_model('customers', 'CustomerBalance')
+
+    running = Ledger.objects.using(db).annotate(running=Window(
+        Sum(F('debit_amount') - F('credit_amount')),
+        partition_by=[F('customer_id')],
+        order_by=F('id').asc(),
+    )).values_list('id', 'running')
+    batch = []
+    for pk, balance in running.iterator(chunk_size=2000):
+        batch.append(Ledger(pk=pk, balance=balance))
+        if len(batch) == 2000:
+            Ledger.objects.using(db).bulk_update(batch, ['balance'])
+            batch = []
+    Ledger.objects.using(db).bulk_update(batch, ['balance'])
+
+    totals = Ledger.objects.using(db).values('customer_id').annotate(
+        debit=Sum('debit_amount'), credit=Sum('credit_amount')).order_by()
+    CustomerBalance.objects.using(db).bulk_create([
+        CustomerBalance(customer_id=row['customer_id'], total_debit=row['debit'],
+                        total_credit=row['credit'], balance=row['debit'] - row['credit'])
+        for row in totals
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0005_ledger_ledger_customer_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerBalance',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger_balance', serialize=False, to='customers.customer')),
+                ('total_debit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_credit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ledger',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import F, Sum, Window
+
+
+def rebalance(apps, schema_editor):
+    """Running balances were kept in id order; recompute them in (date, id) order."""
+    db = schema_editor.connection.alias
+    Ledger = apps.get_model('customers', 'Ledger')
+
+    running = Ledger.objects.using(db).annotate(running=Window(
+        Sum(F('debit_amount') - F('credit_amount')),
+        partition_by=[F('customer_id')],
+        order_by=[F('date').asc(), F('id').asc()],
+    )).values_list('id', 'running')
+    batch = []
+    for pk, balance in running.iterator(chunk_size=2000):
+        batch.append(Ledger(pk=pk, balance=balance))
+        if len(batch) == 2000:
+            Ledger.objects.using(db).bulk_update(batch, ['balance'])
+            batch = []
+    Ledger.objects.using(db).bulk_update(batch, ['balance'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0006_ledger_running_balance'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebalance, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 # Create your models here.
 class Customer(models.Model):
@@ -25,12 +28,101 @@ class Customer(models.Model):
         return self.name
     
     
+class CustomerBalance(models.Model):
+    """
+    Per-customer ledger totals, maintained incrementally by Ledger.save()
+    and the ledger post_delete signal so nothing re-aggregates history.
+    balance = total_debit - total_credit (what the customer owes).
+    """
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True,
+                                    related_name='ledger_balance')
+    total_debit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_credit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.customer} balance {self.balance}"
+
+    @classmethod
+    def for_customer(cls, customer_id):
+        """Summary row for a customer; an unsaved zero row if none exists yet."""
+        return cls.objects.filter(customer_id=customer_id).first() or cls(customer_id=customer_id)
+
+    @classmethod
+    def post(cls, customer_id, debit, credit):
+        """
+        Add debit/credit to a customer's totals and return the updated row.
+        Uses an F() update, so concurrent postings cannot lose each other.
+        Call inside a transaction.
+        """
+        updates = dict(
+            total_debit=F('total_debit') + debit,
+            total_credit=F('total_credit') + credit,
+            balance=F('balance') + debit - credit,
+        )
+        if not cls.objects.filter(customer_id=customer_id).update(**updates):
+            cls.objects.get_or_create(customer_id=customer_id)
+            cls.objects.filter(customer_id=customer_id).update(**updates)
+        return cls.objects.get(customer_id=customer_id)
+
+
 class Ledger(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="ledgers")
     date = models.DateField()
     detail = models.CharField(max_length=255)
     debit_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     credit_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # customer's balance after this entry, in (date, id) order: the order the
+    # ledger page and the statements list entries in
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', '-date', '-id'], name='ledger_customer_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.customer.name} - {self.date}"
+
+    def save(self, *args, **kwargs):
+        debit = self.debit_amount or Decimal('0')
+        credit = self.credit_amount or Decimal('0')
+        with transaction.atomic():
+            if self._state.adding:
+                # a new id sorts after every entry of its date
+                earlier = Q(date__lte=self.date)
+                later = Q(date__gt=self.date)
+            else:
+                # editing an entry: take the old amounts out and put the new ones in
+                Ledger.objects.get(pk=self.pk).unpost()
+                earlier = ~self._later()
+                later = self._later()
+            CustomerBalance.post(self.customer_id, debit, credit)
+            entries = Ledger.objects.filter(customer_id=self.customer_id).exclude(pk=self.pk)
+            previous = entries.filter(earlier).order_by('-date', '-id').values_list('balance', flat=True).first()
+            self.balance = (previous or Decimal('0')) + debit - credit
+            # usually nothing: only back-dated entries have later ones to re-post
+            entries.filter(later).update(balance=F('balance') + debit - credit)
+            super().save(*args, **kwargs)
+
+    def _later(self):
+        """Entries after this one in (date, id) order."""
+        return Q(date__gt=self.date) | Q(date=self.date, id__gt=self.pk)
+
+    def unpost(self):
+        """
+        Remove this entry's amounts from the customer's totals and from the
+        running balance of the entries after it in (date, id) order (one
+        set-based UPDATE).
+        """
+        debit = self.debit_amount or Decimal('0')
+        credit = self.credit_amount or Decimal('0')
+        # plain update, no get_or_create: this also runs while the
+        # customer itself is being deleted
+        CustomerBalance.objects.filter(customer_id=self.customer_id).update(
+            total_debit=F('total_debit') - debit,
+            total_credit=F('total_credit') - credit,
+            balance=F('balance') - debit + credit,
+        )
+        Ledger.objects.filter(self._later(), customer_id=self.customer_id).update(
+            balance=F('balance') - debit + credit)
@@ -0,0 +1,14 @@
+# customers/signals.py
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Customer, Ledger
+
+
+@receiver(post_delete, sender=Ledger)
+def ledger_deleted(sender, instance, origin=None, **kwargs):
+    # when the customer itself is deleted its balance row and all its
+    # entries go too; re-balancing them one by one would be O(n^2)
+    if isinstance(origin, Customer) or getattr(origin, 'model', None) is Customer:
+        return
+    instance.unpost()
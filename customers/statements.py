@@ -0,0 +1,53 @@
+# customers/statements.py
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from .models import Ledger
+
+STATEMENT_HEADER = ['Date', 'Detail', 'Debit', 'Credit', 'Balance']
+STATEMENT_WIDTHS = [2, 6, 2, 2, 2]
+CHUNK_SIZE = 2000
+
+
+def opening_balance(customer_id, start):
+    """Balance carried into `start`: debits minus credits of earlier entries."""
+    if start is None:
+        return Decimal('0')
+    totals = Ledger.objects.filter(customer_id=customer_id, date__lt=start).aggregate(
+        debit=Sum('debit_amount'), credit=Sum('credit_amount'),
+    )
+    return (totals['debit'] or Decimal('0')) - (totals['credit'] or Decimal('0'))
+
+
+def statement_rows(customer_id, start=None, end=None):
+    """
+    Yield (date, detail, debit, credit, balance) for a customer's ledger
+    between `start` and `end` (inclusive, either may be None), oldest first.
+
+    Entries are read with iterator(chunk_size=...) and the running balance
+    is carried along, so memory stays flat however long the history is.
+    An opening row is emitted when the range has a start and a closing
+    row with the period totals is always emitted.
+    """
+    balance = opening_balance(customer_id, start)
+    if start is not None:
+        yield start, 'Opening balance', None, None, balance
+
+    entries = Ledger.objects.filter(customer_id=customer_id)
+    if start is not None:
+        entries = entries.filter(date__gte=start)
+    if end is not None:
+        entries = entries.filter(date__lte=end)
+    entries = entries.order_by('date', 'id').values_list('date', 'detail', 'debit_amount', 'credit_amount')
+
+    total_debit = total_credit = Decimal('0')
+    for date, detail, debit, credit in entries.iterator(chunk_size=CHUNK_SIZE):
+        debit = debit or Decimal('0')
+        credit = credit or Decimal('0')
+        total_debit += debit
+        total_credit += credit
+        balance += debit - credit
+        yield date, detail, debit, credit, balance
+
+    yield end, 'Closing balance', total_debit, total_credit, balance
@@ -1,3 +1,122 @@
+import csv
+import datetime
+import io
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+
+from earthshop.imports import read_table
+
+from .models import Customer, CustomerBalance, Ledger
+from .statements import opening_balance, statement_rows
+
+DAY = datetime.date(2025, 6, 10)
+
+
+class LedgerBalanceTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Aslam')
+
+    def entry(self, days, debit=0, credit=0):
+        return Ledger.objects.create(customer=self.customer, date=DAY + datetime.timedelta(days=days),
+                                     detail='Entry', debit_amount=Decimal(debit), credit_amount=Decimal(credit))
+
+    def assertBalances(self):
+        """Every balance follows from the entries before it in (date, id) order, as the statement shows them."""
+        running, balances = Decimal('0'), []
+        for entry in Ledger.objects.filter(customer=self.customer).order_by('date', 'id'):
+            running += entry.debit_amount - entry.credit_amount
+            self.assertEqual(entry.balance, running, f"entry {entry.pk} on {entry.date}")
+            balances.append(entry.balance)
+        statement = [row[4] for row in statement_rows(self.customer.pk)][:-1]
+        self.assertEqual(statement, balances)
+        self.assertEqual(CustomerBalance.for_customer(self.customer.pk).balance, running)
+
+    def test_in_date_order(self):
+        self.entry(0, debit=100)
+        self.entry(1, credit=30)
+        self.entry(1, debit=5)
+        self.assertBalances()
+
+    def test_back_dated_entry(self):
+        self.entry(0, debit=100)
+        later = self.entry(5, credit=40)
+        back_dated = self.entry(2, debit=10)
+        self.assertBalances()
+        later.refresh_from_db()
+        self.assertEqual(back_dated.balance, Decimal('110'))
+        self.assertEqual(later.balance, Decimal('70'))
+
+    def test_back_dated_on_the_same_date(self):
+        self.entry(0, debit=100)
+        self.entry(3, credit=20)
+        self.entry(3, credit=30)
+        self.entry(0, debit=7)
+        self.assertBalances()
+
+    def test_edits_and_deletes(self):
+        first = self.entry(0, debit=100)
+        second = self.entry(4, credit=30)
+        third = self.entry(8, debit=50)
+        self.assertBalances()
+
+        second.date = DAY - datetime.timedelta(days=1)
+        second.save()
+        self.assertBalances()
+        third.debit_amount = Decimal('20')
+        third.date = DAY + datetime.timedelta(days=2)
+        third.save()
+        self.assertBalances()
+        first.delete()
+        self.assertBalances()
+        second.delete()
+        self.assertBalances()
+
+
+class StatementTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Aslam')
+        for days, debit, credit in ((0, 100, 0), (3, 0, 30), (3, 20, 0), (7, 0, 50), (9, 15, 0)):
+            Ledger.objects.create(customer=self.customer, date=DAY + datetime.timedelta(days=days), detail=f'Day {days}',
+                                  debit_amount=Decimal(debit), credit_amount=Decimal(credit))
+        Ledger.objects.create(customer=Customer.objects.create(name='Other'), date=DAY, detail='Not theirs',
+                              debit_amount=Decimal('999'), credit_amount=Decimal('0'))
+
+    def day(self, days):
+        return DAY + datetime.timedelta(days=days)
+
+    def test_whole_history(self):
+        rows = list(statement_rows(self.customer.pk))
+        self.assertEqual([row[4] for row in rows], [Decimal(v) for v in (100, 70, 90, 40, 55, 55)])
+        self.assertEqual(rows[-1], (None, 'Closing balance', Decimal('135'), Decimal('80'), Decimal('55')))
+
+    def test_period_opens_with_the_balance_carried_in(self):
+        self.assertEqual(opening_balance(self.customer.pk, self.day(3)), Decimal('100'))
+        rows = list(statement_rows(self.customer.pk, self.day(3), self.day(7)))
+        self.assertEqual(rows[0], (self.day(3), 'Opening balance', None, None, Decimal('100')))
+        self.assertEqual([row[1] for row in rows[1:-1]], ['Day 3', 'Day 3', 'Day 7'])
+        self.assertEqual(rows[-1], (self.day(7), 'Closing balance', Decimal('20'), Decimal('80'), Decimal('40')))
+
+    def test_downloads(self):
+        user = get_user_model().objects.create_superuser(username='owner', password='owner', email='owner@example.com')
+        self.client.force_login(user)
+        url = reverse('customers:statement', args=[self.customer.pk])
+
+        response = self.client.get(url, {'start': self.day(3), 'end': self.day(7)})
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="statement-{self.customer.pk}.csv"')
+        lines = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(lines[0], ['Date', 'Detail', 'Debit', 'Credit', 'Balance'])
+        self.assertEqual(lines[1], [self.day(3).isoformat(), 'Opening balance', '', '', '100.00'])
+        self.assertEqual(lines[-1][1:], ['Closing balance', '20.00', '80.00', '40.00'])
+
+        response = self.client.get(url, {'format': 'xlsx'})
+        rows = [row for _, row in read_table(io.BytesIO(b''.join(response.streaming_content)), 'statement.xlsx')]
+        self.assertEqual([row['detail'] for row in rows][-2:], ['Day 9', 'Closing balance'])
+
+        response = self.client.get(url, {'format': 'pdf'})
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
 
-# Create your tests here.
+        response = self.client.get(url, {'start': self.day(7), 'end': self.day(3)})
+        self.assertEqual(response.status_code, 400)
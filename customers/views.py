@@ -6,14 +6,19 @@ from django.shortcuts import render, get_object_or_404, redirect
 from .models import Customer
 from .forms import CustomerForm
 from django.shortcuts import render, get_object_or_404
-from .models import Customer, Ledger
-from django.db.models import Sum
+from .models import Customer, CustomerBalance, Ledger
 from decimal import Decimal
 from .forms import LedgerForm  
 from django.urls import reverse
 from django.http import HttpResponseRedirect
-from .forms import AddLedgerForm, PayLedgerForm
+from .forms import AddLedgerForm, PayLedgerForm, StatementForm
+from .statements import STATEMENT_HEADER, STATEMENT_WIDTHS, statement_rows
 from django.http import JsonResponse, HttpResponseBadRequest
+from django.views.decorators.http import require_GET
+from earthshop.exports import export_response
+from earthshop.pagination import keyset_paginate
+from earthshop.typeahead import etag_json_response, parse_limit, rows_in_order
+from search.services import search_ids
  
 
 
@@ -28,6 +33,19 @@ def customer_list(request):
         'form': form
     })
 
+@require_GET
+def customer_search(request):
+    """
+    Typeahead for the POS screen: GET ?q=<text>&limit=<n>
+    Returns [{id, name, father_name, mobile, city}], best matches first.
+    Matches on name, father name, CNIC, mobile and city.
+    """
+    term = (request.GET.get('q') or '').strip()
+    if not term:
+        return etag_json_response(request, [])
+    qs = Customer.objects.values('id', 'name', 'father_name', 'mobile', 'city')
+    return etag_json_response(request, rows_in_order(qs, search_ids('customer', term, parse_limit(request))))
+
 @require_http_methods(["GET", "POST"])
 def add_customer(request):
     """
@@ -83,35 +101,44 @@ def customer_update(request, pk):
 
 
 def customer_ledger(request, pk):
+    """ Ledger listing for a single customer. """
     customer = get_object_or_404(Customer, pk=pk)
-    # Load ledgers for this customer (pagination optional)
-    ledgers = Ledger.objects.filter(customer=customer).order_by('-date', '-id')
-
-    # totals
-    agg = ledgers.aggregate(total_debit=Sum('debit_amount'), total_credit=Sum('credit_amount'))
-    total_debit = agg.get('total_debit') or 0
-    total_credit = agg.get('total_credit') or 0
-
+    ledgers = keyset_paginate(Ledger.objects.filter(customer=customer), request)
+    # totals come from the maintained summary row, not from the history
+    summary = CustomerBalance.for_customer(customer.pk)
     return render(request, 'customers/ledger_list.html', {
         'customer': customer,
         'ledgers': ledgers,
-        'total_debit': total_debit,
-        'total_credit': total_credit,
+        'total_debit': summary.total_debit,
+        'total_credit': summary.total_credit,
+        'balance': summary.balance,
+        'statement_form': StatementForm(),
     })
 
-def customer_ledger(request, pk):
-    """ Ledger listing for a single customer. """
+
+@require_GET
+def customer_statement(request, pk):
+    """ Stream the customer's ledger statement as CSV, XLSX or PDF. """
     customer = get_object_or_404(Customer, pk=pk)
-    ledgers = Ledger.objects.filter(customer=customer).order_by('-date', '-id')
-    # compute totals
-    total_debit = ledgers.aggregate_total('debit_amount') if hasattr(ledgers, 'aggregate_total') else sum((l.debit_amount or 0) for l in ledgers)
-    total_credit = ledgers.aggregate_total('credit_amount') if hasattr(ledgers, 'aggregate_total') else sum((l.credit_amount or 0) for l in ledgers)
-    return render(request, 'customers/ledger_list.html', {
-        'customer': customer,
-        'ledgers': ledgers,
-        'total_debit': total_debit,
-        'total_credit': total_credit,
-    })
+    form = StatementForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest("; ".join(
+            f"{field}: {' '.join(errors)}" for field, errors in form.errors.items()
+        ))
+    start, end = form.cleaned_data['start'], form.cleaned_data['end']
+
+    title = f"{customer.name} — Ledger Statement"
+    if start or end:
+        title += f" ({start or '…'} to {end or '…'})"
+    return export_response(
+        form.cleaned_data['format'] or 'csv',
+        f"statement-{customer.pk}",
+        STATEMENT_HEADER,
+        statement_rows(customer.pk, start, end),
+        title=title,
+        sheet_name='Statement',
+        widths=STATEMENT_WIDTHS,
+    )
 
 
 
@@ -119,16 +146,15 @@ def customer_ledger(request, pk):
 def ledger_list(request, pk):
     customer = get_object_or_404(Customer, pk=pk)
     ledgers = Ledger.objects.filter(customer=customer).order_by('-date', '-id')
-    agg = ledgers.aggregate(total_debit=Sum('debit_amount'), total_credit=Sum('credit_amount'))
-    total_debit = agg['total_debit'] or Decimal('0.00')
-    total_credit = agg['total_credit'] or Decimal('0.00')
+    summary = CustomerBalance.for_customer(customer.pk)
     add_form = AddLedgerForm()
     pay_form = PayLedgerForm()
     return render(request, 'customers/ledger_list.html', {
         'customer': customer,
         'ledgers': ledgers,
-        'total_debit': total_debit,
-        'total_credit': total_credit,
+        'total_debit': summary.total_debit,
+        'total_credit': summary.total_credit,
+        'balance': summary.balance,
         'add_form': add_form,
         'pay_form': pay_form,
     })
@@ -151,10 +177,8 @@ def ledger_add_ajax(request, pk):
             # Return error message for client debug (safe in dev)
             return JsonResponse({'success': False, 'error': str(exc)}, status=500)
 
-        agg = Ledger.objects.filter(customer=customer).aggregate(total_debit=Sum('debit_amount'),
-                                                                 total_credit=Sum('credit_amount'))
-        total_debit = agg['total_debit'] or Decimal('0.00')
-        total_credit = agg['total_credit'] or Decimal('0.00')
+        # O(1): read the summary row updated by ledger.save()
+        summary = CustomerBalance.for_customer(customer.pk)
 
         entry = {
             'id': ledger.id,
@@ -162,12 +186,14 @@ def ledger_add_ajax(request, pk):
             'detail': ledger.detail or '',
             'debit_amount': format(ledger.debit_amount, 'f'),
             'credit_amount': format(ledger.credit_amount, 'f'),
+            'balance': format(ledger.balance, 'f'),
         }
         return JsonResponse({
             'success': True,
             'entry': entry,
-            'total_debit': format(total_debit, 'f'),
-            'total_credit': format(total_credit, 'f'),
+            'total_debit': format(summary.total_debit, 'f'),
+            'total_credit': format(summary.total_credit, 'f'),
+            'balance': format(summary.balance, 'f'),
         })
     else:
         # Return form errors as plain dict for easy display
@@ -187,10 +213,8 @@ def ledger_pay_ajax(request, pk):
         except Exception as exc:
             return JsonResponse({'success': False, 'error': str(exc)}, status=500)
 
-        agg = Ledger.objects.filter(customer=customer).aggregate(total_debit=Sum('debit_amount'),
-                                                                 total_credit=Sum('credit_amount'))
-        total_debit = agg['total_debit'] or Decimal('0.00')
-        total_credit = agg['total_credit'] or Decimal('0.00')
+        # O(1): read the summary row updated by ledger.save()
+        summary = CustomerBalance.for_customer(customer.pk)
 
         entry = {
             'id': ledger.id,
@@ -198,12 +222,14 @@ def ledger_pay_ajax(request, pk):
             'detail': ledger.detail or '',
             'debit_amount': format(ledger.debit_amount, 'f'),
             'credit_amount': format(ledger.credit_amount, 'f'),
+            'balance': format(ledger.balance, 'f'),
         }
         return JsonResponse({
             'success': True,
             'entry': entry,
-            'total_debit': format(total_debit, 'f'),
-            'total_credit': format(total_credit, 'f'),
+            'total_debit': format(summary.total_debit, 'f'),
+            'total_credit': format(summary.total_credit, 'f'),
+            'balance': format(summary.balance, 'f'),
         })
     else:
         return JsonResponse({'success': False, 'errors': form.errors}, status=400)
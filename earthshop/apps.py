@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class EarthshopConfig(AppConfig):
+    """Project-wide tooling: cross-app management commands and metrics."""
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'earthshop'
+
+    def ready(self):
+        from . import signals  # noqa: F401
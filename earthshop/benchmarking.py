@@ -0,0 +1,104 @@
+"""
+Helpers shared by the benchmark / stress management commands.
+
+Benchmarks never touch the live database: they run against a throw-away
+copy created with Django's test database machinery and destroyed afterwards.
+"""
+import os
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+import django
+from django.db import connection
+
+
+@contextmanager
+def scratch_database(on_disk=False):
+    """
+    Create a migrated scratch database for the default connection and
+    point every new connection (including worker threads) at it.
+
+    Pass on_disk=True for SQLite when several threads need to share the
+    database; the in-memory test database is per-connection otherwise.
+    """
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    tmpdir = None
+    if on_disk and connection.vendor == 'sqlite':
+        tmpdir = tempfile.mkdtemp(prefix='earthshop-bench-')
+        test_settings['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    try:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        yield connection.settings_dict['NAME']
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+        if tmpdir:
+            for name in os.listdir(tmpdir):
+                os.remove(os.path.join(tmpdir, name))
+            os.rmdir(tmpdir)
+
+
+@contextmanager
+def stopwatch(samples):
+    """Append the elapsed wall time (in milliseconds) of the block to samples."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples.append((time.perf_counter() - start) * 1000)
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(samples):
+    """Return min/median/p95/p99/max of a list of millisecond samples."""
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0], 3),
+        'median_ms': round(statistics.median(ordered), 3),
+        'p95_ms': round(percentile(ordered, 0.95), 3),
+        'p99_ms': round(percentile(ordered, 0.99), 3),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+
+def environment():
+    """What a benchmark result was measured on, for comparing saved runs."""
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'sqlite': sqlite3.sqlite_version if connection.vendor == 'sqlite' else None,
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+
+def compare(baseline, current, threshold=1.25, floor_ms=1.0):
+    """
+    Regressions of `current` against `baseline`: both are {key: summary}
+    dicts from summarize(). A key regresses when its median is more than
+    `threshold` times the baseline's; medians under `floor_ms` are noise.
+    Returns [(key, baseline median, current median, ratio)] for every
+    shared key and the list of keys that regressed.
+    """
+    rows, regressed = [], []
+    for key, summary in current.items():
+        if key not in baseline:
+            continue
+        before, after = baseline[key]['median_ms'], summary['median_ms']
+        ratio = after / before if before else float('inf')
+        rows.append((key, before, after, ratio))
+        if ratio > threshold and max(before, after) >= floor_ms:
+            regressed.append(key)
+    return rows, regressed
@@ -0,0 +1,339 @@
+"""
+Synthetic shop data for benchmarks and local development.
+
+generate() writes a consistent dataset of a given size with bulk_create():
+categories, products, stock-ins, customers and their ledgers, invoices
+with items, stock-outs and installments, banks with detail rows, bank
+accounts with transactions and expenses, spread over `days` of history.
+
+bulk_create() skips save() and the post_save handlers, so everything
+they maintain is worked out while the rows are planned and written with
+them:
+
+  * StockIn totals (products.pricing) and remaining_quantity, and the
+    cost of every stock-out and invoice line, from a products.costing
+    replay of the planned movements;
+  * Product.on_hand: received minus sold, never negative;
+  * Ledger.balance and CustomerBalance, in (date, id) order;
+  * Invoice.installments_paid, BankAccount.current_balance;
+  * DailyLog: recomputed from history for the generated dates.
+
+The search index is kept by its SQLite triggers. Sizes come from
+Volumes.for_rows(), which splits a total row count across the tables in
+the proportions of a shop's history; every table can be overridden.
+"""
+import datetime
+import random
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from banking.models import Bank, BankAccount, BankDetail, BankTransaction
+from customers.models import Customer, CustomerBalance, Ledger
+from expenses.models import Expense, ExpenseCategory
+from logs.models import DailyLog
+from products.costing import cost_method, replay
+from products.models import Category, Product, StockIn, StockOut
+from products.pricing import money, stockin_totals
+from sales.models import Invoice, InvoiceInstallment, InvoiceItem
+
+BATCH_SIZE = 5000
+DAYS = 365
+LINES_PER_INVOICE = (1, 4)
+
+CATEGORY_NAMES = ['Tiles', 'Sanitary', 'Paint', 'Hardware', 'Electrical', 'Plumbing', 'Cement', 'Steel',
+                  'Wood', 'Glass', 'Tools', 'Lighting']
+PRODUCT_WORDS = (['Premium', 'Standard', 'Heavy duty', 'Classic', 'Matte', 'Gloss', 'Eco', 'Pro'],
+                 ['floor tile', 'wall tile', 'basin', 'faucet', 'pipe', 'elbow', 'valve', 'cable', 'switch',
+                  'bulb', 'emulsion', 'primer', 'hinge', 'lock', 'bolt', 'sheet', 'bag', 'rod', 'panel'])
+FIRST_NAMES = ['Ali', 'Ahmed', 'Usman', 'Bilal', 'Hamza', 'Imran', 'Kashif', 'Nadeem', 'Sana', 'Ayesha',
+               'Fatima', 'Zainab', 'Hira', 'Omar', 'Tariq', 'Waqas', 'Faisal', 'Rizwan', 'Asma', 'Nida']
+LAST_NAMES = ['Khan', 'Malik', 'Butt', 'Sheikh', 'Qureshi', 'Chaudhry', 'Raza', 'Hussain', 'Iqbal', 'Javed']
+CITIES = ['Lahore', 'Karachi', 'Islamabad', 'Faisalabad', 'Multan', 'Sialkot', 'Gujranwala', 'Peshawar']
+EXPENSE_CATEGORIES = ['Rent', 'Utilities', 'Salaries', 'Transport', 'Maintenance', 'Stationery', 'Miscellaneous']
+
+
+@dataclass
+class Volumes:
+    categories: int = 10
+    products: int = 200
+    stockins: int = 600
+    customers: int = 100
+    invoices: int = 1250
+    installments: int = 500
+    ledgers: int = 500
+    banks: int = 2
+    bank_details: int = 200
+    bank_accounts: int = 3
+    bank_transactions: int = 200
+    expenses: int = 200
+
+    @classmethod
+    def for_rows(cls, rows):
+        """
+        Volumes adding up to about `rows` rows. Invoices carry 2.5 items
+        and 2.5 stock-outs on average, so they make up most of the total.
+        """
+        return cls(
+            categories=max(3, rows // 5000),
+            products=max(10, rows // 50),
+            stockins=max(10, rows * 3 // 50),
+            customers=max(5, rows // 100),
+            invoices=max(1, rows // 8),
+            installments=rows // 20,
+            ledgers=rows // 20,
+            banks=max(1, rows // 20000),
+            bank_details=rows // 50,
+            bank_accounts=3,
+            bank_transactions=rows // 50,
+            expenses=rows // 50,
+        )
+
+
+@dataclass
+class Generated:
+    counts: dict
+    seconds: float
+
+
+def generate(volumes, seed=0, days=DAYS, batch_size=BATCH_SIZE, today=None):
+    """Write a dataset of `volumes` in one transaction; returns Generated."""
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    today = today or timezone.localdate()
+    first_day = today - datetime.timedelta(days=days - 1)
+
+    def day():
+        return first_day + datetime.timedelta(days=rng.randrange(days))
+
+    def amount(low, high):
+        return Decimal(rng.randrange(low * 100, high * 100 + 1)) / 100
+
+    counts = {}
+
+    def write(model, rows):
+        model.objects.bulk_create(rows, batch_size=batch_size)
+        counts[model._meta.label] = counts.get(model._meta.label, 0) + len(rows)
+        return rows
+
+    with transaction.atomic():
+        categories = write(Category, [
+            Category(name=_numbered(CATEGORY_NAMES, i), date=first_day) for i in range(volumes.categories)
+        ])
+        products = [
+            Product(category=rng.choice(categories), buying_price=amount(50, 5000), date=first_day,
+                    name=f"{rng.choice(PRODUCT_WORDS[0])} {rng.choice(PRODUCT_WORDS[1])} {i + 1}")
+            for i in range(volumes.products)
+        ]
+        customers = write(Customer, [
+            Customer(name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                     father_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                     cnic=f"{rng.randrange(10000, 99999)}-{rng.randrange(10 ** 6, 10 ** 7)}-{rng.randrange(10)}",
+                     mobile=f"03{rng.randrange(10 ** 8, 10 ** 9)}", city=rng.choice(CITIES), date=day())
+            for _ in range(volumes.customers)
+        ])
+        banks = write(Bank, [
+            Bank(name=f"{rng.choice(['National', 'Habib', 'Allied', 'Meezan'])} Bank {i + 1}",
+                 branch=rng.choice(CITIES)) for i in range(volumes.banks)
+        ])
+
+        # sales first: stock is then received to cover them
+        selling = {}
+        invoices, lines, sold = [], [], {}
+        for _ in range(volumes.invoices):
+            basket = rng.sample(range(len(products)), min(len(products), rng.randint(*LINES_PER_INVOICE)))
+            date = day()
+            invoice_lines = []
+            for index in basket:
+                price = selling.setdefault(index, money(products[index].buying_price * Decimal(rng.choice(
+                    ('1.10', '1.20', '1.30', '1.40')))))
+                qty = rng.randint(1, 5)
+                sold[index] = sold.get(index, 0) + qty
+                invoice_lines.append((index, qty, price))
+            sub_total = sum(qty * price for _, qty, price in invoice_lines)
+            discount = money(sub_total * Decimal(rng.choice(('0', '0', '0', '0.02', '0.05'))))
+            grand_total = sub_total - discount
+            payment_type = rng.choice((Invoice.PAYMENT_CASH,) * 6 + (Invoice.PAYMENT_INSTALLMENT,) * 3
+                                      + (Invoice.PAYMENT_CHECK,))
+            paid = grand_total
+            if payment_type == Invoice.PAYMENT_INSTALLMENT:
+                paid = money(grand_total * Decimal(rng.choice(('0', '0.1', '0.2', '0.25'))))
+            # credit sales always have a customer, half the cash sales too
+            named = payment_type != Invoice.PAYMENT_CASH or rng.random() < 0.5
+            invoices.append(Invoice(
+                customer=rng.choice(customers) if customers and named else None,
+                bank_details=rng.choice(banks) if payment_type == Invoice.PAYMENT_CHECK and banks else None,
+                payment_type=payment_type, total_quantity=sum(qty for _, qty, _ in invoice_lines),
+                sub_total=sub_total, discount=discount, grand_total=grand_total,
+                paid_amount=paid, remaining_payment=grand_total - paid,
+                cash_payment=paid if payment_type == Invoice.PAYMENT_CASH else 0, date=date,
+            ))
+            lines.append(invoice_lines)
+
+        stockins = _plan_stockins(rng, products, sold, volumes.stockins, first_day, day)
+        # planned indexes stand in for primary keys in the replay
+        remaining, costs = replay(
+            [(i, product_index, stockin.date, stockin.stock_quantity, stockin.total_buying_amount)
+             for i, (product_index, stockin) in enumerate(stockins)],
+            [(i, product_index, invoices[invoice_index].date, qty)
+             for i, (invoice_index, product_index, qty, _) in enumerate(_flatten(lines))],
+            {index: product.buying_price for index, product in enumerate(products)},
+            method=cost_method(),
+        )
+
+        received = {}
+        for product_index, stockin in stockins:
+            received[product_index] = received.get(product_index, 0) + int(stockin.stock_quantity)
+        for index, product in enumerate(products):
+            product.on_hand = received.get(index, 0) - sold.get(index, 0)
+        write(Product, products)
+        for i, (product_index, stockin) in enumerate(stockins):
+            stockin.product, stockin.remaining_quantity = products[product_index], remaining[i]
+        write(StockIn, [stockin for _, stockin in stockins])
+
+        installments = _plan_installments(rng, invoices, volumes.installments, today)
+        write(Invoice, invoices)
+        items, stockouts = [], []
+        for i, (invoice_index, product_index, qty, price) in enumerate(_flatten(lines)):
+            invoice, product = invoices[invoice_index], products[product_index]
+            items.append(InvoiceItem(invoice=invoice, item=product, quantity=qty, price=price,
+                                     total=qty * price, cost=costs[i]))
+            stockouts.append(StockOut(product=product, stock_out_quantity=qty, invoice=invoice,
+                                      date=invoice.date, cost=costs[i]))
+        write(InvoiceItem, items)
+        write(StockOut, stockouts)
+        write(InvoiceInstallment, installments)
+
+        write(Ledger, _plan_ledgers(rng, customers, volumes.ledgers, day, amount, counts))
+        write(BankDetail, [
+            BankDetail(bank=rng.choice(banks), name=rng.choice(['Deposit', 'Withdrawal', 'Cheque', 'Transfer']),
+                       **{rng.choice(('debit', 'credit')): amount(100, 50000)})
+            for _ in range(volumes.bank_details if banks else 0)
+        ])
+        accounts = [BankAccount(name=f"Account {i + 1}", account_number=f"GEN-{seed}-{i + 1}-{rng.randrange(10 ** 9)}")
+                    for i in range(volumes.bank_accounts)]
+        transactions = [
+            BankTransaction(account=rng.choice(accounts), transaction_type=rng.choice(('IN', 'IN', 'OUT')),
+                            amount=amount(100, 50000), date=day())
+            for _ in range(volumes.bank_transactions if accounts else 0)
+        ]
+        for account in accounts:
+            account.current_balance = sum(
+                (t.amount if t.transaction_type == 'IN' else -t.amount) for t in transactions if t.account is account)
+        write(BankAccount, accounts)
+        write(BankTransaction, transactions)
+
+        expense_categories = write(ExpenseCategory, [ExpenseCategory(name=name) for name in EXPENSE_CATEGORIES])
+        write(Expense, [
+            Expense(category=rng.choice(expense_categories), description=f"Expense {i + 1}",
+                    amount=amount(100, 20000), date=day(), payment_method=rng.choice(('cash', 'bank')))
+            for i in range(volumes.expenses)
+        ])
+
+        _refresh_daily_logs({first_day + datetime.timedelta(days=n) for n in range(days)})
+    return Generated(counts, time.perf_counter() - start)
+
+
+def _numbered(names, i):
+    name = names[i % len(names)]
+    return name if i < len(names) else f"{name} {i // len(names) + 1}"
+
+
+def _flatten(lines):
+    """(invoice index, product index, qty, price) for every planned line, in write order."""
+    return [(invoice_index, *line) for invoice_index, invoice_lines in enumerate(lines) for line in invoice_lines]
+
+
+def _plan_stockins(rng, products, sold, count, first_day, day):
+    """
+    (product index, unsaved StockIn) pairs covering every sale
+    plus some stock left over. Every product gets a batch on the first
+    day; the remaining batches are spread over the history.
+    """
+    per_product = [1] * len(products)
+    for _ in range(max(0, count - len(products))):
+        per_product[rng.randrange(len(products))] += 1
+
+    stockins = []
+    for index, product in enumerate(products):
+        total = sold.get(index, 0) + rng.randint(5, 50)
+        batches = per_product[index]
+        sizes = [total // batches] * batches
+        sizes[0] += total - sum(sizes)
+        for n, quantity in enumerate(sizes):
+            buying = money(product.buying_price * Decimal(rng.choice(('0.95', '1.00', '1.00', '1.05'))))
+            stockin = StockIn(buying_price_item=buying,
+                              buying_percent=Decimal(rng.choice(('0', '0', '2.50', '5.00'))),
+                              stock_quantity=Decimal(quantity), selling_price_item=money(buying * Decimal('1.25')),
+                              date=first_day if n == 0 else day())
+            stockin.total_buying_amount, stockin.total_selling_amount = stockin_totals(
+                stockin.buying_price_item, stockin.buying_percent, stockin.stock_quantity, stockin.selling_price_item)
+            stockins.append((index, stockin))
+    return stockins
+
+
+def _plan_installments(rng, invoices, count, today):
+    """
+    The advance payment commit_invoice() records for installment sales,
+    then up to `count` later payments, none past the invoice total.
+    Sets installments_paid on the invoices.
+    """
+    on_credit = [invoice for invoice in invoices if invoice.payment_type == Invoice.PAYMENT_INSTALLMENT]
+    installments = [
+        InvoiceInstallment(invoice=invoice, paid_amount=invoice.paid_amount, description='Advance Payment',
+                           date=invoice.date)
+        for invoice in on_credit if invoice.paid_amount > 0
+    ]
+    for installment in installments:
+        installment.invoice.installments_paid = installment.paid_amount
+    for _ in range(max(0, count - len(installments)) if on_credit else 0):
+        invoice = rng.choice(on_credit)
+        due = invoice.grand_total - invoice.paid_amount - invoice.installments_paid
+        if due <= 0:
+            continue
+        paid = min(due, money(invoice.grand_total * Decimal(rng.choice(('0.1', '0.2', '0.25')))))
+        invoice.installments_paid += paid
+        date = min(today, invoice.date + datetime.timedelta(days=rng.randint(7, 90)))
+        installments.append(InvoiceInstallment(invoice=invoice, paid_amount=paid, description='Installment', date=date))
+    return installments
+
+
+def _plan_ledgers(rng, customers, count, day, amount, counts):
+    """
+    Ledger rows in date order with their running balance, and the
+    CustomerBalance totals they add up to (written here).
+    """
+    if not customers:
+        return []
+    rows = sorted(((day(), rng.choice(customers), rng.random() < 0.6) for _ in range(count)), key=lambda row: row[0])
+    balances, ledgers = {}, []
+    for date, customer, is_debit in rows:
+        debit, credit = (amount(500, 50000), Decimal('0')) if is_debit else (Decimal('0'), amount(500, 30000))
+        totals = balances.setdefault(customer.pk, [Decimal('0'), Decimal('0')])
+        totals[0] += debit
+        totals[1] += credit
+        ledgers.append(Ledger(customer=customer, date=date, detail='Goods on credit' if is_debit else 'Payment received',
+                              debit_amount=debit, credit_amount=credit, balance=totals[0] - totals[1]))
+    CustomerBalance.objects.bulk_create([
+        CustomerBalance(customer_id=pk, total_debit=debit, total_credit=credit, balance=debit - credit)
+        for pk, (debit, credit) in balances.items()
+    ], batch_size=BATCH_SIZE)
+    counts[CustomerBalance._meta.label] = len(balances)
+    return ledgers
+
+
+def _refresh_daily_logs(dates):
+    """Recompute the DailyLog rows of `dates` from history (bulk_create skipped the signals)."""
+    totals = {date: row for date, row in DailyLog.totals_from_history().items() if date in dates}
+    existing = DailyLog.objects.in_bulk(list(totals), field_name='date')
+    to_update = []
+    for date, log in existing.items():
+        for column, value in totals[date].items():
+            setattr(log, column, value)
+        to_update.append(log)
+    DailyLog.objects.bulk_update(to_update, DailyLog.TOTALS, batch_size=500)
+    DailyLog.objects.bulk_create([DailyLog(date=date, **row) for date, row in totals.items() if date not in existing],
+                                 batch_size=500)
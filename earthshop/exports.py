@@ -0,0 +1,281 @@
+"""
+Streaming writers for tabular exports (CSV, XLSX, PDF).
+
+Each writer takes a header and an iterable of rows and yields the file in
+chunks, so a StreamingHttpResponse can send it while the rows are still
+being read from the database. Only the current chunk is held in memory,
+whatever the number of rows.
+
+XLSX and PDF are written by hand (a minimal workbook with inline strings,
+a plain Helvetica table) so no extra dependency is needed.
+"""
+import csv
+import datetime
+import re
+import zipfile
+import zlib
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+
+ROWS_PER_CHUNK = 500
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, Decimal):
+        return f"{value:.2f}"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+# ---------------------------------------------------------------- CSV
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_cell_text(value) for value in row])
+
+
+# ---------------------------------------------------------------- XLSX
+
+_XLSX_STATIC = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+# characters XML 1.0 does not allow, even escaped
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _ChunkBuffer:
+    """Write-only, non-seekable sink; zipfile falls back to data descriptors."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_XML_INVALID.sub('', _cell_text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(row):
+    return ('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>').encode()
+
+
+def stream_xlsx(header, rows, sheet_name='Sheet1'):
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, body in _XLSX_STATIC.items():
+            archive.writestr(name, body)
+        sheet_name = escape(_XML_INVALID.sub('', sheet_name))[:31]
+        archive.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(name=sheet_name))
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            sheet.write(_xlsx_row(header))
+            for count, row in enumerate(rows, 1):
+                sheet.write(_xlsx_row(row))
+                if count % ROWS_PER_CHUNK == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+# ---------------------------------------------------------------- PDF
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842    # A4 portrait, in points
+MARGIN = 40
+FONT_SIZE = 9
+LINE_HEIGHT = 13
+
+# objects 1-4 are fixed; pages are numbered from 5 as they are written
+_CATALOG, _PAGES, _FONT, _FONT_BOLD = 1, 2, 3, 4
+
+
+def _pdf_text(value):
+    text = _cell_text(value).encode('cp1252', 'replace')
+    return text.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+class _PdfWriter:
+    """Tracks byte offsets of the objects written so far, for the xref table."""
+
+    def __init__(self):
+        self.position = 0
+        self.offsets = {}
+
+    def chunk(self, data):
+        self.position += len(data)
+        return data
+
+    def obj(self, number, body):
+        self.offsets[number] = self.position
+        return self.chunk(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+
+def stream_pdf(header, rows, title='', widths=None):
+    """
+    Render rows as a paginated table. `widths` are relative column widths
+    (equal by default); cell text is clipped to its column.
+    """
+    widths = widths or [1] * len(header)
+    usable = PAGE_WIDTH - 2 * MARGIN
+    scale = usable / sum(widths)
+    columns, x = [], MARGIN
+    for width in widths:
+        # Helvetica averages roughly half an em per character
+        columns.append((x, int(width * scale / (FONT_SIZE * 0.5))))
+        x += width * scale
+    per_page = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT - 3
+
+    pdf = _PdfWriter()
+    yield pdf.chunk(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    yield pdf.obj(_CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % _PAGES)
+    yield pdf.obj(_FONT, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+    yield pdf.obj(_FONT_BOLD, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+
+    pages = []
+
+    def line(font, y, cells):
+        ops = []
+        for (x, limit), value in zip(columns, cells):
+            ops.append(b'BT /%s %d Tf %.1f %d Td (%s) Tj ET' % (
+                font, FONT_SIZE, x, y, _pdf_text(_cell_text(value)[:limit])))
+        return b'\n'.join(ops)
+
+    def page(lines):
+        number = _FONT_BOLD + 1 + 2 * len(pages)
+        y = PAGE_HEIGHT - MARGIN
+        ops = []
+        if title:
+            ops.append(b'BT /F2 %d Tf %d %d Td (%s) Tj ET' % (FONT_SIZE + 2, MARGIN, y, _pdf_text(title)))
+        ops.append(b'BT /F1 %d Tf %d %d Td (Page %d) Tj ET' % (
+            FONT_SIZE, PAGE_WIDTH - MARGIN - 40, y, len(pages) + 1))
+        y -= 2 * LINE_HEIGHT
+        ops.append(line(b'F2', y, header))
+        for cells in lines:
+            y -= LINE_HEIGHT
+            ops.append(line(b'F1', y, cells))
+        content = zlib.compress(b'\n'.join(ops))
+        pages.append(number + 1)
+        return pdf.obj(number, b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content)
+                       + content + b'\nendstream') + pdf.obj(number + 1, (
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> >>'
+        ) % (_PAGES, PAGE_WIDTH, PAGE_HEIGHT, number, _FONT, _FONT_BOLD))
+
+    lines = []
+    for row in rows:
+        lines.append(row)
+        if len(lines) == per_page:
+            yield page(lines)
+            lines = []
+    if lines or not pages:
+        yield page(lines)
+
+    kids = b' '.join(b'%d 0 R' % number for number in pages)
+    yield pdf.obj(_PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(pages)))
+
+    size = max(pdf.offsets) + 1
+    xref = [b'xref\n0 %d\n' % size, b'0000000000 65535 f \n']
+    xref += [b'%010d 00000 n \n' % pdf.offsets[number] for number in range(1, size)]
+    start = pdf.position
+    yield b''.join(xref) + b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+        size, _CATALOG, start)
+
+
+# ---------------------------------------------------------------- responses
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', stream_csv),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', stream_xlsx),
+    'pdf': ('application/pdf', stream_pdf),
+}
+
+
+def export_response(fmt, filename, header, rows, **options):
+    """
+    StreamingHttpResponse with `rows` rendered as `fmt` ('csv', 'xlsx' or
+    'pdf'). Extra options go to the writer (sheet_name, title, widths)
+    and are dropped where a format has no use for them.
+    """
+    content_type, writer = EXPORT_FORMATS[fmt]
+    if fmt == 'csv':
+        options = {}
+    elif fmt == 'xlsx':
+        options = {key: value for key, value in options.items() if key == 'sheet_name'}
+    else:
+        options.pop('sheet_name', None)
+    response = StreamingHttpResponse(writer(header, rows, **options), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
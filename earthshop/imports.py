@@ -0,0 +1,147 @@
+"""
+Streaming readers for tabular imports (CSV, XLSX).
+
+read_table() yields one {header: text} dict per data row, reading the
+file as it goes, so an import can validate and write rows in batches
+without holding the whole file in memory.
+
+XLSX is read with zipfile and iterparse (first worksheet, shared and
+inline strings), the counterpart of the hand-written writer in
+earthshop.exports, so no extra dependency is needed.
+"""
+import csv
+import io
+import posixpath
+import re
+import zipfile
+from contextlib import closing
+from xml.etree.ElementTree import iterparse
+
+IMPORT_FORMATS = ('csv', 'xlsx')
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_COLUMN = re.compile(r'[A-Z]+')
+
+
+class ImportFormatError(ValueError):
+    """The file cannot be read as a table at all (as opposed to a bad row)."""
+
+
+def import_format(filename):
+    extension = posixpath.splitext(filename or '')[1].lower().lstrip('.')
+    if extension not in IMPORT_FORMATS:
+        raise ImportFormatError(f"Unsupported file type {extension or '(none)'!r}; use {' or '.join(IMPORT_FORMATS)}.")
+    return extension
+
+
+def read_table(file, filename):
+    """
+    Yield (line_number, {header: value}) for each non-empty data row of a
+    CSV or XLSX file. Headers are lower-cased and stripped; line numbers
+    count the header as line 1, as a spreadsheet shows them.
+    """
+    rows = _csv_rows(file) if import_format(filename) == 'csv' else _xlsx_rows(file)
+    header = None
+    # closed here rather than whenever it is collected, so the file is
+    # released as soon as the caller stops reading
+    with closing(rows):
+        for line_number, values in rows:
+            if header is None:
+                header = [(value or '').strip().lower() for value in values]
+                if not any(header):
+                    raise ImportFormatError("The first row must contain the column names.")
+                continue
+            values = [(value or '').strip() for value in values]
+            if not any(values):
+                continue
+            yield line_number, dict(zip(header, values + [''] * (len(header) - len(values))))
+    if header is None:
+        raise ImportFormatError("The file is empty.")
+
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        # sniff ; or , from the header line (spreadsheets export either)
+        first = text.readline()
+        dialect = csv.Sniffer().sniff(first, delimiters=',;\t') if first.strip() else csv.excel
+        for line_number, values in enumerate(csv.reader(_chain(first, text), dialect), 1):
+            yield line_number, values
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise ImportFormatError(f"Cannot read the CSV file: {exc}") from exc
+    finally:
+        # hand the file back without closing it, unless the caller already has
+        if not text.closed:
+            text.detach()
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def _xlsx_rows(file):
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile as exc:
+        raise ImportFormatError("This is not an XLSX workbook.") from exc
+    with archive:
+        strings = _shared_strings(archive)
+        with archive.open(_first_sheet(archive)) as sheet:
+            for _, element in iterparse(sheet):
+                if element.tag != _NS + 'row':
+                    continue
+                values = []
+                for cell in element.iter(_NS + 'c'):
+                    reference = cell.get('r')
+                    if reference:
+                        # cells may be sparse: "A2", "D2" skip B and C
+                        index = _column_index(_COLUMN.match(reference).group())
+                        values.extend([''] * (index - len(values)))
+                    values.append(_cell_value(cell, strings))
+                yield int(element.get('r') or 0), values
+                element.clear()
+
+
+def _first_sheet(archive):
+    try:
+        with archive.open('xl/workbook.xml') as workbook:
+            sheet = next(e for _, e in iterparse(workbook) if e.tag == _NS + 'sheet')
+        rel_id = sheet.get(_REL_NS + 'id')
+        with archive.open('xl/_rels/workbook.xml.rels') as rels:
+            target = next(e.get('Target') for _, e in iterparse(rels)
+                          if e.tag == _PKG_REL_NS + 'Relationship' and e.get('Id') == rel_id)
+    except (KeyError, StopIteration) as exc:
+        raise ImportFormatError("The workbook has no worksheet.") from exc
+    return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+
+
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as source:
+        for _, element in iterparse(source):
+            if element.tag == _NS + 'si':
+                strings.append(''.join(text.text or '' for text in element.iter(_NS + 't')))
+                element.clear()
+    return strings
+
+
+def _cell_value(cell, strings):
+    kind = cell.get('t')
+    if kind == 'inlineStr':
+        return ''.join(text.text or '' for text in cell.iter(_NS + 't'))
+    value = cell.findtext(_NS + 'v') or ''
+    if kind == 's' and value:
+        return strings[int(value)]
+    return value
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
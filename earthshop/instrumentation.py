@@ -0,0 +1,104 @@
+"""
+Per-request SQL instrumentation.
+
+QueryInstrumentationMiddleware counts every statement a request runs
+(through connection.execute_wrapper on all database connections), times
+them, and groups them by SQL text so repeated statements - the N+1
+pattern: one query per row of a list - stand out. Each request is logged
+to the 'earthshop.queries' logger with its URL name:
+
+    GET products:product_list 200 queries=3 sql=1.8ms repeated=0
+
+at WARNING when a statement repeats REPEAT_WARNING times or more or the
+count passes QUERY_COUNT_WARNING, at DEBUG otherwise.
+
+Settings:
+    QUERY_INSTRUMENTATION         enable the middleware (default: DEBUG)
+    QUERY_INSTRUMENTATION_HEADER  also send X-Query-Count / X-Query-Time /
+                                  X-Query-Repeated response headers
+    QUERY_COUNT_WARNING           query count that logs a warning (50)
+
+Streaming responses are measured up to the point the view returns.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('earthshop.queries')
+
+REPEAT_WARNING = 5
+SHOWN_STATEMENT_LENGTH = 200
+
+
+class QueryStats:
+    """execute_wrapper callable that records count, time and statement text."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    def repeated(self):
+        """[(sql, times)] for statements run more than once, most repeated first."""
+        return [(sql, times) for sql, times in self.statements.most_common() if times > 1]
+
+    def duplicate_count(self):
+        """Executions beyond the first of each statement."""
+        return sum(times - 1 for _, times in self.repeated())
+
+    def capture(self):
+        """Context manager installing this collector on every connection."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+
+class QueryInstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSTRUMENTATION', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.send_header = getattr(settings, 'QUERY_INSTRUMENTATION_HEADER', False)
+        self.count_warning = getattr(settings, 'QUERY_COUNT_WARNING', 50)
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with stats.capture():
+            response = self.get_response(request)
+
+        if self.send_header:
+            response['X-Query-Count'] = str(stats.count)
+            response['X-Query-Time'] = f"{stats.seconds * 1000:.1f}ms"
+            response['X-Query-Repeated'] = str(stats.duplicate_count())
+        self.log(request, response, stats)
+        return response
+
+    def log(self, request, response, stats):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else request.path
+        repeated = stats.repeated()
+        worst = repeated[0][1] if repeated else 0
+        level = logging.WARNING if worst >= REPEAT_WARNING or stats.count > self.count_warning else logging.DEBUG
+        if not logger.isEnabledFor(level):
+            return
+        message = "%s %s %s queries=%d sql=%.1fms repeated=%d"
+        args = [request.method, view, response.status_code, stats.count, stats.seconds * 1000, stats.duplicate_count()]
+        if worst >= REPEAT_WARNING:
+            message += " most_repeated=%dx %s"
+            args += [worst, repeated[0][0][:SHOWN_STATEMENT_LENGTH]]
+        logger.log(level, message, *args)
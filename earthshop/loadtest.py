@@ -0,0 +1,389 @@
+"""
+Load test of several POS terminals working against one server.
+
+Each terminal is a thread with its own HTTP client that picks an
+operation by weight, sends it, and waits a random think time before the
+next one:
+
+    create_invoice   POST sales:create_invoice, a 1-4 line basket
+    installment_add  POST sales:installment_add on an installment invoice
+    add_stock        POST products:add_stock, a new batch
+    ledger_pay       POST customers:ledger_pay, a customer payment
+
+Requests go through the Django test client in-process (DjangoTransport)
+or over real HTTP to a threaded local server (HttpTransport, see
+local_server()), both against the same scratch database. Exceptions the
+views raise are caught through the got_request_exception signal, so
+lock errors ("database is locked", deadlocks, serialization failures)
+are counted apart from other server errors in both modes.
+
+consistency() then checks the books the way the rebuild commands do:
+on_hand against the movement tables and against the sales and
+receipts the terminals saw succeed, installments_paid, ledger balances
+and the daily logs.
+"""
+import http.client
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from urllib.parse import urlencode, urlsplit
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.signals import got_request_exception
+from django.db import DatabaseError, connection
+from django.db.models import F, OuterRef, Sum, Subquery
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from customers.models import Customer, CustomerBalance, Ledger
+from logs.models import DailyLog
+from products.models import Product, StockIn, StockOut
+from sales.models import Invoice, InvoiceInstallment
+
+OPERATIONS = ('create_invoice', 'installment_add', 'add_stock', 'ledger_pay')
+DEFAULT_MIX = {'create_invoice': 60, 'installment_add': 15, 'add_stock': 15, 'ledger_pay': 10}
+
+# fragments of the driver messages for lock timeouts, deadlocks and serialization failures
+LOCK_ERRORS = ('locked', 'deadlock', 'could not serialize', 'lock timeout', 'could not obtain lock')
+
+
+def is_lock_error(exc):
+    return isinstance(exc, DatabaseError) and any(text in str(exc).lower() for text in LOCK_ERRORS)
+
+
+def parse_mix(text):
+    """'create_invoice=60,add_stock=40' -> {operation: weight}; raises ValueError."""
+    mix = {}
+    for part in filter(None, (part.strip() for part in text.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}.")
+        mix[name] = int(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("The mix needs at least one operation with a positive weight.")
+    return mix
+
+
+class DjangoTransport:
+    """The test client, in-process; CSRF checks are off as in tests."""
+
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def post(self, path, data, ajax=False):
+        headers = {'x-requested-with': 'XMLHttpRequest'} if ajax else {}
+        response = self.client.post(path, data, headers=headers)
+        return response.status_code, response.get('Location', ''), response.content
+
+    def close(self):
+        pass
+
+
+class HttpTransport:
+    """Plain HTTP/1.1 to a running server, with a CSRF token of its own."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.token = secrets.token_hex(16)
+        self.connection = None
+
+    def post(self, path, data, ajax=False):
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Cookie': f'csrftoken={self.token}',
+            'X-CSRFToken': self.token,
+        }
+        if ajax:
+            headers['X-Requested-With'] = 'XMLHttpRequest'
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.connection.request('POST', path, urlencode(data), headers)
+                response = self.connection.getresponse()
+                body = response.read()
+            except (ConnectionError, http.client.HTTPException):
+                # the server closed a kept-alive connection; reconnect once
+                self.close()
+                if attempt == 2:
+                    raise
+                continue
+            if response.getheader('Connection', '').lower() == 'close':
+                self.close()
+            return response.status, response.getheader('Location', ''), body
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class _RequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def local_server():
+    """A threaded WSGI server for this project on a free localhost port; yields its URL."""
+    server = ThreadedWSGIServer(('127.0.0.1', 0), _RequestHandler, allow_reuse_address=False)
+    server.set_app(WSGIHandler())
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+@dataclass
+class Outcome:
+    """What one operation did; counted by LoadTest."""
+    ok: bool
+    sold: dict = field(default_factory=dict)
+    received: dict = field(default_factory=dict)
+    rejected: bool = False
+    lock_error: bool = False
+
+
+class Terminal:
+    """One till: picks operations by weight and posts them through `transport`."""
+
+    def __init__(self, number, transport, targets, mix, rng):
+        self.number = number
+        self.transport = transport
+        self.targets = targets
+        self.operations, self.weights = zip(*mix.items())
+        self.rng = rng
+        self.today = timezone.localdate().isoformat()
+
+    def next_operation(self):
+        return self.rng.choices(self.operations, self.weights)[0]
+
+    def run(self, operation):
+        """(status, Outcome) of one operation."""
+        return getattr(self, operation)()
+
+    def create_invoice(self):
+        lines = {}
+        for pk in self.rng.sample(self.targets['products'], min(len(self.targets['products']), self.rng.randint(1, 4))):
+            lines[pk] = self.rng.randint(1, 3)
+        items = [{'item_id': pk, 'qty': qty, 'price': '100.00'} for pk, qty in lines.items()]
+        status, location, _ = self.transport.post(reverse('sales:create_invoice'), {
+            'items': json.dumps(items), 'payment_type': Invoice.PAYMENT_CASH, 'paid_amount': '0', 'date': self.today,
+        })
+        if status == 302 and location.rstrip('/').endswith(reverse('sales:create_invoice').rstrip('/')):
+            # redirected back to the till: InsufficientStock, nothing written
+            return status, Outcome(ok=True, rejected=True)
+        return status, Outcome(ok=status == 302, sold=lines if status == 302 else {})
+
+    def installment_add(self):
+        invoice_id = self.rng.choice(self.targets['invoices'])
+        status, _, _ = self.transport.post(reverse('sales:installment_add', kwargs={'invoice_id': invoice_id}), {
+            'paid_amount': '10.00', 'description': f'Till {self.number}', 'date': self.today,
+        })
+        return status, Outcome(ok=status == 302)
+
+    def add_stock(self):
+        product_id = self.rng.choice(self.targets['products'])
+        quantity = self.rng.randint(5, 20)
+        status, _, _ = self.transport.post(reverse('products:add_stock'), {
+            'product': product_id, 'buying_price_item': '60.00', 'buying_percent': '0',
+            'stock_quantity': quantity, 'selling_price_item': '100.00', 'date': self.today,
+        })
+        return status, Outcome(ok=status == 302, received={product_id: quantity} if status == 302 else {})
+
+    def ledger_pay(self):
+        customer_id = self.rng.choice(self.targets['customers'])
+        status, _, body = self.transport.post(reverse('customers:ledger_pay', kwargs={'pk': customer_id}), {
+            'date': self.today, 'credit_amount': '25.00', 'detail': f'Till {self.number} payment',
+        }, ajax=True)
+        # the view catches its own exceptions and reports them in the JSON body
+        locked = status == 500 and any(text in body.decode(errors='replace').lower() for text in LOCK_ERRORS)
+        return status, Outcome(ok=status == 200, lock_error=locked)
+
+
+@dataclass
+class OperationStats:
+    samples: list = field(default_factory=list)
+    ok: int = 0
+    rejected: int = 0
+    client_errors: int = 0
+    server_errors: int = 0
+
+
+class LoadTest:
+    """
+    Run `terminals` threads for `seconds` (or `requests` operations each)
+    with exponential think times of mean `think_ms`.
+    """
+    def __init__(self, terminals, mix, seconds=10.0, requests=None, think_ms=200.0, seed=0, server_url=None):
+        self.terminals = terminals
+        self.mix = mix
+        self.seconds = seconds
+        self.requests = requests
+        self.think_ms = think_ms
+        self.seed = seed
+        self.server_url = server_url
+        self.lock = threading.Lock()
+        self.stats = {name: OperationStats() for name in mix}
+        self.lock_errors = 0
+        self.sold, self.received = {}, {}
+        self.failures = []
+        self.elapsed = 0.0
+
+    def _request_exception(self, sender, request=None, **kwargs):
+        if is_lock_error(sys.exc_info()[1]):
+            with self.lock:
+                self.lock_errors += 1
+
+    def run(self, targets):
+        got_request_exception.connect(self._request_exception, dispatch_uid='earthshop_loadtest')
+        stop = threading.Event()
+        threads = [threading.Thread(target=self._terminal, args=(number, targets, stop))
+                   for number in range(1, self.terminals + 1)]
+        start = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            if self.requests is None:
+                stop.wait(self.seconds)
+                stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.elapsed = time.perf_counter() - start
+            got_request_exception.disconnect(dispatch_uid='earthshop_loadtest')
+        return self
+
+    def _terminal(self, number, targets, stop):
+        rng = random.Random(self.seed * 1000 + number)
+        transport = HttpTransport(self.server_url) if self.server_url else DjangoTransport()
+        terminal = Terminal(number, transport, targets, self.mix, rng)
+        done = 0
+        try:
+            while not stop.is_set() and (self.requests is None or done < self.requests):
+                operation = terminal.next_operation()
+                began = time.perf_counter()
+                status, outcome = terminal.run(operation)
+                took = (time.perf_counter() - began) * 1000
+                done += 1
+                self._record(operation, status, outcome, took)
+                if self.think_ms:
+                    stop.wait(rng.expovariate(1000 / self.think_ms))
+        except Exception as exc:
+            with self.lock:
+                self.failures.append(exc)
+        finally:
+            transport.close()
+            connection.close()
+
+    def _record(self, operation, status, outcome, took):
+        with self.lock:
+            stats = self.stats[operation]
+            stats.samples.append(took)
+            self.lock_errors += outcome.lock_error
+            if outcome.rejected:
+                stats.rejected += 1
+            elif outcome.ok:
+                stats.ok += 1
+            elif status >= 500:
+                stats.server_errors += 1
+            else:
+                stats.client_errors += 1
+            for pk, qty in outcome.sold.items():
+                self.sold[pk] = self.sold.get(pk, 0) + qty
+            for pk, qty in outcome.received.items():
+                self.received[pk] = self.received.get(pk, 0) + qty
+
+
+def targets(products=50):
+    """
+    Primary keys the terminals work on: the best-stocked products (a
+    small set, so tills contend for the same rows), customers and
+    installment invoices.
+    """
+    return {
+        'products': list(Product.objects.order_by('-on_hand').values_list('pk', flat=True)[:products]),
+        'customers': list(Customer.objects.order_by('pk').values_list('pk', flat=True)[:200]),
+        'invoices': list(Invoice.objects.filter(payment_type=Invoice.PAYMENT_INSTALLMENT)
+                         .order_by('pk').values_list('pk', flat=True)[:200]),
+    }
+
+
+def snapshot(product_ids):
+    """{product_id: on_hand} before the run, to check it against what the tills saw."""
+    return dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'on_hand'))
+
+
+def consistency(opening, sold, received):
+    """
+    Problems found in the books after a run, as a list of strings.
+    `opening` is snapshot() before the run; `sold` and `received` are
+    the {product_id: qty} the terminals saw succeed.
+    """
+    problems = []
+    products = Product.objects.annotate(expected=Product.on_hand_from_movements())
+    drifted = products.exclude(on_hand=F('expected')).count()
+    if drifted:
+        problems.append(f"{drifted} product(s) have on_hand different from their stock movements")
+    negative = Product.objects.filter(on_hand__lt=0).count()
+    if negative:
+        problems.append(f"{negative} product(s) went below zero stock")
+    closing = snapshot(opening)
+    lost = [pk for pk, stock in opening.items()
+            if closing.get(pk) != stock + received.get(pk, 0) - sold.get(pk, 0)]
+    if lost:
+        problems.append(f"{len(lost)} product(s) do not match the sales and receipts that succeeded (lost update)")
+
+    installments = (InvoiceInstallment.objects.order_by().values('invoice')
+                    .annotate(total=Sum('paid_amount')).values_list('invoice', 'total'))
+    paid = dict(Invoice.objects.filter(installments_paid__gt=0).values_list('pk', 'installments_paid'))
+    summed = {pk: total for pk, total in installments}
+    if paid != {pk: total for pk, total in summed.items() if total}:
+        problems.append("Invoice.installments_paid differs from the installment rows")
+
+    ledgers = {row['customer']: row for row in Ledger.objects.order_by().values('customer')
+               .annotate(debit=Sum('debit_amount'), credit=Sum('credit_amount'))}
+    # running balances are kept in (date, id) order
+    last_balance = Ledger.objects.filter(customer=OuterRef('customer')).order_by('-date', '-id').values('balance')[:1]
+    wrong = 0
+    for balance in CustomerBalance.objects.filter(customer__in=ledgers).annotate(last=Subquery(last_balance)):
+        row = ledgers[balance.customer_id]
+        if (balance.total_debit, balance.total_credit) != (row['debit'], row['credit']) \
+                or balance.balance != balance.last:
+            wrong += 1
+    if wrong:
+        problems.append(f"{wrong} customer balance(s) differ from their ledger rows")
+
+    history = DailyLog.totals_from_history()
+    logs = {log.date: log for log in DailyLog.objects.filter(date__in=list(history))}
+    drifted_days = sum(
+        1 for date, totals in history.items()
+        if date not in logs or any(getattr(logs[date], column) != value for column, value in totals.items())
+    )
+    if drifted_days:
+        problems.append(f"{drifted_days} daily log(s) differ from the transaction tables")
+    return problems
+
+
+def counts():
+    """Rows written, for the report."""
+    return {
+        'invoices': Invoice.objects.count(),
+        'stock_outs': StockOut.objects.count(),
+        'stock_ins': StockIn.objects.count(),
+        'installments': InvoiceInstallment.objects.count(),
+        'ledgers': Ledger.objects.count(),
+    }
@@ -0,0 +1,155 @@
+import json
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from earthshop.benchmarking import scratch_database, summarize
+from products.models import Category, Product
+from sales.models import Invoice
+from sales.services import commit_invoice
+
+# SQLite defaults: rollback journal, FULL sync, 5s timeout, deferred BEGIN
+BASELINE_OPTIONS = {'init_command': 'PRAGMA journal_mode=DELETE'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent read/write throughput on a scratch SQLite database, "
+        "with SQLite's defaults and with the pragmas configured in settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help="Threads committing invoices.")
+        parser.add_argument('--readers', type=int, default=8, help="Threads reading invoice/product lists.")
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run.")
+        parser.add_argument('--products', type=int, default=500, help="Products to seed.")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("This benchmark is for SQLite deployments.")
+
+        tuned = settings.DATABASES['default'].get('OPTIONS', {})
+        results = []
+        for label, db_options in (('baseline', BASELINE_OPTIONS), ('tuned', tuned)):
+            results.append(self.run(label, db_options, options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'profile':<9} {'writes/s':>9} {'reads/s':>9} {'locked':>7} "
+            f"{'write p95 ms':>13} {'read p95 ms':>12}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['profile']:<9} {row['writes_per_s']:>9.1f} {row['reads_per_s']:>9.1f} "
+                f"{row['locked_errors']:>7} {row['write_latency']['p95_ms']:>13.2f} "
+                f"{row['read_latency']['p95_ms']:>12.2f}"
+            )
+
+    def run(self, label, db_options, options):
+        saved_options = connection.settings_dict.get('OPTIONS', {})
+        connection.settings_dict['OPTIONS'] = dict(db_options)
+        try:
+            with scratch_database(on_disk=True):
+                connection.close()  # reconnect with this profile's pragmas
+                return self.measure(label, options)
+        finally:
+            connection.settings_dict['OPTIONS'] = saved_options
+
+    def measure(self, label, options):
+        category = Category.objects.create(name='Benchmark')
+        products = Product.objects.bulk_create([
+            Product(category=category, name=f'Bench product {i}', on_hand=10 ** 9, buying_price=Decimal('10.00'))
+            for i in range(options['products'])
+        ])
+        product_ids = [p.pk for p in products]
+        today = timezone.now().date()
+
+        lock = threading.Lock()
+        stop = threading.Event()
+        write_samples, read_samples, errors = [], [], []
+        locked = [0]
+
+        def writer(seed):
+            rng = random.Random(seed)
+            try:
+                while not stop.is_set():
+                    lines = [(pk, Decimal(rng.randint(1, 3)), Decimal('15.00'))
+                             for pk in rng.sample(product_ids, rng.randint(1, 5))]
+                    start = time.perf_counter()
+                    try:
+                        commit_invoice(lines, date=today)
+                    except OperationalError as exc:
+                        if 'locked' not in str(exc):
+                            raise
+                        with lock:
+                            locked[0] += 1
+                        continue
+                    with lock:
+                        write_samples.append((time.perf_counter() - start) * 1000)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        def reader(seed):
+            rng = random.Random(seed)
+            try:
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    try:
+                        list(Invoice.objects.select_related('customer').with_payment_status()
+                             .order_by('-date', '-id')[:20])
+                        list(Product.objects.filter(pk__in=rng.sample(product_ids, 10))
+                             .values('id', 'name', 'on_hand'))
+                    except OperationalError as exc:
+                        if 'locked' not in str(exc):
+                            raise
+                        with lock:
+                            locked[0] += 1
+                        continue
+                    with lock:
+                        read_samples.append((time.perf_counter() - start) * 1000)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        threads += [threading.Thread(target=reader, args=(1000 + i,)) for i in range(options['readers'])]
+        for t in threads:
+            t.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for t in threads:
+            t.join()
+
+        if errors:
+            raise CommandError(f"{label}: {len(errors)} thread(s) failed, first error: {errors[0]!r}")
+        if not write_samples or not read_samples:
+            raise CommandError(f"{label}: no reads or writes completed; run for longer.")
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        return {
+            'profile': label,
+            'journal_mode': journal_mode,
+            'writers': options['writers'],
+            'readers': options['readers'],
+            'seconds': options['seconds'],
+            'writes_per_s': round(len(write_samples) / options['seconds'], 1),
+            'reads_per_s': round(len(read_samples) / options['seconds'], 1),
+            'locked_errors': locked[0],
+            'write_latency': summarize(write_samples),
+            'read_latency': summarize(read_samples),
+        }
@@ -0,0 +1,137 @@
+import json
+from dataclasses import asdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from banking.models import Bank
+from customers.models import Customer
+from earthshop.benchmarking import compare, environment, scratch_database, stopwatch, summarize
+from earthshop.datagen import Volumes, generate
+from earthshop.instrumentation import QueryStats
+from products.models import Product
+
+BASKET = 3
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the key views and model methods on synthetic datasets of several sizes, "
+        "optionally saving the results as JSON and comparing them with a saved run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help="Dataset sizes (default: 10000 100000 1000000).")
+        parser.add_argument('--runs', type=int, default=10, help="Timed runs per case.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed for the generated data.")
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', metavar='BASELINE', help="JSON file of an earlier run to compare against.")
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help="Median slowdown ratio that counts as a regression (default 1.25).")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read {options['compare']}: {exc}")
+
+        report = {
+            'created': timezone.now().isoformat(timespec='seconds'),
+            'environment': environment(),
+            'runs': options['runs'],
+            'seed': options['seed'],
+            'datasets': [],
+        }
+        setup_test_environment()
+        try:
+            for rows in options['rows']:
+                self.stderr.write(f"Generating {rows} rows...")
+                report['datasets'].append(self.run(rows, options))
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(f"{'rows':>8} {'case':<16} {'queries':>7} {'median ms':>10} {'p95 ms':>8} {'max ms':>8}")
+        for dataset in report['datasets']:
+            for case, row in dataset['cases'].items():
+                self.stdout.write(f"{dataset['rows']:>8} {case:<16} {row['queries']:>7} "
+                                  f"{row['median_ms']:>10.3f} {row['p95_ms']:>8.3f} {row['max_ms']:>8.3f}")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Saved to {options['output']}.")
+        if baseline is not None:
+            self.compare(baseline, report, options['threshold'])
+
+    def run(self, rows, options):
+        with scratch_database(on_disk=True):
+            generated = generate(Volumes.for_rows(rows), seed=options['seed'])
+            cases = {}
+            for name, case in self.cases().items():
+                samples, stats = [], QueryStats()
+                case()  # warm-up
+                with stats.capture():
+                    for _ in range(options['runs']):
+                        with stopwatch(samples):
+                            case()
+                cases[name] = {'queries': stats.count // options['runs'], **summarize(samples)}
+        return {
+            'rows': rows,
+            'volumes': asdict(Volumes.for_rows(rows)),
+            'counts': generated.counts,
+            'generate_s': round(generated.seconds, 2),
+            'cases': cases,
+        }
+
+    def cases(self):
+        """{name: callable} run against the generated data."""
+        client = Client()
+        # the best-stocked products, so repeated sales never run out
+        basket = list(Product.objects.order_by('-on_hand').values_list('pk', 'on_hand')[:BASKET])
+        customer = Customer.objects.annotate(entries=Count('ledgers')).order_by('-entries').first()
+        bank = Bank.objects.annotate(entries=Count('bank_detail')).order_by('-entries').first()
+        items = json.dumps([{'item_id': pk, 'qty': 1, 'price': '10.00'} for pk, _ in basket])
+        ledger_url = reverse('customers:ledger', kwargs={'pk': customer.pk})
+
+        def get(url):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}.")
+
+        def create_invoice():
+            response = client.post(reverse('sales:create_invoice'), {'items': items, 'paid_amount': '30.00'})
+            if response.status_code != 302:
+                raise CommandError(f"create_invoice returned {response.status_code}.")
+
+        return {
+            'create_invoice': create_invoice,
+            'invoice_list': lambda: get(reverse('sales:invoice_list')),
+            'product_list': lambda: get(reverse('products:product_list')),
+            'ledger_list': lambda: get(ledger_url),
+            'bank_balance': bank.bank_balance,
+        }
+
+    def compare(self, baseline, report, threshold):
+        def summaries(run):
+            return {f"{dataset['rows']}/{case}": row for dataset in run.get('datasets', [])
+                    for case, row in dataset['cases'].items()}
+
+        rows, regressed = compare(summaries(baseline), summaries(report), threshold)
+        if not rows:
+            self.stdout.write(self.style.WARNING("The baseline has none of these datasets/cases to compare."))
+            return
+        self.stdout.write(f"\n{'rows/case':<26} {'baseline ms':>12} {'now ms':>10} {'ratio':>7}")
+        for key, before, after, ratio in rows:
+            line = f"{key:<26} {before:>12.3f} {after:>10.3f} {ratio:>7.2f}"
+            self.stdout.write(self.style.ERROR(line) if key in regressed else line)
+        if regressed:
+            raise CommandError(f"{len(regressed)} case(s) slower than {threshold}x the baseline.")
+        self.stdout.write(self.style.SUCCESS(f"No case slower than {threshold}x the baseline."))
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from earthshop.benchmarking import scratch_database
+from earthshop.querybudget import ROWS, check_query_budgets, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "GET every named URL on a seeded scratch database and compare its query count "
+        "with earthshop.querybudget.QUERY_BUDGETS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=ROWS, help="Rows per list in the seeded data.")
+        parser.add_argument('--url', action='append', dest='names', metavar='NAME',
+                            help="Only check this URL name; repeat for several.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with scratch_database():
+                objects = seed(options['rows'])
+                user = get_user_model().objects.create_superuser(
+                    username='budget', password='budget', email='budget@example.com')
+                client = Client(raise_request_exception=False)
+                client.force_login(user)
+                results, unbudgeted = check_query_budgets(client, objects, names=options['names'])
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(f"{'url':<32} {'status':>6} {'queries':>7} {'budget':>6} {'repeated':>8}")
+        for r in results:
+            line = f"{r.name:<32} {r.status:>6} {r.queries:>7} {r.budget:>6} {r.repeated:>8}"
+            self.stdout.write(self.style.ERROR(line) if r.over or r.failed else line)
+        for name in unbudgeted:
+            self.stdout.write(self.style.ERROR(f"{name:<32} no budget"))
+
+        failed = [r for r in results if r.failed]
+        if failed:
+            # counted up to the error; the page itself needs fixing
+            self.stdout.write(self.style.WARNING(
+                "Unexpected status (see the log above): "
+                + ', '.join(f"{r.name} {r.status} (expected {r.expected_status})" for r in failed)))
+        over = [r for r in results if r.over]
+        if over or failed or (unbudgeted and not options['names']):
+            raise CommandError(f"{len(over)} URL(s) over budget, {len(failed)} with an unexpected status, "
+                               f"{len(unbudgeted)} without a budget.")
+        self.stdout.write(self.style.SUCCESS(f"All {len(results)} URLs render within their query budgets."))
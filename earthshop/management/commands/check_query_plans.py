@@ -0,0 +1,105 @@
+import datetime
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from banking.models import BankTransaction
+from customers.models import Ledger
+from expenses.models import Expense
+from ledger.models import LedgerEntry
+from products.models import Product, StockIn, StockOut
+from sales.models import Invoice, InvoiceInstallment
+from earthshop.benchmarking import scratch_database
+from earthshop.pagination import older_than
+
+TODAY = datetime.date(2025, 6, 15)
+MONTH_START = datetime.date(2025, 6, 1)
+NEXT_MONTH = datetime.date(2025, 7, 1)
+CURSOR = (TODAY, 500)
+
+
+def _seek(qs):
+    """Apply the keyset pagination predicate used by earthshop.pagination."""
+    return qs.filter(older_than(*CURSOR))
+
+
+# (label, queryset) pairs mirroring the list and report queries of every app
+QUERIES = [
+    ('sales: invoice_list', lambda: Invoice.objects.select_related('customer').order_by('-date', '-id')[:21]),
+    ('sales: invoice_list next page', lambda: _seek(Invoice.objects.order_by('-date', '-id'))[:21]),
+    ('sales: invoice_list by date', lambda: Invoice.objects.filter(date=TODAY).order_by('-date', '-id')[:21]),
+    ('sales: invoices of a customer', lambda: Invoice.objects.filter(customer_id=1).order_by('-date', '-id')[:21]),
+    ('sales: installment_list', lambda: InvoiceInstallment.objects.filter(invoice_id=1).order_by('-date', '-id')),
+    ('sales: installments in a month', lambda: InvoiceInstallment.objects.filter(
+        date__gte=MONTH_START, date__lt=NEXT_MONTH).values('date')),
+    ('sales: invoices in a month', lambda: Invoice.objects.filter(
+        date__gte=MONTH_START, date__lt=NEXT_MONTH).values('date', 'grand_total')),
+    ('reports: outstanding receivables', lambda: Invoice.objects.outstanding().order_by().values('grand_total', 'paid_amount')),
+    ('products: stockin_list', lambda: StockIn.objects.select_related('product').order_by('-date', '-id')[:21]),
+    ('products: stockin_list next page', lambda: _seek(StockIn.objects.order_by('-date', '-id'))[:21]),
+    ('products: product_stockins', lambda: StockIn.objects.filter(product_id=1).order_by('-date', '-id')[:21]),
+    ('products: stockout_list', lambda: StockOut.objects.select_related('product').order_by('-date', '-id')[:21]),
+    ('products: product_stockouts', lambda: StockOut.objects.filter(product_id=1).order_by('-date', '-id')[:21]),
+    ('products: stock-ins in a month', lambda: StockIn.objects.filter(
+        date__gte=MONTH_START, date__lt=NEXT_MONTH).values('date')),
+    ('products: product_list', lambda: Product.objects.select_related('category')),
+    ('customers: ledger_list', lambda: Ledger.objects.filter(customer_id=1).order_by('-date', '-id')),
+    ('ledger: entries of an entity', lambda: LedgerEntry.objects.filter(
+        entity_type='customer', entity_name='x').order_by('-date', '-id')),
+    ('ledger: entries in a month', lambda: LedgerEntry.objects.filter(
+        date__gte=MONTH_START, date__lt=NEXT_MONTH).order_by('-date', '-id')),
+    ('expenses: list', lambda: Expense.objects.order_by('-date', '-id')[:21]),
+    ('expenses: in a month', lambda: Expense.objects.filter(
+        date__gte=MONTH_START, date__lt=NEXT_MONTH).values('date', 'amount')),
+    ('expenses: category in a month', lambda: Expense.objects.filter(
+        category_id=1, date__gte=MONTH_START, date__lt=NEXT_MONTH).values('amount')),
+    ('banking: account transactions', lambda: BankTransaction.objects.filter(account_id=1).order_by('-date', '-id')),
+    ('banking: transactions in a month', lambda: BankTransaction.objects.filter(
+        date__gte=MONTH_START, date__lt=NEXT_MONTH).values('date', 'amount')),
+]
+
+# tables small enough by design that a full scan is the right plan
+SCAN_ALLOWED = {'products_product', 'products_category'}
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?!.*\bUSING\b.*\bINDEX\b)')
+
+
+def query_plan(queryset):
+    """(EXPLAIN QUERY PLAN steps, the steps that scan a table without an index)."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        plan = [row[-1] for row in cursor.fetchall()]
+    scans = [step for step in plan if FULL_SCAN.match(step) and FULL_SCAN.match(step).group(1) not in SCAN_ALLOWED]
+    return plan, scans
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN QUERY PLAN for the list/report queries of every app on a "
+        "scratch database and fail if any of them falls back to a full table scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write("EXPLAIN QUERY PLAN checks are SQLite-only; skipping.")
+            return
+
+        failures = []
+        with scratch_database():
+            for label, build in QUERIES:
+                plan, scans = query_plan(build())
+                if scans:
+                    failures.append(label)
+                status = self.style.ERROR('FULL SCAN') if scans else self.style.SUCCESS('ok')
+                self.stdout.write(f"{status:<10} {label}")
+                if scans or options['verbose_plans']:
+                    for step in plan:
+                        self.stdout.write(f"             {step}")
+
+        if failures:
+            raise CommandError(f"{len(failures)} quer{'y' if len(failures) == 1 else 'ies'} fell back to a full scan.")
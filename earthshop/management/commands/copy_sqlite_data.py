@@ -0,0 +1,142 @@
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+SOURCE_ALIAS = 'sqlite_source'
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy every table of an existing SQLite database into the configured "
+        "database (e.g. PostgreSQL) in bulk batches. Run `migrate` on the target first; "
+        "its current contents are flushed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=str(settings.BASE_DIR / 'db.sqlite3'),
+                            help="SQLite file to copy from (default: %(default)s).")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Target database alias.")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Rows per INSERT batch.")
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help="Do not ask before flushing the target database.")
+
+    def handle(self, *args, **options):
+        source = Path(options['source']).resolve()
+        target = options['database']
+        batch_size = options['batch_size']
+        if not source.exists():
+            raise CommandError(f"{source} does not exist.")
+        target_settings = connections[target].settings_dict
+        if target_settings['ENGINE'] == 'django.db.backends.sqlite3' and Path(target_settings['NAME']).resolve() == source:
+            raise CommandError("The source and the target are the same database.")
+
+        if options['interactive']:
+            answer = input(
+                f"This replaces all data in '{target}' ({target_settings['ENGINE']} {target_settings['NAME']}) "
+                f"with the contents of {source}.\nType 'yes' to continue: "
+            )
+            if answer != 'yes':
+                raise CommandError("Copy cancelled.")
+
+        connections.settings[SOURCE_ALIAS] = connections.configure_settings({
+            DEFAULT_DB_ALIAS: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(source)},
+        })[DEFAULT_DB_ALIAS]
+        try:
+            self.copy(target, batch_size)
+        finally:
+            connections[SOURCE_ALIAS].close()
+            del connections[SOURCE_ALIAS]
+            del connections.settings[SOURCE_ALIAS]
+
+    def copy(self, target, batch_size):
+        models = [
+            model for model in apps.get_models(include_auto_created=True)
+            if model._meta.managed and not model._meta.proxy
+        ]
+        source_tables = set(connections[SOURCE_ALIAS].introspection.table_names())
+
+        # columns only line up when both sides are at the same migration
+        source_applied = set(MigrationRecorder(connections[SOURCE_ALIAS]).applied_migrations())
+        target_applied = set(MigrationRecorder(connections[target]).applied_migrations())
+        if source_applied != target_applied:
+            raise CommandError(
+                "The source and the target are not at the same migrations; run `migrate` on both first "
+                f"({len(source_applied - target_applied)} only in the source, "
+                f"{len(target_applied - source_applied)} only in the target)."
+            )
+
+        start = time.perf_counter()
+        copied = {}
+        # foreign keys are checked at commit on PostgreSQL and SQLite,
+        # so tables can be loaded in any order inside one transaction;
+        # a failed copy also rolls back the flush
+        with transaction.atomic(using=target):
+            # rows the post_migrate handlers created (content types, permissions)
+            # would clash with the copied ones
+            call_command('flush', database=target, interactive=False, inhibit_post_migrate=True, verbosity=0)
+            for model in models:
+                if model._meta.db_table not in source_tables:
+                    self.stdout.write(f"  {model._meta.label}: not in the source, skipped")
+                    continue
+                copied[model] = self.copy_model(model, target, batch_size)
+                self.stdout.write(f"  {model._meta.label}: {copied[model]} rows")
+
+            # continue the id sequences after the copied rows
+            statements = connections[target].ops.sequence_reset_sql(no_style(), models)
+            if statements:
+                with connections[target].cursor() as cursor:
+                    for sql in statements:
+                        cursor.execute(sql)
+        # cached ids of the content types the flush replaced
+        ContentType.objects.clear_cache()
+
+        mismatched = [
+            model._meta.label for model, count in copied.items()
+            if model._base_manager.using(target).count() != count
+        ]
+        if mismatched:
+            raise CommandError(f"Row counts differ after the copy for: {', '.join(mismatched)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Copied {sum(copied.values())} rows in {len(copied)} tables in {time.perf_counter() - start:.1f}s."
+        ))
+
+    def copy_model(self, model, target, batch_size):
+        # auto_now / auto_now_add would overwrite the copied timestamps
+        stamped = [
+            (field, field.auto_now, field.auto_now_add) for field in model._meta.concrete_fields
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+        ]
+        for field, _, _ in stamped:
+            field.auto_now = field.auto_now_add = False
+        try:
+            return self.copy_rows(model, target, batch_size)
+        finally:
+            for field, auto_now, auto_now_add in stamped:
+                field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+    def copy_rows(self, model, target, batch_size):
+        fields = [field.attname for field in model._meta.concrete_fields]
+        rows = (
+            model._base_manager.using(SOURCE_ALIAS).order_by(model._meta.pk.attname)
+            .values_list(*fields).iterator(chunk_size=batch_size)
+        )
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(model(**dict(zip(fields, row))))
+            if len(batch) == batch_size:
+                model._base_manager.using(target).bulk_create(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            model._base_manager.using(target).bulk_create(batch)
+            count += len(batch)
+        return count
@@ -0,0 +1,46 @@
+from dataclasses import asdict, fields
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from earthshop.datagen import BATCH_SIZE, DAYS, Volumes, generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic shop history of about --rows rows "
+        "(products, stock, customers, ledgers, invoices, banks, expenses)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Approximate total rows to write (default 10000).")
+        for field in fields(Volumes):
+            parser.add_argument(f"--{field.name.replace('_', '-')}", type=int, dest=field.name,
+                                help=f"Override the number of {field.name.replace('_', ' ')}.")
+        parser.add_argument('--days', type=int, default=DAYS, help="Days of history, ending today.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same data.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows per INSERT.")
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help="Do not ask for confirmation.")
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['days'] < 1:
+            raise CommandError("--rows and --days must be positive.")
+        volumes = Volumes.for_rows(options['rows'])
+        for name in asdict(volumes):
+            if options[name] is not None:
+                setattr(volumes, name, options[name])
+
+        if options['interactive']:
+            answer = input(
+                f"This adds about {options['rows']} synthetic rows to {connection.settings_dict['NAME']}.\n"
+                "Type 'yes' to continue: ")
+            if answer != 'yes':
+                raise CommandError("Cancelled.")
+
+        generated = generate(volumes, seed=options['seed'], days=options['days'], batch_size=options['batch_size'])
+        for label, count in generated.counts.items():
+            self.stdout.write(f"{label:<32} {count:>9}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {sum(generated.counts.values())} rows in {generated.seconds:.1f}s."
+        ))
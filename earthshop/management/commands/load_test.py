@@ -0,0 +1,117 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from earthshop.benchmarking import environment, scratch_database, summarize
+from earthshop.datagen import Volumes, generate
+from earthshop.loadtest import DEFAULT_MIX, LoadTest, consistency, counts, local_server, parse_mix, snapshot, targets
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate several POS terminals selling, receiving stock and taking payments at once "
+        "on a scratch database, then report latency, throughput, lock errors and whether the "
+        "stock and balances still add up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terminals', type=int, default=4, help="Concurrent terminals (threads).")
+        parser.add_argument('--seconds', type=float, default=10.0, help="How long to run.")
+        parser.add_argument('--requests', type=int,
+                            help="Operations per terminal; overrides --seconds.")
+        parser.add_argument('--think-ms', type=float, default=200.0,
+                            help="Mean pause between a terminal's operations (exponential; 0 for none).")
+        parser.add_argument('--mix', default=','.join(f"{name}={weight}" for name, weight in DEFAULT_MIX.items()),
+                            help="Operation weights, e.g. create_invoice=60,add_stock=40.")
+        parser.add_argument('--rows', type=int, default=10000, help="Rows of synthetic data to start from.")
+        parser.add_argument('--products', type=int, default=50,
+                            help="Products the terminals sell and restock; fewer means more contention.")
+        parser.add_argument('--server', action='store_true',
+                            help="Go through a local HTTP server instead of the in-process test client.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed.")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if options['terminals'] < 1:
+            raise CommandError("--terminals must be at least 1.")
+
+        # the test client's host, and the local server's
+        with override_settings(ALLOWED_HOSTS=['testserver', '127.0.0.1', 'localhost']), \
+                scratch_database(on_disk=True):
+            generate(Volumes.for_rows(options['rows']), seed=options['seed'])
+            work = targets(options['products'])
+            opening = snapshot(work['products'])
+            before = counts()
+            test = LoadTest(options['terminals'], mix, seconds=options['seconds'], requests=options['requests'],
+                            think_ms=options['think_ms'], seed=options['seed'])
+            if options['server']:
+                with local_server() as url:
+                    test.server_url = url
+                    test.run(work)
+            else:
+                test.run(work)
+            problems = consistency(opening, test.sold, test.received)
+            written = {name: total - before[name] for name, total in counts().items()}
+
+        result = self.result(test, options, written, problems)
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+        else:
+            self.report(result)
+
+        if test.failures:
+            raise CommandError(f"{len(test.failures)} terminal(s) failed, first error: {test.failures[0]!r}")
+        if problems:
+            raise CommandError("Inconsistent after the run: " + "; ".join(problems) + ".")
+        if not options['json']:
+            self.stdout.write(self.style.SUCCESS("Stock, installments, ledgers and daily logs are consistent."))
+
+    def result(self, test, options, written, problems):
+        operations = {}
+        for name, stats in test.stats.items():
+            operations[name] = {
+                'requests': len(stats.samples), 'ok': stats.ok, 'rejected': stats.rejected,
+                'client_errors': stats.client_errors, 'server_errors': stats.server_errors,
+                'latency': summarize(stats.samples) if stats.samples else None,
+            }
+        samples = [sample for stats in test.stats.values() for sample in stats.samples]
+        return {
+            'environment': environment(),
+            'transport': 'http' if options['server'] else 'test client',
+            'terminals': test.terminals,
+            'think_ms': test.think_ms,
+            'seconds': round(test.elapsed, 2),
+            'requests': len(samples),
+            'requests_per_s': round(len(samples) / test.elapsed, 1) if test.elapsed else 0,
+            'lock_errors': test.lock_errors,
+            'latency': summarize(samples) if samples else None,
+            'operations': operations,
+            'written': written,
+            'problems': problems,
+        }
+
+    def report(self, result):
+        self.stdout.write(
+            f"{result['terminals']} terminals over {result['transport']}, think {result['think_ms']:g}ms: "
+            f"{result['requests']} requests in {result['seconds']}s ({result['requests_per_s']}/s), "
+            f"{result['lock_errors']} lock error(s)"
+        )
+        self.stdout.write(f"{'operation':<16} {'requests':>8} {'ok':>6} {'rejected':>8} {'4xx':>5} {'5xx':>5} "
+                          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        rows = list(result['operations'].items()) + [('all', {**result, 'ok': '', 'rejected': '',
+                                                              'client_errors': '', 'server_errors': ''})]
+        for name, row in rows:
+            latency = row['latency'] or {'median_ms': 0, 'p95_ms': 0, 'p99_ms': 0}
+            self.stdout.write(
+                f"{name:<16} {row['requests']:>8} {row['ok']:>6} {row['rejected']:>8} {row['client_errors']:>5} "
+                f"{row['server_errors']:>5} {latency['median_ms']:>8.2f} {latency['p95_ms']:>8.2f} "
+                f"{latency['p99_ms']:>8.2f}"
+            )
+        self.stdout.write("Written: " + ", ".join(f"{count} {name}" for name, count in result['written'].items()))
+        for problem in result['problems']:
+            self.stdout.write(self.style.ERROR(problem))
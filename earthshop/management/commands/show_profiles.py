@@ -0,0 +1,88 @@
+import io
+import pstats
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from earthshop.profiling import PROF, STACKS, file_view, list_profiles, profile_dir, read_stacks, stack_hotspots
+
+
+class Command(BaseCommand):
+    help = (
+        "List the request profiles written by earthshop.profiling.ProfilingMiddleware "
+        "and sum up their hotspots."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help="Profile files to use instead of the profile directory.")
+        parser.add_argument('--view', help="Only profiles of this URL name, e.g. sales:create_invoice.")
+        parser.add_argument('--min-ms', type=int, default=0, help="Only requests that took at least this long.")
+        parser.add_argument('--limit', type=int, default=20, help="Profiles to list (default 20).")
+        parser.add_argument('--summary', action='store_true',
+                            help="Sum up the hotspots of every matching profile instead of listing them.")
+        parser.add_argument('--top', type=int, default=20, help="Hotspots to show (default 20).")
+        parser.add_argument('--clear', action='store_true', help="Delete the matching profiles.")
+
+    def handle(self, *args, **options):
+        profiles = self.matching(options)
+        if options['clear']:
+            for profile in profiles:
+                profile.path.unlink(missing_ok=True)
+            self.stdout.write(self.style.SUCCESS(f"Deleted {len(profiles)} profile(s)."))
+            return
+        if not profiles:
+            self.stdout.write(f"No profiles in {profile_dir()} match.")
+            return
+        if options['summary']:
+            self.summary(profiles, options['top'])
+            return
+
+        self.stdout.write(f"{'taken':<26} {'ms':>7} {'kind':<7} {'view':<32} file")
+        for profile in profiles[:options['limit']]:
+            self.stdout.write(f"{profile.taken.isoformat(' ', 'seconds'):<26} {profile.ms:>7} {profile.kind:<7} "
+                              f"{profile.view:<32} {profile.path.name}")
+        if len(profiles) > options['limit']:
+            self.stdout.write(f"... and {len(profiles) - options['limit']} more (--limit).")
+
+    def matching(self, options):
+        if options['files']:
+            profiles = [profile for name in options['files'] for profile in self.named(Path(name))]
+        else:
+            profiles = list_profiles()
+        if options['view']:
+            profiles = [profile for profile in profiles if profile.view == file_view(options['view'])]
+        return [profile for profile in profiles if profile.ms >= options['min_ms']]
+
+    def named(self, path):
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        found = [profile for profile in list_profiles(path.parent) if profile.path.name == path.name]
+        if not found:
+            raise CommandError(f"{path} is not a profile written by the profiling middleware.")
+        return found
+
+    def summary(self, profiles, top):
+        stacks = [profile for profile in profiles if profile.path.suffix == STACKS]
+        cprofiles = [profile for profile in profiles if profile.path.suffix == PROF]
+        if stacks:
+            own, inclusive, total = stack_hotspots(read_stacks(profile.path)[1] for profile in stacks)
+            self.stdout.write(f"Sampled stacks: {len(stacks)} slow request(s), {total} samples "
+                              f"(median {sorted(p.ms for p in stacks)[len(stacks) // 2]} ms)")
+            self.stdout.write(f"\n{'self %':>7} {'total %':>8}  function (by time running)")
+            for frame, count in own.most_common(top):
+                self.stdout.write(f"{100 * count / total:>7.1f} {100 * inclusive[frame] / total:>8.1f}  {frame}")
+            # the framework is on every stack; this project's own code says more
+            packages = {path.name for path in Path(settings.BASE_DIR).iterdir() if path.is_dir()}
+            ours = [(frame, count) for frame, count in inclusive.most_common()
+                    if frame.split('/', 1)[0] in packages and count < total]
+            self.stdout.write(f"\n{'total %':>8}  project function (by time on the stack)")
+            for frame, count in ours[:top]:
+                self.stdout.write(f"{100 * count / total:>8.1f}  {frame}")
+        if cprofiles:
+            self.stdout.write(f"\ncProfile: {len(cprofiles)} sampled request(s)")
+            # pstats prints piecemeal, which self.stdout would break into lines
+            out = io.StringIO()
+            stats = pstats.Stats(*(str(profile.path) for profile in cprofiles), stream=out)
+            stats.strip_dirs().sort_stats('tottime').print_stats(top)
+            self.stdout.write(out.getvalue(), ending='')
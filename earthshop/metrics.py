@@ -0,0 +1,204 @@
+"""
+Runtime and business metrics in the Prometheus text exposition format.
+
+Counters and histograms live in this process's memory; recording one is
+a dict update under a lock, with nothing written to the database or a
+file on the request path. GET /metrics (earthshop.views.metrics) renders
+them together with values read at scrape time:
+
+    earthshop_http_request_duration_seconds{view,method}  histogram
+    earthshop_http_responses_total{view,status}           counter, status class (2xx...)
+    earthshop_db_queries_total{view}                      counter, SQL statements run by requests
+    earthshop_invoices_total                              counter
+    earthshop_stock_movements_total{direction}            counter, StockIn ("in") / StockOut ("out") rows
+    earthshop_backup_age_seconds                          gauge, +Inf without any backup
+    earthshop_database_size_bytes{file}                   gauge
+    earthshop_process_start_time_seconds                  gauge
+
+Rates ("invoices per second") are left to the server: rate(earthshop_invoices_total[5m]).
+Each worker process keeps its own counters; scrape every worker, or
+label them by instance, when the site runs more than one.
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+# seconds; Prometheus' defaults stretched to the slow report pages
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_local = threading.local()
+_started = time.time()
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with _lock:
+            values = dict(self.values)
+        for labels, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labels, labels)), value
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.values = {}  # labels -> [count per bucket..., +Inf count, sum]
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            row = self.values.get(labels)
+            if row is None:
+                row = self.values[labels] = [0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def samples(self):
+        with _lock:
+            values = {labels: list(row) for labels, row in self.values.items()}
+        for labels, row in sorted(values.items()):
+            base = dict(zip(self.labels, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), row):
+                cumulative += count
+                yield f'{self.name}_bucket', {**base, 'le': _number(bound)}, cumulative
+            yield f'{self.name}_sum', base, row[-1]
+            yield f'{self.name}_count', base, cumulative
+
+
+REQUEST_DURATION = Histogram('earthshop_http_request_duration_seconds', "Time to answer a request, by URL name.",
+                             ('view', 'method'))
+RESPONSES = Counter('earthshop_http_responses_total', "Responses by URL name and status class.", ('view', 'status'))
+QUERIES = Counter('earthshop_db_queries_total', "SQL statements run while answering requests.", ('view',))
+INVOICES = Counter('earthshop_invoices_total', "Invoices created.")
+STOCK_MOVEMENTS = Counter('earthshop_stock_movements_total', "Stock-in and stock-out rows written.", ('direction',))
+
+METRICS = (REQUEST_DURATION, RESPONSES, QUERIES, INVOICES, STOCK_MOVEMENTS)
+
+
+def count_query(execute, sql, params, many, context):
+    """Connection execute_wrapper counting statements for the current thread's request."""
+    _local.queries = getattr(_local, 'queries', 0) + 1
+    return execute(sql, params, many, context)
+
+
+def record_stock_movements(direction, rows):
+    """For bulk writes, which skip the post_save handlers that count single rows."""
+    if rows:
+        STOCK_MOVEMENTS.inc(direction, amount=rows)
+
+
+class MetricsMiddleware:
+    """Times every request and counts its queries; outermost, so it sees the whole stack."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = getattr(_local, 'queries', 0)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unmatched>'
+        REQUEST_DURATION.observe(elapsed, view, request.method)
+        RESPONSES.inc(view, f'{response.status_code // 100}xx')
+        ran = getattr(_local, 'queries', 0) - queries
+        if ran:
+            QUERIES.inc(view, amount=ran)
+        return response
+
+
+def backup_age():
+    """Seconds since the newest backup file or snapshot; None without any."""
+    from backup.backup_db import backup_dir
+    from backup.snapshots import snapshot_dir
+
+    newest = None
+    for path in (*backup_dir().glob('db_backup_*.sqlite3'), *(snapshot_dir() / 'manifests').glob('*.json')):
+        try:
+            modified = path.stat().st_mtime
+        except OSError:
+            continue
+        newest = modified if newest is None else max(newest, modified)
+    return None if newest is None else max(0.0, time.time() - newest)
+
+
+def database_sizes():
+    """{file: bytes}: the SQLite database and its WAL, or the whole PostgreSQL database."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_database_size(current_database())")
+            return {'database': cursor.fetchone()[0]}
+    if connection.vendor != 'sqlite':
+        return {}
+    sizes = {}
+    path = Path(str(connection.settings_dict['NAME']))
+    for name, file in (('database', path), ('wal', path.with_name(path.name + '-wal'))):
+        try:
+            sizes[name] = os.path.getsize(file)
+        except OSError:
+            continue  # in-memory database, or no WAL yet
+    return sizes
+
+
+def gauges():
+    """(name, help, labels, value) read at scrape time."""
+    age = backup_age()
+    rows = [('earthshop_backup_age_seconds', "Seconds since the newest backup or snapshot.", {},
+             math.inf if age is None else age)]
+    rows += [('earthshop_database_size_bytes', "Size of the database files.", {'file': name}, size)
+             for name, size in database_sizes().items()]
+    rows.append(('earthshop_process_start_time_seconds', "When this process started, as a Unix time.", {}, _started))
+    return rows
+
+
+def render():
+    """The text exposition format of every metric."""
+    lines = []
+    for metric in METRICS:
+        kind = 'histogram' if isinstance(metric, Histogram) else 'counter'
+        lines += [f'# HELP {metric.name} {metric.help}', f'# TYPE {metric.name} {kind}']
+        if isinstance(metric, Counter) and not metric.labels and not metric.values:
+            lines.append(f'{metric.name} 0')
+        lines += [_sample(name, labels, value) for name, labels, value in metric.samples()]
+    declared = set()
+    for name, help, labels, value in gauges():
+        if name not in declared:
+            declared.add(name)
+            lines += [f'# HELP {name} {help}', f'# TYPE {name} gauge']
+        lines.append(_sample(name, labels, value))
+    return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return '+Inf' if value == math.inf else repr(value)
+
+
+def _sample(name, labels, value):
+    if labels:
+        text = ','.join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+        return f'{name}{{{text}}} {_number(value)}'
+    return f'{name} {_number(value)}'
+
+
+def _escape(text):
+    return text.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
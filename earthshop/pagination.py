@@ -0,0 +1,89 @@
+"""
+Keyset (seek) pagination for lists ordered newest first on (-date, -id).
+
+Unlike Paginator there is no COUNT(*) and no OFFSET: a page is fetched
+by seeking past the (date, id) of the last row shown, so page 500 costs
+the same as page 1 as long as an index on (date, id) backs the ordering.
+Pages are addressed with opaque ?after= / ?before= cursors.
+"""
+import base64
+import datetime
+
+from django.db.models import Q
+
+DEFAULT_PER_PAGE = 20
+
+
+def encode_cursor(obj):
+    raw = f"{obj.date.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (date, id) for a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        date, pk = raw.split('|')
+        return datetime.date.fromisoformat(date), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """One page of rows plus the cursors of its neighbours."""
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.has_next and self.object_list else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.has_previous and self.object_list else None
+
+
+def older_than(date, pk):
+    """Filter for rows after (date, pk) in newest-first order."""
+    # the date__lte bound lets the (date, id) index start the scan at the cursor
+    return Q(date__lte=date) & (Q(date__lt=date) | Q(id__lt=pk))
+
+
+def keyset_paginate(queryset, request, per_page=DEFAULT_PER_PAGE):
+    """
+    Return the KeysetPage of `queryset` selected by request.GET
+    (?after=<cursor> for older rows, ?before=<cursor> for newer ones).
+    The queryset is re-ordered on (-date, -id).
+    """
+    after = decode_cursor(request.GET.get('after'))
+    before = decode_cursor(request.GET.get('before'))
+
+    if before:
+        # walk towards newer rows, then flip back to newest-first
+        date, pk = before
+        rows = list(
+            queryset.filter(Q(date__gte=date) & (Q(date__gt=date) | Q(id__gt=pk)))
+            .order_by('date', 'id')[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return KeysetPage(rows, has_next=True, has_previous=has_previous)
+
+    if after:
+        queryset = queryset.filter(older_than(*after))
+    rows = list(queryset.order_by('-date', '-id')[:per_page + 1])
+    return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=after is not None)
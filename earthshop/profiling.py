@@ -0,0 +1,245 @@
+"""
+Opt-in profiles of slow requests.
+
+Whether a request is slow is only known once it has finished, so while
+PROFILING_ENABLED is set every request is watched by a stack sampler: a
+single background thread that reads the request thread's stack every
+PROFILING_INTERVAL_MS (sys._current_frames) and counts the stacks it
+sees. That costs a registration per request and nothing at all while no
+request is in flight. A request that took PROFILING_THRESHOLD_MS or
+longer has its samples written out; the rest are dropped.
+
+PROFILING_SAMPLE_RATE additionally runs a fraction of requests (0.01 =
+1%) under cProfile and keeps those whatever their latency, for a
+deterministic picture of typical requests. Only one request is under
+cProfile at a time; a sampled request that overlaps it is watched by the
+stack sampler like any other.
+
+Files go to PROFILING_DIR, named <timestamp>_<view>_<ms>ms and rotated
+to the newest PROFILING_KEEP:
+
+    .stacks  collapsed stacks, "frame;frame;frame count" per line after a
+             few "# key: value" header lines (readable by flamegraph.pl
+             and speedscope)
+    .prof    cProfile output, for pstats / snakeviz
+
+`manage.py show_profiles` lists them and sums up the hotspots.
+"""
+import cProfile
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+MAX_DEPTH = 128
+STACKS, PROF = '.stacks', '.prof'
+
+_NAME = re.compile(r'^(?P<stamp>\d{8}T\d{6}\.\d{6})_(?P<view>.+)_(?P<ms>\d+)ms$')
+
+# one cProfile run per process: a profiler hooks the whole interpreter
+# (Python 3.12+ refuses a second one), so overlapping sampled requests
+# take the stack-sampler path instead
+_cprofile_lock = threading.Lock()
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def file_view(view_name):
+    """A URL name as it appears in profile file names ('sales:create_invoice' -> 'sales-create_invoice')."""
+    return re.sub(r'[^\w.-]+', '-', view_name)
+
+
+class StackSampler:
+    """Counts the stacks of registered threads, sampling only while any are registered."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.watched = {}  # thread ident -> (Counter of stacks, code object to stop at)
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def start(self, stop_at):
+        ident = threading.get_ident()
+        samples = Counter()
+        with self.lock:
+            self.watched[ident] = (samples, stop_at)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='earthshop-profiler', daemon=True)
+                self.thread.start()
+            self.wake.set()
+        return samples
+
+    def stop(self):
+        """Stop sampling this thread; its Counter is not written to once this returns."""
+        with self.lock:
+            self.watched.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                # counted under the lock, so stop() waits for a sample in progress
+                frames = sys._current_frames()
+                for ident, (samples, stop_at) in self.watched.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[_stack(frame, stop_at)] += 1
+                del frames
+                idle = not self.watched
+                if idle:
+                    # cleared under the lock, so a start() cannot slip in between
+                    self.wake.clear()
+            if idle:
+                self.wake.wait()
+            else:
+                time.sleep(self.interval)
+
+
+def _stack(frame, stop_at):
+    """Root-first tuple of 'file:function' names, up to the middleware's own frame."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        if code is stop_at:
+            break
+        names.append(f"{_short(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return tuple(reversed(names))
+
+
+def _short(filename):
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base):
+        return filename[len(base):].lstrip('/\\')
+    for marker in ('site-packages/', 'dist-packages/'):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return filename.rsplit('/', 2)[-1] if '/' in filename else filename
+
+
+class ProfilingMiddleware:
+    """Profiles slow (and sampled) requests; see the module docstring."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'PROFILING_THRESHOLD_MS', 1000) / 1000
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.keep = getattr(settings, 'PROFILING_KEEP', 200)
+        self.sampler = StackSampler(getattr(settings, 'PROFILING_INTERVAL_MS', 5) / 1000)
+        self.write_lock = threading.Lock()
+
+    def __call__(self, request):
+        if self.sample_rate and random.random() < self.sample_rate and _cprofile_lock.acquire(blocking=False):
+            try:
+                return self.profiled(request)
+            finally:
+                _cprofile_lock.release()
+
+        samples = self.sampler.start(ProfilingMiddleware.__call__.__code__)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.sampler.stop()
+        elapsed = time.perf_counter() - start
+        if elapsed >= self.threshold and samples:
+            self.save(request, elapsed, STACKS, lambda path: write_stacks(path, samples, {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'ms': round(elapsed * 1000),
+                'interval_ms': self.sampler.interval * 1000,
+            }))
+        return response
+
+    def profiled(self, request):
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        response = profiler.runcall(self.get_response, request)
+        elapsed = time.perf_counter() - start
+        self.save(request, elapsed, PROF, profiler.dump_stats)
+        return response
+
+    def save(self, request, elapsed, suffix, write):
+        match = getattr(request, 'resolver_match', None)
+        view = file_view(match.view_name if match else 'unmatched')
+        name = f"{datetime.now().strftime('%Y%m%dT%H%M%S.%f')}_{view}_{round(elapsed * 1000)}ms{suffix}"
+        directory = profile_dir()
+        with self.write_lock:
+            directory.mkdir(parents=True, exist_ok=True)
+            write(directory / name)
+            rotate(directory, self.keep)
+
+
+def write_stacks(path, samples, header):
+    lines = [f"# {key}: {value}" for key, value in header.items()]
+    lines += [f"{';'.join(stack)} {count}" for stack, count in samples.most_common() if stack]
+    Path(path).write_text('\n'.join(lines) + '\n')
+
+
+def rotate(directory, keep):
+    """Delete all but the newest `keep` profiles."""
+    for path in list_profiles(directory)[keep:]:
+        path.path.unlink(missing_ok=True)
+
+
+@dataclass
+class ProfileFile:
+    path: Path
+    taken: datetime
+    view: str
+    ms: int
+    kind: str
+
+
+def list_profiles(directory=None):
+    """ProfileFiles in `directory`, newest first."""
+    directory = directory or profile_dir()
+    profiles = []
+    for path in directory.glob('*'):
+        match = _NAME.match(path.stem)
+        if path.suffix not in (STACKS, PROF) or not match:
+            continue
+        profiles.append(ProfileFile(path, datetime.strptime(match['stamp'], '%Y%m%dT%H%M%S.%f'),
+                                    match['view'], int(match['ms']), path.suffix[1:]))
+    return sorted(profiles, key=lambda profile: profile.taken, reverse=True)
+
+
+def read_stacks(path):
+    """(header dict, Counter of stack tuples) of a .stacks file."""
+    header, samples = {}, Counter()
+    for line in Path(path).read_text().splitlines():
+        if line.startswith('# '):
+            key, _, value = line[2:].partition(': ')
+            header[key] = value
+        elif line.strip():
+            stack, _, count = line.rpartition(' ')
+            samples[tuple(stack.split(';'))] += int(count)
+    return header, samples
+
+
+def stack_hotspots(sample_sets):
+    """
+    ({frame: samples it was running}, {frame: samples it was on the
+    stack}, total samples) over several Counters of stacks.
+    """
+    own, inclusive, total = Counter(), Counter(), 0
+    for samples in sample_sets:
+        for stack, count in samples.items():
+            total += count
+            own[stack[-1]] += count
+            for frame in set(stack):
+                inclusive[frame] += count
+    return own, inclusive, total
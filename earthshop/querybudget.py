@@ -0,0 +1,286 @@
+"""
+Query budgets per URL.
+
+Every named URL in earthshop/urls.py has a maximum number of SQL queries
+a GET may run against the seeded dataset below (ROWS rows per list, so a
+query per row cannot hide under the budget). check_query_budgets()
+requests them all and reports the ones over budget, the ones that do not
+answer with their expected status (a page that errors is not within its
+budget), and the ones missing from QUERY_BUDGETS, so a new page cannot
+be added without a budget.
+
+Use from tests:
+
+    class PageQueryTests(QueryBudgetMixin, TestCase):
+        def test_budgets(self):
+            self.assertQueryBudgets()
+
+or from the command line against a scratch database:
+
+    python manage.py check_query_budgets
+"""
+import datetime
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.test import override_settings
+from django.urls import URLResolver, get_resolver, reverse
+
+from .instrumentation import QueryStats
+
+ROWS = 25
+
+# Budgets are ceilings for what a page is meant to run, not its current
+# count: a page may come in under its budget, and a query per row (ROWS
+# of them) still cannot fit under one. Logged-in pages load the session
+# and the user first.
+FORM = 3    # the auth queries plus a lookup or a choices list
+LIST = 5    # one page of rows with their joins, and the row count
+DETAIL = 6  # an object with its related rows
+
+# URL name -> max queries for a GET (None: not requestable with a GET)
+QUERY_BUDGETS = {
+    'home': 0,
+    'metrics': 0,
+    'login': FORM,
+    'logout': None,  # POST only
+    'password_change': FORM,
+    'password_change_done': FORM,
+    'password_reset': FORM,
+    'password_reset_done': FORM,
+    'password_reset_confirm': None,  # needs a real token
+    'password_reset_complete': FORM,
+
+    'products:add_category': FORM,
+    'products:product_list': LIST,
+    'products:add_product': FORM,
+    'products:product_search': FORM,
+    'products:update_product': FORM + 1,
+    'products:delete_product': FORM,
+    'products:add_stock': FORM,
+    'products:import_stock': FORM,
+    'products:stockin_list': LIST,
+    'products:stockin_detail': DETAIL,
+    'products:add_stock_out': FORM + 1,
+    'products:stockout_list': LIST,
+    'products:stockout_detail': FORM + 1,
+    'products:product_stockins': DETAIL,
+    'products:product_stockouts': DETAIL,
+
+    'customers:list': LIST,
+    'customers:add': FORM,
+    'customers:search': FORM,
+    'customers:ledger': DETAIL,
+    'customers:statement': FORM,
+    'customers:update': FORM,
+    'customers:ledger_add': None,  # POST only
+    'customers:ledger_pay': None,  # POST only
+
+    'banking:add': FORM,
+    'banking:list': LIST,
+    'banking:update': FORM,
+    'banking:view': FORM,
+
+    'sales:create_invoice': FORM,
+    'sales:invoice_list': LIST,
+    'sales:invoice_detail': DETAIL,
+    'sales:installment_list': DETAIL,
+    'sales:installment_add': FORM + 1,
+    'sales:installment_delete': None,  # POST only
+
+    'expenses:list': LIST,
+    'expenses:add': FORM,
+
+    'logs:list': LIST,
+    'logs:daily': DETAIL,
+    'logs:monthly': DETAIL,
+
+    # the open month is always aggregated live, plus receivables;
+    # closed months come from MonthlyReport, bounded by the first
+    # transaction (one MIN(date) per source table)
+    'reports:list': 12,
+    'reports:monthly': 18,
+
+    'ledger:index': FORM,
+    'ledger:list': FORM,
+
+    # per kind: the index, a substring top-up when it falls short, the rows
+    'search:query': DETAIL,
+}
+
+# URL name -> {url kwarg: key in seed()'s objects}
+URL_OBJECTS = {
+    'products:update_product': {'pk': 'product'},
+    'products:delete_product': {'pk': 'product'},
+    'products:stockin_detail': {'pk': 'stockin'},
+    'products:add_stock_out': {'product_id': 'product'},
+    'products:stockout_detail': {'pk': 'stockout'},
+    'products:product_stockins': {'product_id': 'product'},
+    'products:product_stockouts': {'product_id': 'product'},
+    'customers:ledger': {'pk': 'customer'},
+    'customers:statement': {'pk': 'customer'},
+    'customers:update': {'pk': 'customer'},
+    'customers:ledger_add': {'pk': 'customer'},
+    'customers:ledger_pay': {'pk': 'customer'},
+    'banking:update': {'pk': 'bank'},
+    'banking:view': {'pk': 'bank'},
+    'sales:invoice_detail': {'pk': 'invoice'},
+    'sales:installment_list': {'invoice_id': 'invoice'},
+    'sales:installment_add': {'invoice_id': 'invoice'},
+    'sales:installment_delete': {'pk': 'installment'},
+    'ledger:list': {'pk': 'customer'},
+}
+
+# query strings for views that do nothing useful without one
+URL_QUERY = {
+    'products:product_search': '?q=product',
+    'customers:search': '?q=customer',
+    'search:query': '?q=product',
+}
+
+# responses other than 200 that a working page gives
+URL_STATUS = {
+    'home': 302,
+}
+
+# settings and request headers a page needs to render
+URL_SETTINGS = {
+    'metrics': {'METRICS_ENABLED': True, 'METRICS_TOKEN': 'budget'},
+}
+URL_HEADERS = {
+    'metrics': {'Authorization': 'Bearer budget'},
+}
+
+
+@dataclass
+class BudgetResult:
+    name: str
+    path: str
+    status: int
+    queries: int
+    budget: int
+    repeated: int  # executions of a statement beyond its first
+    expected_status: int = 200
+
+    @property
+    def over(self):
+        return self.queries > self.budget
+
+    @property
+    def failed(self):
+        return self.status != self.expected_status
+
+
+def named_urls(urlconf=None):
+    """Names of every URL pattern outside the admin, namespaced."""
+    def walk(resolver, namespace):
+        for pattern in resolver.url_patterns:
+            if isinstance(pattern, URLResolver):
+                if pattern.app_name == 'admin':
+                    continue
+                inner = namespace
+                if pattern.namespace:
+                    inner = f"{namespace}:{pattern.namespace}" if namespace else pattern.namespace
+                yield from walk(pattern, inner)
+            elif pattern.name:
+                yield f"{namespace}:{pattern.name}" if namespace else pattern.name
+
+    return list(dict.fromkeys(walk(get_resolver(urlconf), None)))
+
+
+def seed(rows=ROWS):
+    """
+    A small dataset with `rows` rows in every list page, written through
+    the same code paths as the app. Returns {key: object} for URL_OBJECTS.
+    """
+    from banking.models import Bank
+    from customers.models import Customer, Ledger
+    from expenses.models import Expense, ExpenseCategory
+    from products.models import Category, Product, StockIn
+    from sales.models import InvoiceInstallment
+    from sales.services import commit_invoice
+
+    today = datetime.date.today()
+    category = Category.objects.create(name='Budget category')
+    products = [
+        Product.objects.create(category=category, name=f'Budget product {i}', buying_price=Decimal('10.00'))
+        for i in range(rows)
+    ]
+    for product in products:
+        StockIn.objects.create(product=product, buying_price_item=Decimal('10.00'),
+                               selling_price_item=Decimal('15.00'), stock_quantity=Decimal('100'), date=today)
+    customers = [Customer.objects.create(name=f'Budget customer {i}') for i in range(rows)]
+    for i in range(rows):
+        Ledger.objects.create(customer=customers[0], date=today, detail=f'Entry {i}',
+                              debit_amount=Decimal('5.00') if i % 2 else 0,
+                              credit_amount=0 if i % 2 else Decimal('3.00'))
+    banks = [Bank.objects.create(name=f'Budget bank {i}') for i in range(rows)]
+    invoices = [
+        commit_invoice([(products[i].pk, Decimal('1'), Decimal('15.00'))], date=today,
+                       payment_type='Installment', paid_amount=Decimal('5.00'), customer=customers[i])
+        for i in range(rows)
+    ]
+    installment = InvoiceInstallment.objects.create(invoice=invoices[0], paid_amount=Decimal('1.00'), date=today)
+    expense_category = ExpenseCategory.objects.create(name='Budget expenses')
+    for i in range(rows):
+        Expense.objects.create(category=expense_category, description=f'Expense {i}', amount=Decimal('2.00'), date=today)
+
+    return {
+        'product': products[0],
+        'stockin': products[0].stockin_product.first(),
+        'stockout': invoices[0].invoice_stockout.first(),
+        'customer': customers[0],
+        'bank': banks[0],
+        'invoice': invoices[0],
+        'installment': installment,
+    }
+
+
+def measure(client, path, headers=None):
+    """
+    (status, queries, repeated statements) for a repeat GET; the first
+    one warms what pages store on first use (e.g. closed report months).
+    """
+    client.get(path, headers=headers)
+    stats = QueryStats()
+    with stats.capture():
+        response = client.get(path, headers=headers)
+    return response.status_code, stats.count, stats.duplicate_count()
+
+
+def check_query_budgets(client, objects, budgets=None, names=None):
+    """
+    GET every budgeted URL with `client` (logged in as needed). Returns
+    (results, unbudgeted URL names).
+    """
+    budgets = QUERY_BUDGETS if budgets is None else budgets
+    all_names = named_urls()
+    unbudgeted = [name for name in all_names if name not in budgets]
+    results = []
+    for name in names or all_names:
+        budget = budgets.get(name)
+        if budget is None:
+            continue
+        kwargs = {kwarg: objects[key].pk for kwarg, key in URL_OBJECTS.get(name, {}).items()}
+        path = reverse(name, kwargs=kwargs) + URL_QUERY.get(name, '')
+        with override_settings(**URL_SETTINGS.get(name, {})):
+            status, queries, repeated = measure(client, path, URL_HEADERS.get(name))
+        results.append(BudgetResult(name, path, status, queries, budget, repeated, URL_STATUS.get(name, 200)))
+    return results, unbudgeted
+
+
+class QueryBudgetMixin:
+    """TestCase mixin: assertQueryBudgets() over every URL, logged in as a superuser."""
+
+    def assertQueryBudgets(self, budgets=None, names=None):
+        from django.contrib.auth import get_user_model
+        objects = seed()
+        user = get_user_model().objects.create_superuser(username='budget', password='budget', email='budget@example.com')
+        self.client.force_login(user)
+        results, unbudgeted = check_query_budgets(self.client, objects, budgets, names)
+        problems = [f"{r.name} ({r.path}): status {r.status}, expected {r.expected_status}"
+                    for r in results if r.failed]
+        problems += [f"{r.name} ({r.path}): {r.queries} queries, budget {r.budget}" for r in results if r.over]
+        problems += [f"{name}: no budget in earthshop.querybudget.QUERY_BUDGETS" for name in unbudgeted]
+        if problems:
+            self.fail("Query budgets exceeded:\n  " + "\n  ".join(problems))
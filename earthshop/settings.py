@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 
@@ -48,11 +49,20 @@ INSTALLED_APPS = [
     'logs',
     'reports',
     'users', 
+    'search',
+    'backup',
+    'earthshop',
 ]
 AUTH_USER_MODEL = 'users.CustomUser'
 
 MIDDLEWARE = [
+    # first, so the request latency it records covers every other middleware
+    'earthshop.metrics.MetricsMiddleware',
+    # off unless EARTHSHOP_PROFILING is set
+    'earthshop.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # outermost after security, so session and auth queries are counted too
+    'earthshop.instrumentation.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -85,12 +95,66 @@ WSGI_APPLICATION = 'earthshop.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# SQLite connection tuning for several tills writing at once. Every value
+# can be overridden per deployment with the EARTHSHOP_SQLITE_* variable
+# of the same name (e.g. EARTHSHOP_SQLITE_SYNCHRONOUS=FULL).
+# WAL lets readers run alongside the single writer; NORMAL sync is safe
+# under WAL (a power cut can lose the last commits, never corrupt).
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('EARTHSHOP_SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('EARTHSHOP_SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'mmap_size': int(os.environ.get('EARTHSHOP_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.environ.get('EARTHSHOP_SQLITE_CACHE_SIZE', -64000)),  # negative: KiB, so 64 MB
+    'temp_store': os.environ.get('EARTHSHOP_SQLITE_TEMP_STORE', 'MEMORY'),
 }
+# seconds a connection waits for the write lock before "database is locked"
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('EARTHSHOP_SQLITE_BUSY_TIMEOUT', 20))
+
+# SQLite by default. Set EARTHSHOP_DB_ENGINE=postgres (and EARTHSHOP_DB_NAME,
+# _USER, _PASSWORD, _HOST, _PORT) to share one PostgreSQL server between
+# branches; this needs psycopg (see requirements.txt). Move existing data
+# across with `manage.py copy_sqlite_data`.
+DB_ENGINE = os.environ.get('EARTHSHOP_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('EARTHSHOP_DB_NAME', 'earthshop'),
+            'USER': os.environ.get('EARTHSHOP_DB_USER', 'earthshop'),
+            'PASSWORD': os.environ.get('EARTHSHOP_DB_PASSWORD', ''),
+            'HOST': os.environ.get('EARTHSHOP_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('EARTHSHOP_DB_PORT', '5432'),
+            # seconds a connection is reused across requests (0: one per request)
+            'CONN_MAX_AGE': int(os.environ.get('EARTHSHOP_DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    # EARTHSHOP_DB_POOL_SIZE=N uses a psycopg connection pool of up to N
+    # connections per process instead; Django requires CONN_MAX_AGE=0 then
+    DB_POOL_SIZE = int(os.environ.get('EARTHSHOP_DB_POOL_SIZE', 0))
+    if DB_POOL_SIZE:
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': min(2, DB_POOL_SIZE),
+            'max_size': DB_POOL_SIZE,
+            'timeout': float(os.environ.get('EARTHSHOP_DB_POOL_TIMEOUT', 10)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+                'timeout': SQLITE_BUSY_TIMEOUT,
+                # take the write lock at BEGIN: a deferred transaction that reads
+                # first and then writes cannot wait for the lock, it fails at once
+                'transaction_mode': os.environ.get('EARTHSHOP_SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+            },
+        }
+    }
 
 
 # Password validation
@@ -142,3 +206,52 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.CustomUser'
 
+
+# Where manage.py backup_db writes its copies
+BACKUP_DIR = BASE_DIR / 'backup'
+
+# Snapshots kept by manage.py backup_db --incremental: the newest one per
+# hour / day / ISO week, for this many hours / days / weeks
+BACKUP_RETENTION = {'hourly': 24, 'daily': 7, 'weekly': 4}
+
+# How products.costing values stock going out: 'fifo' or 'average'
+COST_METHOD = os.environ.get('EARTHSHOP_COST_METHOD', 'fifo')
+
+# Per-request query counts / SQL time / repeated statements, logged to
+# 'earthshop.queries' (earthshop.instrumentation). The header adds
+# X-Query-Count, X-Query-Time and X-Query-Repeated to every response.
+QUERY_INSTRUMENTATION = os.environ.get('EARTHSHOP_QUERY_INSTRUMENTATION', str(DEBUG)).lower() in ('1', 'true', 'yes')
+QUERY_INSTRUMENTATION_HEADER = os.environ.get('EARTHSHOP_QUERY_HEADER', '').lower() in ('1', 'true', 'yes')
+QUERY_COUNT_WARNING = int(os.environ.get('EARTHSHOP_QUERY_COUNT_WARNING', 50))
+
+# In-memory request/business metrics served at /metrics (earthshop.metrics).
+# Scrapers must send `Authorization: Bearer <token>`; without a token the
+# metrics are off unless EARTHSHOP_METRICS turns them on, and even then
+# /metrics refuses every request until a token is set.
+METRICS_TOKEN = os.environ.get('EARTHSHOP_METRICS_TOKEN', '')
+METRICS_ENABLED = os.environ.get('EARTHSHOP_METRICS', '1' if METRICS_TOKEN else '').lower() in ('1', 'true', 'yes')
+
+# Profiles of slow requests (earthshop.profiling), listed and summed up by
+# `manage.py show_profiles`. Requests over the threshold keep a sampled
+# stack profile; PROFILING_SAMPLE_RATE of all requests also run under cProfile.
+PROFILING_ENABLED = os.environ.get('EARTHSHOP_PROFILING', '').lower() in ('1', 'true', 'yes')
+PROFILING_THRESHOLD_MS = int(os.environ.get('EARTHSHOP_PROFILING_THRESHOLD_MS', 1000))
+PROFILING_SAMPLE_RATE = float(os.environ.get('EARTHSHOP_PROFILING_SAMPLE_RATE', 0))
+PROFILING_INTERVAL_MS = float(os.environ.get('EARTHSHOP_PROFILING_INTERVAL_MS', 5))
+PROFILING_DIR = Path(os.environ.get('EARTHSHOP_PROFILING_DIR', BASE_DIR / 'profiles'))
+PROFILING_KEEP = int(os.environ.get('EARTHSHOP_PROFILING_KEEP', 200))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'earthshop.queries': {
+            'handlers': ['console'],
+            'level': os.environ.get('EARTHSHOP_QUERY_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
+
+from products.models import StockIn, StockOut
+from sales.models import Invoice
+from .metrics import INVOICES, STOCK_MOVEMENTS, count_query
+
+
+def install_query_counter(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def invoice_saved(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(INVOICES.inc)
+
+
+def movement_saved(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: STOCK_MOVEMENTS.inc('in' if sender is StockIn else 'out'))
+
+
+connection_created.connect(install_query_counter, dispatch_uid='earthshop_metrics_queries')
+post_save.connect(invoice_saved, sender=Invoice, dispatch_uid='earthshop_metrics_invoice')
+for model in (StockIn, StockOut):
+    post_save.connect(movement_saved, sender=model, dispatch_uid=f'earthshop_metrics_{model._meta.label}')
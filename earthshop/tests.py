@@ -0,0 +1,209 @@
+import datetime
+import tempfile
+import threading
+import time
+import unittest
+from collections import Counter
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from banking.models import Bank
+from expenses.models import Expense
+from products.models import Category
+from sales.models import Invoice
+from . import profiling
+from .management.commands.check_query_plans import QUERIES, query_plan
+from .management.commands.copy_sqlite_data import SOURCE_ALIAS
+from .metrics import MetricsMiddleware
+from .pagination import encode_cursor, keyset_paginate, older_than
+from .querybudget import URL_HEADERS, QueryBudgetMixin
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite's")
+class QueryPlanTests(TestCase):
+    def test_list_and_report_queries_use_an_index(self):
+        for label, build in QUERIES:
+            with self.subTest(label):
+                plan, scans = query_plan(build())
+                self.assertFalse(scans, f"{label} scans a table: {plan}")
+
+    def test_unindexed_query_is_reported(self):
+        _, scans = query_plan(Invoice.objects.filter(remaining_payment=Decimal('1.00')).order_by())
+        self.assertTrue(scans)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        day = datetime.date(2025, 6, 1)
+        # several rows per date, so the id tie-break matters
+        self.expenses = [
+            Expense.objects.create(description=f'Expense {i}', amount=Decimal('1.00'),
+                                   date=day + datetime.timedelta(days=i // 3))
+            for i in range(10)
+        ]
+        self.newest_first = sorted(self.expenses, key=lambda e: (e.date, e.pk), reverse=True)
+
+    def test_older_than(self):
+        cursor = self.newest_first[4]
+        older = Expense.objects.filter(older_than(cursor.date, cursor.pk)).order_by('-date', '-id')
+        self.assertEqual(list(older), self.newest_first[5:])
+
+    def test_walks_every_row_once(self):
+        seen, params = [], {}
+        while True:
+            page = keyset_paginate(Expense.objects.all(), RequestFactory().get('/', params), per_page=3)
+            seen += list(page)
+            if not page.has_next:
+                break
+            params = {'after': page.next_cursor}
+        self.assertEqual(seen, self.newest_first)
+
+    def test_previous_page(self):
+        request = RequestFactory().get('/', {'before': encode_cursor(self.newest_first[6])})
+        page = keyset_paginate(Expense.objects.all(), request, per_page=3)
+        self.assertEqual(list(page), self.newest_first[3:6])
+        self.assertTrue(page.has_previous)
+
+
+class PageQueryTests(QueryBudgetMixin, TestCase):
+    def test_budgets(self):
+        self.assertQueryBudgets()
+
+    def test_a_page_that_fails_is_not_within_budget(self):
+        with mock.patch.dict(URL_HEADERS, {'metrics': {}}):  # 403 without the token
+            with self.assertRaisesMessage(AssertionError, 'metrics (/metrics): status 403, expected 200'):
+                self.assertQueryBudgets(names=['metrics'])
+
+
+class MetricsEndpointTests(TestCase):
+    def scrape(self, **headers):
+        return self.client.get(reverse('metrics'), headers=headers)
+
+    @override_settings(METRICS_ENABLED=False, METRICS_TOKEN='secret')
+    def test_disabled(self):
+        self.assertEqual(self.scrape(authorization='Bearer secret').status_code, 404)
+        with self.assertRaises(MiddlewareNotUsed):
+            MetricsMiddleware(lambda request: HttpResponse())
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='')
+    def test_no_token_refuses_everyone(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(authorization='Bearer ').status_code, 403)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(authorization='Bearer wrong').status_code, 403)
+        response = self.scrape(authorization='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE', response.content)
+
+
+class CopySqliteDataTests(TransactionTestCase):
+    """copy_sqlite_data into the test database, whichever engine runs the suite."""
+    SOURCE = 'copy_source'
+
+    def setUp(self):
+        # both aliases are added at run time, after the test databases were set up
+        self.enterContext(mock.patch.object(type(self), 'databases', self.databases | {self.SOURCE, SOURCE_ALIAS}))
+        self.path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'source.sqlite3'
+        connections.settings[self.SOURCE] = connections.configure_settings({
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(self.path)},
+        })['default']
+        self.addCleanup(self.drop_source)
+        call_command('migrate', database=self.SOURCE, verbosity=0)
+
+        Category.objects.using(self.SOURCE).bulk_create([Category(name=f'Category {i}') for i in range(5)])
+        Category.objects.using(self.SOURCE).filter(name='Category 2').delete()  # a gap in the ids
+        Bank.objects.using(self.SOURCE).create(name='Habib', account_number='001')
+        group = Group.objects.using(self.SOURCE).create(name='Tills')
+        user = get_user_model().objects.db_manager(self.SOURCE).create_user(username='cashier', password='x')
+        user.groups.add(group)
+        Category.objects.create(name='Stale')  # already in the target
+
+    def drop_source(self):
+        connections[self.SOURCE].close()
+        del connections[self.SOURCE]
+        del connections.settings[self.SOURCE]
+
+    def copy(self):
+        call_command('copy_sqlite_data', '--source', str(self.path), '--noinput', '--batch-size', '2',
+                     stdout=StringIO())
+
+    def test_copy_replaces_the_target(self):
+        self.copy()
+        source_categories = list(Category.objects.using(self.SOURCE).order_by('pk').values_list('pk', 'name'))
+        self.assertEqual(list(Category.objects.order_by('pk').values_list('pk', 'name')), source_categories)
+        self.assertEqual(Bank.objects.get().account_number, '001')
+        self.assertEqual(list(get_user_model().objects.get(username='cashier').groups.values_list('name', flat=True)),
+                         ['Tills'])
+        self.assertEqual(ContentType.objects.get_for_model(Category).pk,
+                         ContentType.objects.db_manager(self.SOURCE).get_for_model(Category).pk)
+
+        # the id sequences continue after the copied rows
+        self.assertGreater(Category.objects.create(name='New').pk, source_categories[-1][0])
+        self.assertGreater(Group.objects.create(name='Managers').pk, Group.objects.get(name='Tills').pk)
+
+    def test_different_migrations_are_refused(self):
+        MigrationRecorder(connections[self.SOURCE]).record_unapplied('products', '0015_remove_product_stock')
+        with self.assertRaisesMessage(CommandError, 'not at the same migrations'):
+            self.copy()
+        self.assertEqual(list(Category.objects.values_list('name', flat=True)), ['Stale'])
+
+
+class StackSamplerTests(SimpleTestCase):
+    def test_no_samples_are_counted_after_stop(self):
+        sampling = threading.Event()
+
+        def slow_stack(frame, stop_at):
+            sampling.set()
+            time.sleep(0.05)
+            return ('view',)
+
+        sampler = profiling.StackSampler(0.001)
+        with mock.patch('earthshop.profiling._stack', slow_stack):
+            samples = sampler.start(None)
+            self.assertTrue(sampling.wait(1))
+            sampler.stop()  # while a sample is being taken
+            counted = Counter(samples)
+            time.sleep(0.1)
+        self.assertEqual(samples, counted)
+
+
+class ProfilingMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(
+            PROFILING_ENABLED=True, PROFILING_DIR=self.dir, PROFILING_SAMPLE_RATE=1.0,
+            PROFILING_THRESHOLD_MS=0, PROFILING_INTERVAL_MS=1,
+        ))
+
+        def view(request):
+            time.sleep(0.02)
+            return HttpResponse('ok')
+
+        self.middleware = profiling.ProfilingMiddleware(view)
+        self.request = RequestFactory().get('/')
+
+    def kinds(self):
+        return sorted(profile.kind for profile in profiling.list_profiles(self.dir))
+
+    def test_one_cprofile_at_a_time(self):
+        with profiling._cprofile_lock:  # another request is under cProfile
+            self.middleware(self.request)
+        self.assertEqual(self.kinds(), ['stacks'])
+        self.middleware(self.request)
+        self.assertEqual(self.kinds(), ['prof', 'stacks'])
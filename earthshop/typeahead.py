@@ -0,0 +1,43 @@
+"""
+Shared plumbing for the JSON typeahead endpoints used by the POS screen.
+Matching itself is done by search.services.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def parse_limit(request):
+    """Read ?limit= from the request, clamped to 1..MAX_LIMIT."""
+    try:
+        limit = int(request.GET.get('limit') or DEFAULT_LIMIT)
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def rows_in_order(queryset, ids):
+    """Fetch queryset.values() rows for `ids`, keeping the order of `ids`."""
+    rows = {row['id']: row for row in queryset.filter(id__in=ids)}
+    return [rows[pk] for pk in ids if pk in rows]
+
+
+def etag_json_response(request, payload):
+    """
+    JSON response with a content-hash ETag; answers 304 Not Modified when
+    the client already holds the same result for this query.
+    """
+    body = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+    etag = '"%s"' % hashlib.md5(body.encode()).hexdigest()
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
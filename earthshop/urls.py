@@ -15,8 +15,9 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.contrib.auth import views as auth_views
 from django.urls import path, include
-from .views import home_redirect  # <-- Add this import
+from .views import home_redirect, metrics  # <-- Add this import
 
 
 
@@ -33,9 +34,12 @@ urlpatterns = [
     path('logs/', include('logs.urls', namespace='logs')),
     path('reports/', include('reports.urls', namespace='reports')),
     path('ledger/', include('ledger.urls', namespace='ledger')),
+    path('search/', include('search.urls', namespace='search')),
 
      path('', home_redirect, name='home'),
+    path('metrics', metrics, name='metrics'),
 
     # Built-in auth views to support {% url 'login' %} / {% url 'logout' %}
+    path('login/', auth_views.LoginView.as_view(template_name='users/login.html'), name='login'),
     path('', include('django.contrib.auth.urls')),
 ]
\ No newline at end of file
@@ -1,4 +1,21 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
 from django.shortcuts import redirect
+from django.utils.crypto import constant_time_compare
+
+from .metrics import render as render_metrics
+
 
 def home_redirect(request):
-    return redirect('products:product_list')  
\ No newline at end of file
+    return redirect('products:product_list')  
+
+
+def metrics(request):
+    """Prometheus scrape target, only for `Authorization: Bearer <METRICS_TOKEN>`."""
+    if not getattr(settings, 'METRICS_ENABLED', False):
+        raise Http404("Metrics are disabled.")
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    # no token means no access, not open access
+    if not token or not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden("Forbidden\n", content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -19,5 +19,11 @@ class Expense(models.Model):
         default='cash'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='expense_date_id_idx'),
+            models.Index(fields=['category', '-date'], name='expense_category_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.description} - {self.amount}"
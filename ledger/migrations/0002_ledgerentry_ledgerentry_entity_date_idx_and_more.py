@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['entity_type', 'entity_name', '-date', '-id'], name='ledgerentry_entity_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['-date', '-id'], name='ledgerentry_date_id_idx'),
+        ),
+    ]
@@ -21,6 +21,12 @@ class LedgerEntry(models.Model):
         default='cash'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['entity_type', 'entity_name', '-date', '-id'], name='ledgerentry_entity_date_idx'),
+            models.Index(fields=['-date', '-id'], name='ledgerentry_date_id_idx'),
+        ]
+
     def balance(self):
         return self.debit - self.credit
 
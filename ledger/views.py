@@ -1,9 +1,12 @@
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, render
+
+from customers.models import Customer
 
 def index(request):
     return render(request, 'ledger/index.html')
 
 
 
-def ledger(request):
-    return render(request, 'ledger/ledger_list.html')
\ No newline at end of file
+def ledger(request, pk):
+    customer = get_object_or_404(Customer, pk=pk)
+    return render(request, 'ledger/ledger_list.html', {'customer': customer})
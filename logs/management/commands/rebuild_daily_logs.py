@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from logs.models import DailyLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every DailyLog row from invoices, installments, stock-ins and expenses "
+        "in one grouped pass per table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report days whose rollup drifted; exit with an error if any are found.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            totals = DailyLog.totals_from_history()
+            existing = DailyLog.objects.select_for_update().in_bulk(field_name='date')
+
+            zero = {column: 0 for column in DailyLog.TOTALS}
+            drifted = []
+            for date in sorted(set(totals) | set(existing)):
+                expected = totals.get(date, zero)
+                log = existing.get(date)
+                actual = {column: getattr(log, column) for column in DailyLog.TOTALS} if log else zero
+                if any(actual[column] != expected[column] for column in DailyLog.TOTALS):
+                    drifted.append((date, actual, expected))
+
+            for date, actual, expected in drifted:
+                changes = ", ".join(
+                    f"{column} {actual[column]} -> {expected[column]}"
+                    for column in DailyLog.TOTALS if actual[column] != expected[column]
+                )
+                self.stdout.write(f"{date}: {changes}")
+
+            if options['check']:
+                if drifted:
+                    raise CommandError(f"{len(drifted)} day(s) have a drifted rollup.")
+                self.stdout.write(self.style.SUCCESS("Daily logs match the transaction tables."))
+                return
+
+            to_update, to_create = [], []
+            for date, _, expected in drifted:
+                log = existing.get(date)
+                if log is None:
+                    to_create.append(DailyLog(date=date, **expected))
+                    continue
+                for column, value in expected.items():
+                    setattr(log, column, value)
+                to_update.append(log)
+            DailyLog.objects.bulk_update(to_update, DailyLog.TOTALS, batch_size=500)
+            DailyLog.objects.bulk_create(to_create, batch_size=500)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt daily logs; {len(drifted)} day(s) corrected."))
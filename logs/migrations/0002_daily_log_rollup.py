@@ -0,0 +1,96 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:02
+
+from decimal import Decimal
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+TOTALS = ('invoice_count', 'total_sales', 'installments_received', 'total_purchases', 'total_expenses')
+
+
+def merge_duplicate_days(apps, schema_editor):
+    # date becomes unique; fold hand-entered duplicates into the oldest row
+    db = schema_editor.connection.alias
+    DailyLog = apps.get_model('logs', 'DailyLog')
+    keep = {}
+    for log in DailyLog.objects.using(db).order_by('date', 'id'):
+        first = keep.setdefault(log.date, log)
+        if first is log:
+            continue
+        if log.notes:
+            first.notes = "\n".join(filter(None, [first.notes, log.notes]))
+            first.save(update_fields=['notes'])
+        log.delete()
+
+
+def backfill_daily_logs(apps, schema_editor):
+    db = schema_editor.connection.alias
+    DailyLog = apps.get_model('logs', 'DailyLog')
+    sources = [
+        (apps.get_model('sales', 'Invoice'), {'invoice_count': Count('id'), 'total_sales': Sum('grand_total')}),
+        (apps.get_model('sales', 'InvoiceInstallment'), {'installments_received': Sum('paid_amount')}),
+        (apps.get_model('products', 'StockIn'), {'total_purchases': Sum('total_buying_amount')}),
+        (apps.get_model('expenses', 'Expense'), {'total_expenses': Sum('amount')}),
+    ]
+    totals = {}
+    for model, aggregates in sources:
+        for row in model.objects.using(db).order_by().values('date').annotate(**aggregates):
+            day = totals.setdefault(row.pop('date'), {column: 0 for column in TOTALS})
+            day.update({column: value or Decimal('0') for column, value in row.items()})
+
+    existing = DailyLog.objects.using(db).in_bulk(field_name='date')
+    for date, log in existing.items():
+        for column, value in totals.pop(date, {}).items():
+            setattr(log, column, value)
+    DailyLog.objects.using(db).bulk_update(existing.values(), TOTALS, batch_size=500)
+    DailyLog.objects.using(db).bulk_create([DailyLog(date=date, **day) for date, day in totals.items()], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0001_initial'),
+        ('expenses', '0002_expense_expense_date_id_idx_and_more'),
+        ('products', '0012_stockin_stockin_product_date_idx_and_more'),
+        ('sales', '0007_invoice_installments_paid'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='dailylog',
+            options={'ordering': ['-date']},
+        ),
+        migrations.AddField(
+            model_name='dailylog',
+            name='installments_received',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='dailylog',
+            name='invoice_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailylog',
+            name='total_purchases',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(merge_duplicate_days, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='dailylog',
+            name='date',
+            field=models.DateField(default=django.utils.timezone.now, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='dailylog',
+            name='total_expenses',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='dailylog',
+            name='total_sales',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(backfill_daily_logs, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,23 @@
+from decimal import ROUND_HALF_UP, Decimal
+
 from django.db import models
+from django.db.models import Count, F, Sum
 from django.utils import timezone
 
+from expenses.models import Expense
+from products.models import StockIn
+from sales.models import Invoice, InvoiceInstallment
+
+CENT = Decimal('0.01')
+
+
+def _cents(value):
+    """An aggregate as an exact amount: SQLite sums decimals as floats."""
+    if value is None:
+        return Decimal('0.00')
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
 class StockLog(models.Model):
     LOG_TYPE_CHOICES = [
         ('in', 'Stock In'),
@@ -16,10 +33,58 @@ class StockLog(models.Model):
         return f"{self.product.name} - {self.log_type} ({self.date})"
 
 class DailyLog(models.Model):
-    date = models.DateField(default=timezone.now)
-    total_sales = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    total_expenses = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    """
+    Per-day totals, kept up to date by logs.signals as invoices,
+    installments, expenses and stock-ins are written, so the log pages
+    never scan the transaction tables. `manage.py rebuild_daily_logs`
+    recomputes them from history.
+    """
+    date = models.DateField(default=timezone.now, unique=True)
+    invoice_count = models.IntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    installments_received = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_purchases = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_expenses = models.DecimalField(max_digits=14, decimal_places=2, default=0)
     notes = models.TextField(blank=True, null=True)
 
+    TOTALS = ('invoice_count', 'total_sales', 'installments_received', 'total_purchases', 'total_expenses')
+
+    class Meta:
+        ordering = ['-date']
+
     def __str__(self):
         return f"Daily Log - {self.date}"
+
+    @classmethod
+    def post(cls, date, **deltas):
+        """
+        Add deltas (column -> amount) to the row for `date`, creating it if
+        needed. F() updates, so concurrent writers cannot lose each other.
+        """
+        deltas = {column: delta for column, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        updates = {column: F(column) + delta for column, delta in deltas.items()}
+        if not cls.objects.filter(date=date).update(**updates):
+            cls.objects.get_or_create(date=date)
+            cls.objects.filter(date=date).update(**updates)
+
+    @staticmethod
+    def totals_from_history():
+        """
+        {date: {column: total}} from one grouped query per source table,
+        amounts quantized to the cent like the DailyLog columns.
+        """
+        sources = [
+            (Invoice, {'invoice_count': Count('id'), 'total_sales': Sum('grand_total')}),
+            (InvoiceInstallment, {'installments_received': Sum('paid_amount')}),
+            (StockIn, {'total_purchases': Sum('total_buying_amount')}),
+            (Expense, {'total_expenses': Sum('amount')}),
+        ]
+        totals = {}
+        for model, aggregates in sources:
+            for row in model.objects.order_by().values('date').annotate(**aggregates):
+                day = totals.setdefault(row.pop('date'), {column: 0 for column in DailyLog.TOTALS})
+                day.update({column: value if column == 'invoice_count' else _cents(value)
+                            for column, value in row.items()})
+        return totals
@@ -0,0 +1,57 @@
+# logs/signals.py
+from decimal import Decimal
+
+from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from expenses.models import Expense
+from products.models import StockIn
+from sales.models import Invoice, InvoiceInstallment
+from .models import DailyLog
+
+# model -> (DailyLog column, amount field); invoices also count towards invoice_count
+ROLLUPS = {
+    Invoice: ('total_sales', 'grand_total'),
+    InvoiceInstallment: ('installments_received', 'paid_amount'),
+    StockIn: ('total_purchases', 'total_buying_amount'),
+    Expense: ('total_expenses', 'amount'),
+}
+
+_to_date = models.DateField().to_python
+
+
+def _contribution(sender, date, amount, sign=1):
+    column = ROLLUPS[sender][0]
+    deltas = {column: sign * Decimal(str(amount or 0))}
+    if sender is Invoice:
+        deltas['invoice_count'] = sign
+    DailyLog.post(_to_date(date), **deltas)
+
+
+def remember_previous(sender, instance, **kwargs):
+    # the values the row had before this save, to take them back out
+    instance._daily_log_previous = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._daily_log_previous = (
+            sender.objects.filter(pk=instance.pk).values_list('date', ROLLUPS[sender][1]).first()
+        )
+
+
+def rollup_saved(sender, instance, created, **kwargs):
+    current = (_to_date(instance.date), Decimal(str(getattr(instance, ROLLUPS[sender][1]) or 0)))
+    previous = getattr(instance, '_daily_log_previous', None)
+    if previous is not None:
+        if (_to_date(previous[0]), Decimal(str(previous[1] or 0))) == current:
+            return
+        _contribution(sender, *previous, sign=-1)
+    _contribution(sender, *current)
+
+
+def rollup_deleted(sender, instance, **kwargs):
+    _contribution(sender, instance.date, getattr(instance, ROLLUPS[sender][1]), sign=-1)
+
+
+for model in ROLLUPS:
+    pre_save.connect(remember_previous, sender=model, dispatch_uid=f'daily_log_pre_{model._meta.label}')
+    post_save.connect(rollup_saved, sender=model, dispatch_uid=f'daily_log_save_{model._meta.label}')
+    post_delete.connect(rollup_deleted, sender=model, dispatch_uid=f'daily_log_delete_{model._meta.label}')
@@ -1,3 +1,63 @@
+import datetime
+import random
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from expenses.models import Expense
+from .models import DailyLog
+
+DAY = datetime.date(2025, 3, 14)
+
+
+class TotalsFromHistoryTests(TestCase):
+    def setUp(self):
+        # enough cents for SQLite's float sum to drift below the cent
+        rng = random.Random(1)
+        Expense.objects.bulk_create([
+            Expense(description='Fuel', amount=Decimal(rng.randint(1, 10 ** 7)) / 100, date=DAY) for _ in range(5000)
+        ])
+        self.expected = sum(Expense.objects.values_list('amount', flat=True))
+
+    def test_totals_are_exact(self):
+        total = DailyLog.totals_from_history()[DAY]['total_expenses']
+        self.assertEqual(total, self.expected)
+        self.assertEqual(total.as_tuple().exponent, -2)
+
+    def test_rebuild_writes_and_checks_exact_totals(self):
+        # bulk_create() skipped the signals, so the day is missing
+        call_command('rebuild_daily_logs', stdout=StringIO())
+        self.assertEqual(DailyLog.objects.get(date=DAY).total_expenses, self.expected)
+        out = StringIO()
+        call_command('rebuild_daily_logs', '--check', stdout=out)
+        self.assertIn('match', out.getvalue())
+
+
+class LogPagesTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser(username='owner', password='owner', email='owner@example.com')
+        self.client.force_login(user)
+
+    def test_daily_out_of_range_month_shows_this_month(self):
+        this_month = timezone.localdate().replace(day=1)
+        for month in ('9999-12', '0000-01', '0001-01', '2025-13', 'soon'):
+            with self.subTest(month=month):
+                response = self.client.get(reverse('logs:daily'), {'month': month})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['month'], this_month)
+        response = self.client.get(reverse('logs:daily'), {'month': '2025-03'})
+        self.assertEqual(response.context['month'], datetime.date(2025, 3, 1))
 
-# Create your tests here.
+    def test_monthly_out_of_range_year_shows_this_year(self):
+        for year in ('0', '1', '9999', '99999', '-5', 'soon'):
+            with self.subTest(year=year):
+                response = self.client.get(reverse('logs:monthly'), {'year': year})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['year'], timezone.localdate().year)
+        response = self.client.get(reverse('logs:monthly'), {'year': '2025'})
+        self.assertEqual(response.context['year'], 2025)
@@ -1,10 +1,63 @@
+import datetime
+
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
 from django.shortcuts import render
+from django.utils import timezone
+
+from .models import DailyLog
+
 
 def index(request):
     return render(request, 'logs/index.html')
 
+
+def _totals(rows):
+    return rows.aggregate(**{column: Sum(column) for column in DailyLog.TOTALS})
+
+
+def _in_range(year):
+    """Whether the pages can show `year` and link to the years either side of it."""
+    return datetime.MINYEAR < year < datetime.MAXYEAR
+
+
 def daily_logs(request):
-    return render(request, 'logs/daily.html')
+    """ One row per day of the selected month (?month=YYYY-MM), read from DailyLog. """
+    try:
+        month = datetime.datetime.strptime(request.GET.get('month', ''), '%Y-%m').date()
+        if not _in_range(month.year):
+            raise ValueError(month)
+    except ValueError:
+        month = timezone.localdate().replace(day=1)
+    next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+    logs = DailyLog.objects.filter(date__gte=month, date__lt=next_month).order_by('-date')
+    return render(request, 'logs/daily.html', {
+        'logs': logs,
+        'totals': _totals(logs),
+        'month': month,
+        'previous_month': (month - datetime.timedelta(days=1)).replace(day=1),
+        'next_month': next_month,
+    })
+
 
 def monthly_logs(request):
-    return render(request, 'logs/monthly.html')
+    """ Month totals for the selected year (?year=YYYY), summed from the DailyLog rows. """
+    try:
+        year = int(request.GET.get('year', ''))
+        if not _in_range(year):
+            raise ValueError(year)
+    except ValueError:
+        year = timezone.localdate().year
+
+    logs = DailyLog.objects.filter(date__year=year)
+    months = (
+        logs.annotate(month=TruncMonth('date')).values('month')
+        .annotate(**{column: Sum(column) for column in DailyLog.TOTALS})
+        .order_by('-month')
+    )
+    return render(request, 'logs/monthly.html', {
+        'months': months,
+        'totals': _totals(logs),
+        'year': year,
+    })
@@ -1,15 +1,51 @@
-
 # Register your models here.
-from django.contrib import admin
-from .models import Category, Product, StockIn, StockOut
+from django.contrib import admin, messages
+from django.template.response import TemplateResponse
+
+from .forms import RepriceForm
+from .models import Category, PriceChange, Product, StockIn, StockOut
+from .repricing import apply_reprice, preview
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'description')
+    actions = ['reprice']
+
+    @admin.action(description="Re-price selected categories", permissions=['change'])
+    def reprice(self, request, queryset):
+        """
+        Intermediate page: fill in the adjustment, preview the affected
+        rows, then apply. Returning None goes back to the changelist.
+        """
+        categories = list(queryset)
+        form = RepriceForm(request.POST if 'target' in request.POST else None)
+        changes = None
+        if form.is_valid():
+            data = form.cleaned_data
+            if 'apply' in request.POST:
+                change = apply_reprice(categories, data['target'], data['mode'], data['value'],
+                                       user=request.user, note=data['note'])
+                self.message_user(
+                    request,
+                    f"Re-priced {change.products_changed} products and {change.stockins_changed} stock-in batches.",
+                    messages.SUCCESS,
+                )
+                return None
+            changes = preview(categories, data['target'], data['mode'], data['value'])
+
+        return TemplateResponse(request, 'admin/products/category/reprice.html', {
+            **self.admin_site.each_context(request),
+            'title': "Re-price categories",
+            'opts': self.model._meta,
+            'categories': categories,
+            'form': form,
+            'changes': changes,
+            'action_checkbox_name': admin.helpers.ACTION_CHECKBOX_NAME,
+        })
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category','quantity', 'stock', 'date')
+    list_display = ('name', 'category','quantity', 'on_hand', 'date')
     list_filter = ('category',)
     search_fields = ('name', 'company')
 
@@ -24,4 +60,15 @@ class StockInAdmin(admin.ModelAdmin):
 class StockOutAdmin(admin.ModelAdmin):
     list_display = ('id', 'product', 'stock_out_quantity', 'invoice', 'date')
     list_filter = ('date', 'product')
-    search_fields = ('product__name',)
\ No newline at end of file
+    search_fields = ('product__name',)
+
+@admin.register(PriceChange)
+class PriceChangeAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'target', 'mode', 'value', 'categories', 'products_changed', 'stockins_changed', 'user')
+    list_filter = ('target', 'mode')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
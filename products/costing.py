@@ -0,0 +1,186 @@
+"""
+Cost layers.
+
+Every StockIn is a batch with a unit cost (buying price plus buying
+percent) and a remaining_quantity. Stock going out consumes batches
+oldest first, and the cost of what it took is stored on the StockOut and
+on the invoice line, so cost of goods sold is a plain SUM over sale lines
+instead of a replay of the product's history.
+
+settings.COST_METHOD picks how consumed units are valued:
+
+    'fifo'     at the cost of the batches they came from;
+    'average'  at the weighted average cost of the batches still in stock
+               (quantities are still drawn oldest first).
+
+Units taken beyond the recorded batches (a manual stock-out larger than
+what was received) are valued at Product.buying_price. Costs are fixed when stock
+goes out; after back-dated corrections `manage.py rebuild_cost_layers`
+replays the history.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Sum
+
+from .models import Product, StockIn
+
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+METHODS = ('fifo', 'average')
+
+
+def cost_method():
+    method = getattr(settings, 'COST_METHOD', 'fifo')
+    if method not in METHODS:
+        raise ValueError(f"COST_METHOD must be one of {', '.join(METHODS)}, not {method!r}")
+    return method
+
+
+def unit_cost(total_buying_amount, stock_quantity):
+    """Cost of one unit of a batch."""
+    if not stock_quantity:
+        return ZERO
+    return Decimal(total_buying_amount or 0) / Decimal(stock_quantity)
+
+
+def _draw(layers, qty, method, fallback):
+    """
+    Take `qty` units from `layers` (dicts with 'remaining' and 'unit_cost',
+    oldest first), decrementing their 'remaining'. Returns the cost.
+    """
+    qty = Decimal(qty)
+    rate = None
+    if method == 'average':
+        stocked = sum((layer['remaining'] for layer in layers), ZERO)
+        value = sum((layer['remaining'] * layer['unit_cost'] for layer in layers), ZERO)
+        rate = value / stocked if stocked else fallback
+
+    cost = ZERO
+    for layer in layers:
+        if qty <= 0:
+            break
+        taken = min(layer['remaining'], qty)
+        if taken <= 0:
+            continue
+        layer['remaining'] -= taken
+        qty -= taken
+        cost += taken * (layer['unit_cost'] if rate is None else rate)
+    if qty > 0:
+        # nothing recorded to draw from
+        cost += qty * (fallback if rate is None else rate)
+    return cost.quantize(CENT)
+
+
+def consume(lines):
+    """
+    Consume batches for [(product_id, qty), ...], in order, and return the
+    cost of each line. The open batches of all the products are read with
+    one query and written back with one bulk UPDATE, however many lines
+    there are. Must run inside the transaction that writes the stock-outs.
+    """
+    method = cost_method()
+    product_ids = {product_id for product_id, _ in lines}
+    open_layers = StockIn.objects.filter(product_id__in=product_ids, remaining_quantity__gt=0)
+    if connection.features.has_select_for_update:
+        open_layers = open_layers.select_for_update()
+
+    layers = {}
+    rows = open_layers.order_by('date', 'id').values_list(
+        'pk', 'product_id', 'remaining_quantity', 'total_buying_amount', 'stock_quantity')
+    for pk, product_id, remaining, total, quantity in rows:
+        layers.setdefault(product_id, []).append({
+            'pk': pk, 'remaining': remaining, 'start': remaining, 'unit_cost': unit_cost(total, quantity),
+        })
+    fallback = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'buying_price'))
+
+    costs = [
+        _draw(layers.get(product_id, []), qty, method, fallback.get(product_id) or ZERO)
+        for product_id, qty in lines
+    ]
+
+    touched = [
+        StockIn(pk=layer['pk'], remaining_quantity=layer['remaining'])
+        for product_layers in layers.values() for layer in product_layers
+        if layer['remaining'] != layer['start']
+    ]
+    StockIn.objects.bulk_update(touched, ['remaining_quantity'], batch_size=500)
+    return costs
+
+
+def release(product_id, qty):
+    """
+    Put `qty` units of a deleted stock-out back into the batches, most
+    recently consumed first. Call after on_hand has been credited: units
+    that were costed at the fallback price never left a batch, so no more
+    goes back than on_hand exceeds what the batches already hold.
+    """
+    on_hand = Product.objects.filter(pk=product_id).values_list('on_hand', flat=True).first() or ZERO
+    held = StockIn.objects.filter(product_id=product_id).aggregate(total=Sum('remaining_quantity'))['total'] or ZERO
+    qty = min(Decimal(qty), on_hand - held)
+    layers = (
+        StockIn.objects.filter(product_id=product_id, remaining_quantity__lt=F('stock_quantity'))
+        .order_by('-date', '-id').values_list('pk', 'remaining_quantity', 'stock_quantity')
+    )
+    touched = []
+    for pk, remaining, quantity in layers:
+        if qty <= 0:
+            break
+        returned = min(quantity - remaining, qty)
+        touched.append(StockIn(pk=pk, remaining_quantity=remaining + returned))
+        qty -= returned
+    StockIn.objects.bulk_update(touched, ['remaining_quantity'])
+
+
+def replay(stockins, stockouts, fallback, method='fifo'):
+    """
+    Cost layers recomputed from the full history.
+
+    `stockins` are (id, product_id, date, stock_quantity,
+    total_buying_amount) rows, `stockouts` (id, product_id, date,
+    stock_out_quantity) rows and `fallback` {product_id: buying_price}.
+    On the same day receipts come before sales. Returns
+    ({stockin_id: remaining_quantity}, {stockout_id: cost}).
+    """
+    events = {}
+    for pk, product_id, date, quantity, total in stockins:
+        events.setdefault(product_id, []).append((date, 0, pk, quantity, total))
+    for pk, product_id, date, quantity in stockouts:
+        events.setdefault(product_id, []).append((date, 1, pk, quantity, None))
+
+    remaining, costs = {}, {}
+    for product_id, product_events in events.items():
+        layers = []
+        for _, is_out, pk, quantity, total in sorted(product_events):
+            if is_out:
+                open_layers = [layer for layer in layers if layer['remaining'] > 0]
+                costs[pk] = _draw(open_layers, quantity, method, fallback.get(product_id) or ZERO)
+            else:
+                layers.append({'pk': pk, 'remaining': Decimal(quantity or 0),
+                               'unit_cost': unit_cost(total, quantity)})
+        remaining.update((layer['pk'], layer['remaining']) for layer in layers)
+    return remaining, costs
+
+
+def line_costs(items, stockout_costs):
+    """
+    Cost of each invoice line from the stock-outs of its invoice.
+
+    `items` are (id, invoice_id, product_id, quantity, buying_price) rows
+    and `stockout_costs` (invoice_id, product_id, cost) rows, both in id
+    order; commit_invoice writes one stock-out per line in line order, so
+    the n-th line of a product is paired with its n-th stock-out. Lines
+    without one are costed at the product's buying price.
+    """
+    queues = {}
+    for invoice_id, product_id, cost in stockout_costs:
+        queues.setdefault((invoice_id, product_id), []).append(cost)
+    costs = {}
+    for pk, invoice_id, product_id, quantity, buying_price in items:
+        queue = queues.get((invoice_id, product_id))
+        if queue:
+            costs[pk] = queue.pop(0)
+        else:
+            costs[pk] = (Decimal(quantity or 0) * (buying_price or ZERO)).quantize(CENT)
+    return costs
@@ -1,6 +1,7 @@
 
 from django import forms
-from .models import Category, Product, StockIn, StockOut
+from earthshop.imports import ImportFormatError, import_format
+from .models import Category, PriceChange, Product, StockIn, StockOut
 
 class CategoryForm(forms.ModelForm):
     class Meta:
@@ -12,13 +13,12 @@ class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
         fields = [
-            'category', 'name', 'stock', 'quantity',
+            'category', 'name', 'quantity',
             'buying_price',  'date'
         ]
         widgets = {
             'category': forms.Select(attrs={'class': 'select select-bordered w-full'}),
             'name': forms.TextInput(attrs={'class': 'input input-bordered', 'placeholder': 'Product name'}),
-            'stock': forms.NumberInput(attrs={'class': 'input input-bordered', 'min': '0'}),
             'quantity': forms.NumberInput(attrs={'class': 'input input-bordered', 'min': '0'}),
             'buying_price': forms.NumberInput(attrs={'class': 'input input-bordered', 'step': '0.01', 'min': '0'}),
             
@@ -55,4 +55,42 @@ class StockOutForm(forms.ModelForm):
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date', 'class': 'input input-bordered w-full'}),
             'stock_out_quantity': forms.NumberInput(attrs={'class': 'input input-bordered w-full', 'min': '1'}),
-        }
\ No newline at end of file
+        }
+
+class StockImportForm(forms.Form):
+    file = forms.FileField(
+        help_text="CSV or XLSX with columns product, category, quantity, buying_price, "
+                  "buying_percent, selling_price, date (first row = column names).",
+        widget=forms.ClearableFileInput(attrs={'class': 'file-input file-input-bordered w-full', 'accept': '.csv,.xlsx'}),
+    )
+    skip_invalid = forms.BooleanField(
+        required=False, label="Import the valid rows even if some rows have errors",
+        widget=forms.CheckboxInput(attrs={'class': 'checkbox'}),
+    )
+    dry_run = forms.BooleanField(
+        required=False, label="Only check the file",
+        widget=forms.CheckboxInput(attrs={'class': 'checkbox'}),
+    )
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        try:
+            import_format(upload.name)
+        except ImportFormatError as exc:
+            raise forms.ValidationError(str(exc))
+        return upload
+
+
+class RepriceForm(forms.Form):
+    target = forms.ChoiceField(choices=PriceChange.TARGETS, initial=PriceChange.TARGET_SELLING)
+    mode = forms.ChoiceField(choices=PriceChange.MODES, initial=PriceChange.MODE_PERCENT)
+    value = forms.DecimalField(max_digits=12, decimal_places=2,
+                               help_text="e.g. 5 for +5%, -2.50 to lower each price by 2.50")
+    note = forms.CharField(required=False, widget=forms.Textarea(attrs={'rows': 2}))
+
+    def clean(self):
+        cleaned = super().clean()
+        if (cleaned.get('mode') == PriceChange.MODE_PERCENT and cleaned.get('value') is not None
+                and cleaned['value'] <= -100):
+            self.add_error('value', "A percentage cut must be smaller than 100%.")
+        return cleaned
@@ -0,0 +1,46 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from earthshop.imports import ImportFormatError
+from products.stock_import import BATCH_SIZE, import_stockins
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-import StockIn rows from a CSV or XLSX file (columns: product, category, "
+        "quantity, buying_price, buying_percent, selling_price, date)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="CSV or XLSX file; the first row holds the column names.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only; write nothing.")
+        parser.add_argument('--skip-invalid', action='store_true',
+                            help="Import the valid rows even if other rows have errors.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows per INSERT batch.")
+        parser.add_argument('--errors', metavar='FILE', help="Write the per-row error report to this CSV file.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['file'], 'rb') as f:
+                result = import_stockins(
+                    f, options['file'], dry_run=options['dry_run'],
+                    skip_invalid=options['skip_invalid'], batch_size=options['batch_size'],
+                )
+        except (OSError, ImportFormatError) as exc:
+            raise CommandError(str(exc))
+
+        if options['errors']:
+            with open(options['errors'], 'w', newline='') as report:
+                writer = csv.writer(report)
+                writer.writerow(['line', 'error'])
+                writer.writerows((error.line, error.message) for error in result.errors)
+        else:
+            for error in result.errors:
+                self.stdout.write(f"  line {error.line}: {error.message}")
+
+        summary = (f"{result.rows} rows read, {result.valid} valid, {len(result.errors)} with errors, "
+                   f"{result.created} imported for {result.products} products in {result.seconds:.2f}s")
+        if result.errors and not result.created:
+            raise CommandError(summary + "; nothing was imported.")
+        self.stdout.write(self.style.SUCCESS(summary + (" (dry run)." if result.dry_run else ".")))
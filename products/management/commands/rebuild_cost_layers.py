@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products.costing import cost_method, line_costs, replay
+from products.models import Product, StockIn, StockOut
+from sales.models import InvoiceItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the StockIn/StockOut history to recompute batch remaining quantities "
+        "and the cost of every stock-out and invoice line (after back-dated corrections "
+        "or a change of COST_METHOD)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report rows that differ; exit with an error if any are found.")
+
+    def handle(self, *args, **options):
+        method = cost_method()
+        with transaction.atomic():
+            remaining, costs = replay(
+                StockIn.objects.values_list('pk', 'product_id', 'date', 'stock_quantity', 'total_buying_amount'),
+                StockOut.objects.values_list('pk', 'product_id', 'date', 'stock_out_quantity'),
+                dict(Product.objects.values_list('pk', 'buying_price')),
+                method=method,
+            )
+            stockins = self.drifted(StockIn, 'remaining_quantity', remaining)
+            stockouts = self.drifted(StockOut, 'cost', costs)
+            current = dict(StockOut.objects.values_list('pk', 'cost'))
+            current.update((stockout.pk, stockout.cost) for stockout in stockouts)
+            items = self.drifted(InvoiceItem, 'cost', line_costs(
+                InvoiceItem.objects.order_by('id').values_list('pk', 'invoice_id', 'item_id', 'quantity', 'item__buying_price'),
+                [(invoice_id, product_id, current[pk]) for pk, invoice_id, product_id in
+                 StockOut.objects.filter(invoice__isnull=False).order_by('id').values_list('pk', 'invoice_id', 'product_id')],
+            ))
+
+            summary = (f"{len(stockins)} batch(es), {len(stockouts)} stock-out(s) "
+                       f"and {len(items)} invoice line(s) differ from a {method} replay")
+            if options['check']:
+                if stockins or stockouts or items:
+                    raise CommandError(summary + ".")
+                self.stdout.write(self.style.SUCCESS(f"Cost layers match a {method} replay."))
+                return
+
+            StockIn.objects.bulk_update(stockins, ['remaining_quantity'], batch_size=500)
+            StockOut.objects.bulk_update(stockouts, ['cost'], batch_size=500)
+            InvoiceItem.objects.bulk_update(items, ['cost'], batch_size=500)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt cost layers; {summary}, corrected."))
+
+    def drifted(self, model, field, expected):
+        """Unsaved instances carrying the expected value for rows that differ."""
+        stored = dict(model.objects.values_list('pk', field))
+        rows = [model(pk=pk, **{field: value}) for pk, value in expected.items() if stored.get(pk) != value]
+        for row in rows:
+            self.stdout.write(f"  {model._meta.label} #{row.pk}: {field} {stored.get(row.pk)} -> {getattr(row, field)}")
+        return rows
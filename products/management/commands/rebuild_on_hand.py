@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Verify Product.on_hand against the StockIn/StockOut tables and rebuild it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report drifted products; exit with an error if any are found.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # one statement: correlated grouped subqueries over both movement tables
+            drifted = list(
+                Product.objects.annotate(expected=Product.on_hand_from_movements())
+                .exclude(on_hand=F('expected'))
+                .values_list('pk', 'name', 'on_hand', 'expected')
+            )
+            for pk, name, on_hand, expected in drifted:
+                self.stdout.write(f"#{pk} {name}: on_hand {on_hand}, movements say {expected}")
+
+            if options['check']:
+                if drifted:
+                    raise CommandError(f"{len(drifted)} product(s) have a drifted on_hand.")
+                self.stdout.write(self.style.SUCCESS("on_hand matches the movement tables."))
+                return
+
+            if drifted:
+                Product.objects.update(on_hand=Product.on_hand_from_movements())
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt on_hand; {len(drifted)} product(s) corrected."))
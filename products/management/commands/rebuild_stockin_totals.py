@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products.pricing import CHUNK_SIZE, recompute_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute StockIn buying/selling totals in exact decimal arithmetic "
+        "(fixes rows written with the old float rounding)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report; exit with an error if any totals differ.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows per bulk UPDATE.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            changed, failures = recompute_totals(chunk_size=options['chunk_size'])
+            for pk, error in failures:
+                self.stdout.write(f"  StockIn #{pk}: {'; '.join(error.messages)}")
+            if options['check']:
+                transaction.set_rollback(True)
+                if changed or failures:
+                    raise CommandError(f"{changed} stock-in(s) have stale totals, {len(failures)} cannot be priced.")
+                self.stdout.write(self.style.SUCCESS("StockIn totals are exact."))
+                return
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed StockIn totals; {changed} row(s) corrected, {len(failures)} left as they were."))
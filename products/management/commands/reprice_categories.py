@@ -0,0 +1,63 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from products.models import Category, PriceChange
+from products.repricing import apply_reprice, preview
+
+
+class Command(BaseCommand):
+    help = (
+        "Adjust prices across whole categories with one UPDATE per table: the selling price "
+        "of stock in hand, Product.buying_price, or both. Writes a PriceChange audit row."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category', action='append', default=[], metavar='NAME_OR_ID',
+                            help="Category to re-price; repeat for several.")
+        parser.add_argument('--all', action='store_true', help="Re-price every category.")
+        adjustment = parser.add_mutually_exclusive_group(required=True)
+        adjustment.add_argument('--percent', help="Relative change, e.g. 5 or -10.")
+        adjustment.add_argument('--amount', help="Absolute change per unit, e.g. 2.50 or -1.")
+        parser.add_argument('--target', choices=dict(PriceChange.TARGETS), default=PriceChange.TARGET_SELLING)
+        parser.add_argument('--note', default='', help="Stored on the audit record.")
+        parser.add_argument('--dry-run', action='store_true', help="Show the affected rows; change nothing.")
+
+    def handle(self, *args, **options):
+        if options['all'] == bool(options['category']):
+            raise CommandError("Give either --category (one or more) or --all.")
+        categories = None
+        if options['category']:
+            lookup = Q()
+            for value in options['category']:
+                lookup |= Q(pk=value) if value.isdigit() else Q(name__iexact=value)
+            categories = list(Category.objects.filter(lookup))
+            found = {str(c.pk) for c in categories} | {c.name.lower() for c in categories}
+            missing = [value for value in options['category'] if value.lower() not in found]
+            if missing:
+                raise CommandError(f"No such category: {', '.join(missing)}")
+
+        mode = PriceChange.MODE_PERCENT if options['percent'] is not None else PriceChange.MODE_AMOUNT
+        value = options['percent'] if options['percent'] is not None else options['amount']
+        try:
+            if options['dry_run']:
+                self.show(preview(categories, options['target'], mode, value))
+                return
+            change = apply_reprice(categories, options['target'], mode, value, note=options['note'])
+        except ValidationError as exc:
+            raise CommandError(f"Invalid adjustment: {' '.join(exc.messages)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-priced {change.products_changed} product(s) and {change.stockins_changed} stock-in batch(es) "
+            f"(audit #{change.pk})."
+        ))
+
+    def show(self, changes):
+        for row in changes['product_rows']:
+            self.stdout.write(f"  product #{row['id']} {row['name']} [{row['category__name']}]: "
+                              f"buying {row['buying_price']} -> {row['new_price']}")
+        for row in changes['stockin_rows']:
+            self.stdout.write(f"  stock-in #{row['id']} {row['product__name']} {row['date']}: "
+                              f"selling {row['selling_price_item']} -> {row['new_price']}")
+        self.stdout.write(self.style.WARNING(
+            f"Dry run: {changes['products']} product(s) and {changes['stockins']} stock-in batch(es) would change."
+        ))
@@ -0,0 +1,108 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from earthshop.benchmarking import scratch_database
+from products.models import Category, Product, StockIn, StockOut
+from products.services import InsufficientStock
+from sales.services import commit_invoice
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer one product from several threads through commit_invoice on a "
+        "scratch database and verify that no sale is lost or oversold."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Concurrent selling threads.")
+        parser.add_argument('--sales', type=int, default=50, help="Invoices attempted per worker.")
+        parser.add_argument('--stock', type=int, default=200,
+                            help="Opening stock; keep it below workers*sales to force rejections.")
+        parser.add_argument('--max-qty', type=int, default=3, help="Largest quantity per invoice line.")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        sales = options['sales']
+        opening = options['stock']
+        max_qty = options['max_qty']
+
+        lock = threading.Lock()
+        totals = {'sold': 0, 'invoices': 0, 'rejected': 0, 'retries': 0}
+        errors = []
+
+        with scratch_database(on_disk=True):
+            category = Category.objects.create(name='Stress')
+            product = Product.objects.create(category=category, name='Stress SKU', buying_price=Decimal('1.00'))
+            StockIn.objects.create(product=product, buying_price_item=Decimal('1.00'),
+                                   selling_price_item=Decimal('10.00'), stock_quantity=Decimal(opening))
+            today = timezone.now().date()
+
+            def worker(seed):
+                rng = random.Random(seed)
+                try:
+                    for _ in range(sales):
+                        qty = rng.randint(1, max_qty)
+                        while True:
+                            try:
+                                commit_invoice([(product.pk, Decimal(qty), Decimal('10.00'))], date=today)
+                            except InsufficientStock:
+                                with lock:
+                                    totals['rejected'] += 1
+                            except OperationalError as exc:
+                                # SQLite: another till holds the write lock; try again
+                                if 'locked' not in str(exc):
+                                    raise
+                                with lock:
+                                    totals['retries'] += 1
+                                time.sleep(rng.uniform(0, 0.005))
+                                continue
+                            else:
+                                with lock:
+                                    totals['sold'] += qty
+                                    totals['invoices'] += 1
+                            break
+                except Exception as exc:
+                    errors.append(exc)
+                finally:
+                    connection.close()
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+
+            product.refresh_from_db()
+            stocked_out = StockOut.objects.filter(product=product).aggregate(
+                total=Sum('stock_out_quantity'))['total'] or 0
+
+        self.stdout.write(
+            f"{workers} workers x {sales} invoices in {elapsed:.2f}s: "
+            f"{totals['invoices']} committed ({totals['sold']} units), "
+            f"{totals['rejected']} rejected for shortfall, {totals['retries']} lock retries"
+        )
+        self.stdout.write(
+            f"opening stock {opening}, closing stock {product.on_hand}, stock-out total {stocked_out}"
+        )
+
+        if errors:
+            raise CommandError(f"{len(errors)} worker(s) failed, first error: {errors[0]!r}")
+        problems = []
+        if product.on_hand < 0:
+            problems.append("stock went negative")
+        if product.on_hand != opening - totals['sold']:
+            problems.append("closing stock does not match committed sales (lost update)")
+        if stocked_out != totals['sold']:
+            problems.append("stock-out rows do not match committed sales")
+        if problems:
+            raise CommandError("; ".join(problems))
+        self.stdout.write(self.style.SUCCESS("Stock total is exact."))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:39
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_on_hand(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Product = apps.get_model('products', 'Product')
+    StockIn = apps.get_model('products', 'StockIn')
+    StockOut = apps.get_model('products', 'StockOut')
+    output = models.DecimalField(max_digits=14, decimal_places=2)
+    stock_in = (StockIn.objects.using(db).filter(product=OuterRef('pk')).order_by()
+                .values('product').annotate(total=Sum('stock_quantity')).values('total'))
+    stock_out = (StockOut.objects.using(db).filter(product=OuterRef('pk')).order_by()
+                 .values('product').annotate(total=Sum('stock_out_quantity')).values('total'))
+    Product.objects.using(db).update(on_hand=(
+        Coalesce(Subquery(stock_in, output_field=output), Value(0), output_field=output)
+        - Coalesce(Subquery(stock_out, output_field=output), Value(0), output_field=output)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_alter_stockout_options_remove_stockout_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='on_hand',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.RunPython(backfill_on_hand, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_on_hand'),
+        ('sales', '0004_rename_payment_date_invoiceinstallment_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockin',
+            index=models.Index(fields=['-date', '-id'], name='stockin_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockout',
+            index=models.Index(fields=['-date', '-id'], name='stockout_date_id_idx'),
+        ),
+    ]
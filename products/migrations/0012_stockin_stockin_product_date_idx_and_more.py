@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_stockin_stockin_date_id_idx_and_more'),
+        ('sales', '0006_invoice_invoice_customer_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockin',
+            index=models.Index(fields=['product', '-date', '-id'], name='stockin_product_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockout',
+            index=models.Index(fields=['product', '-date', '-id'], name='stockout_product_date_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:07
+
+from django.db import migrations, models
+
+from products.costing import cost_method, replay
+
+
+def backfill_cost_layers(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Product = apps.get_model('products', 'Product')
+    StockIn = apps.get_model('products', 'StockIn')
+    StockOut = apps.get_model('products', 'StockOut')
+    remaining, costs = replay(
+        StockIn.objects.using(db).values_list('pk', 'product_id', 'date', 'stock_quantity', 'total_buying_amount'),
+        StockOut.objects.using(db).values_list('pk', 'product_id', 'date', 'stock_out_quantity'),
+        dict(Product.objects.using(db).values_list('pk', 'buying_price')),
+        method=cost_method(),
+    )
+    StockIn.objects.using(db).bulk_update(
+        [StockIn(pk=pk, remaining_quantity=value) for pk, value in remaining.items()],
+        ['remaining_quantity'], batch_size=500,
+    )
+    StockOut.objects.using(db).bulk_update(
+        [StockOut(pk=pk, cost=value) for pk, value in costs.items()], ['cost'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_stockin_stockin_product_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockin',
+            name='remaining_quantity',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='stockout',
+            name='cost',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.RunPython(backfill_cost_layers, migrations.RunPython.noop),
+    ]
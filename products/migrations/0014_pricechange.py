@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_stockin_remaining_quantity_stockout_cost'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categories', models.JSONField(default=list)),
+                ('target', models.CharField(choices=[('selling', 'Selling price of stock in hand'), ('buying', 'Product buying price'), ('both', 'Both')], max_length=16)),
+                ('mode', models.CharField(choices=[('percent', 'Percent'), ('amount', 'Amount')], max_length=16)),
+                ('value', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('products_changed', models.IntegerField(default=0)),
+                ('stockins_changed', models.IntegerField(default=0)),
+                ('note', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:43
+
+import datetime
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import F, Min, Sum
+
+from products.costing import cost_method, line_costs, replay
+
+
+def book_opening_stock(apps, schema_editor):
+    """
+    Carry Product.stock over before it goes: the part of it the movement
+    tables do not explain (stock given when the product was created) is
+    booked as an opening StockIn at the product's buying price, dated
+    before its first movement, so it is on hand and has a cost layer. A
+    stock below the movements is booked as a StockOut. Cost layers and
+    sale line costs are then replayed over the new history.
+    """
+    Product = apps.get_model('products', 'Product')
+    StockIn = apps.get_model('products', 'StockIn')
+    StockOut = apps.get_model('products', 'StockOut')
+    InvoiceItem = apps.get_model('sales', 'InvoiceItem')
+    db = schema_editor.connection.alias
+
+    received = dict(StockIn.objects.using(db).order_by().values('product').annotate(total=Sum('stock_quantity'))
+                    .values_list('product', 'total'))
+    sent = dict(StockOut.objects.using(db).order_by().values('product').annotate(total=Sum('stock_out_quantity'))
+                .values_list('product', 'total'))
+    first_in = dict(StockIn.objects.using(db).order_by().values('product').annotate(first=Min('date'))
+                    .values_list('product', 'first'))
+    first_out = dict(StockOut.objects.using(db).order_by().values('product').annotate(first=Min('date'))
+                     .values_list('product', 'first'))
+    today = datetime.date.today()
+
+    openings, corrections = [], []
+    for product in Product.objects.using(db).order_by('pk'):
+        moved = Decimal(received.get(product.pk) or 0) - Decimal(sent.get(product.pk) or 0)
+        missing = Decimal(product.stock or 0) - moved
+        dates = [d for d in (product.date, first_in.get(product.pk), first_out.get(product.pk)) if d]
+        if missing > 0:
+            price = product.buying_price or Decimal('0')
+            openings.append(StockIn(
+                product_id=product.pk, buying_price_item=price, stock_quantity=missing,
+                total_buying_amount=(price * missing).quantize(Decimal('0.01')),
+                remaining_quantity=missing, date=min(dates, default=today),
+            ))
+        elif missing < 0:
+            corrections.append(StockOut(product_id=product.pk, stock_out_quantity=int(-missing), date=today))
+    StockIn.objects.using(db).bulk_create(openings, batch_size=500)
+    StockOut.objects.using(db).bulk_create(corrections, batch_size=500)
+    # sum(StockIn) - sum(StockOut) now equals the old stock
+    Product.objects.using(db).update(on_hand=F('stock'))
+
+    remaining, costs = replay(
+        StockIn.objects.using(db).values_list('pk', 'product_id', 'date', 'stock_quantity', 'total_buying_amount'),
+        StockOut.objects.using(db).values_list('pk', 'product_id', 'date', 'stock_out_quantity'),
+        dict(Product.objects.using(db).values_list('pk', 'buying_price')),
+        method=cost_method(),
+    )
+    StockIn.objects.using(db).bulk_update(
+        [StockIn(pk=pk, remaining_quantity=value) for pk, value in remaining.items()],
+        ['remaining_quantity'], batch_size=500,
+    )
+    StockOut.objects.using(db).bulk_update(
+        [StockOut(pk=pk, cost=value) for pk, value in costs.items()], ['cost'], batch_size=500,
+    )
+    items = line_costs(
+        InvoiceItem.objects.using(db).order_by('id')
+        .values_list('pk', 'invoice_id', 'item_id', 'quantity', 'item__buying_price'),
+        StockOut.objects.using(db).filter(invoice__isnull=False).order_by('id')
+        .values_list('invoice_id', 'product_id', 'cost'),
+    )
+    InvoiceItem.objects.using(db).bulk_update(
+        [InvoiceItem(pk=pk, cost=value) for pk, value in items.items()], ['cost'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_pricechange'),
+        ('sales', '0008_invoiceitem_cost'),
+    ]
+
+    operations = [
+        migrations.RunPython(book_opening_stock, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='product',
+            name='stock',
+        ),
+    ]
@@ -1,7 +1,12 @@
-from django.db import models
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.utils import timezone
 from django.db.models import Sum
-from django.db.models import F
+from django.db.models import F, Case, When, Value, DecimalField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 # Create your models here.
     
 
@@ -16,9 +21,13 @@ class Category(models.Model):
 class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
-    stock = models.IntegerField(default=0)
     quantity = models.IntegerField(default=0)
     buying_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # units in stock: sum(StockIn) - sum(StockOut), maintained on every
+    # movement write and the only stock counter sales reserve against
+    # (products.services.reserve_stock); `manage.py rebuild_on_hand`
+    # recomputes it from the movement tables
+    on_hand = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
    
     date = models.DateField(default=timezone.now, null=True, blank=True)
 
@@ -26,9 +35,42 @@ class Product(models.Model):
         return self.name
     
     def available_stock(self):
-        stockin_total = self.stockin_product.aggregate(Sum('stock_quantity'))['stock_quantity__sum'] or 0
-        stockout_total = self.stockout_product.aggregate(Sum('stock_out_quantity'))['stock_out_quantity__sum'] or 0
-        return stockin_total - stockout_total
+        return self.on_hand
+
+    @staticmethod
+    def on_hand_from_movements():
+        """
+        Expression computing sum(StockIn) - sum(StockOut) per product as
+        correlated grouped subqueries, usable in annotate() and update().
+        """
+        output = DecimalField(max_digits=14, decimal_places=2)
+        stock_in = (StockIn.objects.filter(product=OuterRef('pk')).order_by()
+                    .values('product').annotate(total=Sum('stock_quantity')).values('total'))
+        stock_out = (StockOut.objects.filter(product=OuterRef('pk')).order_by()
+                     .values('product').annotate(total=Sum('stock_out_quantity')).values('total'))
+        return (Coalesce(Subquery(stock_in, output_field=output), Value(0), output_field=output)
+                - Coalesce(Subquery(stock_out, output_field=output), Value(0), output_field=output))
+
+    @classmethod
+    def adjust_on_hand(cls, deltas):
+        """
+        Apply {product_id: delta} to on_hand with one UPDATE.
+        Call inside the transaction that writes the movement rows.
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if deltas:
+            cls.objects.filter(pk__in=deltas).update(on_hand=_delta_case('on_hand', deltas))
+
+
+def _delta_case(field, deltas):
+    """F(field) + delta per product, grouped so equal deltas share a WHEN."""
+    by_delta = {}
+    for pk, delta in deltas.items():
+        by_delta.setdefault(delta, []).append(pk)
+    return Case(
+        *[When(pk__in=pks, then=F(field) + Value(delta)) for delta, pks in by_delta.items()],
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
 
 
 
@@ -44,6 +86,8 @@ class StockIn(models.Model):
                                          help_text="Buying percent (if applicable)")
     stock_quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total_buying_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # units of this batch not yet consumed by stock-outs (products.costing)
+    remaining_quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
 
     # NEW fields for selling
     selling_price_item = models.DecimalField(max_digits=12, decimal_places=2, default=0)
@@ -54,39 +98,72 @@ class StockIn(models.Model):
 
     class Meta:
         ordering = ['-date', '-id']
+        indexes = [
+            # backs keyset pagination of stockin_list (earthshop.pagination)
+            models.Index(fields=['-date', '-id'], name='stockin_date_id_idx'),
+            models.Index(fields=['product', '-date', '-id'], name='stockin_product_date_idx'),
+        ]
+
+    def clean(self):
+        from .pricing import stockin_totals
+        stockin_totals(self.buying_price_item, self.buying_percent, self.stock_quantity, self.selling_price_item)
+        self._check_consumed(self._previous())
+
+    def _previous(self):
+        """(product_id, stock_quantity, remaining_quantity) as stored, or None for a new batch."""
+        if self._state.adding:
+            return None
+        return StockIn.objects.filter(pk=self.pk).values_list(
+            'product_id', 'stock_quantity', 'remaining_quantity').first()
+
+    def _check_consumed(self, previous):
+        """What has already gone out of the batch stays out: an edit cannot shrink or move it."""
+        if previous is None:
+            return
+        product_id, quantity, remaining = previous
+        consumed = quantity - remaining
+        if consumed <= 0:
+            return
+        if product_id != self.product_id:
+            raise ValidationError({'product': f"{consumed} units of this batch have already gone out; "
+                                              "it cannot move to another product."})
+        if Decimal(self.stock_quantity or 0) < consumed:
+            raise ValidationError({'stock_quantity': f"{consumed} units of this batch have already gone out; "
+                                                     "the quantity cannot be less."})
 
     def save(self, *args, **kwargs):
-        # compute totals (buying and selling) before saving
-        try:
-            qty = float(self.stock_quantity or 0)
-            buy_price = float(self.buying_price_item or 0)
-            buy_percent = float(self.buying_percent or 0)
-            sell_price = float(self.selling_price_item or 0)
-            # buying: price * qty * (1 + percent/100)
-            self.total_buying_amount = round(buy_price * qty * (1 + buy_percent / 100.0), 2)
-            # selling total
-            self.total_selling_amount = round(sell_price * qty, 2)
-        except Exception:
-            self.total_buying_amount = 0
-            self.total_selling_amount = 0
+        from .pricing import stockin_totals
 
-        is_new = self._state.adding
-        super().save(*args, **kwargs)
+        # totals are always derived from the inputs; bad inputs raise ValidationError
+        self.total_buying_amount, self.total_selling_amount = stockin_totals(
+            self.buying_price_item, self.buying_percent, self.stock_quantity, self.selling_price_item)
 
-        # Atomic stock update only for new records
-        if is_new:
-            try:
-                self.product.stock = F('stock') + self.stock_quantity
-                self.product.save(update_fields=['stock'])
-            except Exception:
-                # safe fallback: ignore stock update failure here and let admin correct
-                pass
+        is_new = self._state.adding
+        with transaction.atomic():
+            previous = self._previous()
+            self._check_consumed(previous)
+            if is_new:
+                self.remaining_quantity = self.stock_quantity
+            elif previous:
+                # what was already consumed stays consumed
+                self.remaining_quantity = Decimal(self.stock_quantity or 0) - (previous[1] - previous[2])
+            super().save(*args, **kwargs)
+
+            if is_new:
+                Product.adjust_on_hand({self.product_id: self.stock_quantity})
+            elif previous:
+                Product.adjust_on_hand(_movement_delta(previous[:2], (self.product_id, self.stock_quantity)))
+
+    @property
+    def unit_cost(self):
+        from .costing import unit_cost
+        return unit_cost(self.total_buying_amount, self.stock_quantity)
 
     def __str__(self):
         return f"StockIn: {self.product.name} (+{self.stock_quantity}) on {self.date}"
 
 
-# --- StockOut model: when created, decreases product.stock ---
+# --- StockOut model: when created, decreases product.on_hand ---
 class StockOut(models.Model):
     product = models.ForeignKey('Product', related_name='stockout_product', on_delete=models.CASCADE)
     stock_out_quantity = models.PositiveIntegerField(default=0)
@@ -95,8 +172,81 @@ class StockOut(models.Model):
         'sales.Invoice', related_name='invoice_stockout',
         blank=True, null=True, on_delete=models.CASCADE
     )
+    # cost of the units taken from the StockIn batches (products.costing)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # backs keyset pagination of stockout_list (earthshop.pagination)
+            models.Index(fields=['-date', '-id'], name='stockout_date_id_idx'),
+            models.Index(fields=['product', '-date', '-id'], name='stockout_product_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.stock_out_quantity}"
-    
+
+    def save(self, *args, **kwargs):
+        from .costing import consume, release
+
+        is_new = self._state.adding
+        with transaction.atomic():
+            changed = False
+            if not is_new:
+                previous = StockOut.objects.filter(pk=self.pk).values_list('product_id', 'stock_out_quantity').first()
+                changed = previous is not None and previous != (self.product_id, self.stock_out_quantity)
+                if changed:
+                    # undo the old movement, then take the new one as if it were new
+                    Product.adjust_on_hand({previous[0]: previous[1]})
+                    release(*previous)
+            if is_new or changed:
+                self.cost = consume([(self.product_id, self.stock_out_quantity)])[0]
+            super().save(*args, **kwargs)
+
+            if is_new or changed:
+                Product.adjust_on_hand({self.product_id: -self.stock_out_quantity})
+
+
+class PriceChange(models.Model):
+    """Audit record of a bulk re-pricing (products.repricing)."""
+    TARGET_SELLING = 'selling'
+    TARGET_BUYING = 'buying'
+    TARGET_BOTH = 'both'
+    TARGETS = (
+        (TARGET_SELLING, 'Selling price of stock in hand'),
+        (TARGET_BUYING, 'Product buying price'),
+        (TARGET_BOTH, 'Both'),
+    )
+    MODE_PERCENT = 'percent'
+    MODE_AMOUNT = 'amount'
+    MODES = (
+        (MODE_PERCENT, 'Percent'),
+        (MODE_AMOUNT, 'Amount'),
+    )
+
+    # names at the time of the change; categories may be renamed or deleted later
+    categories = models.JSONField(default=list)
+    target = models.CharField(max_length=16, choices=TARGETS)
+    mode = models.CharField(max_length=16, choices=MODES)
+    value = models.DecimalField(max_digits=12, decimal_places=2)
+    products_changed = models.IntegerField(default=0)
+    stockins_changed = models.IntegerField(default=0)
+    note = models.TextField(blank=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, null=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+
+    def __str__(self):
+        sign = '+' if self.value >= 0 else ''
+        unit = '%' if self.mode == self.MODE_PERCENT else ''
+        return f"{self.get_target_display()} {sign}{self.value}{unit} ({', '.join(self.categories) or 'all'})"
+
+
+def _movement_delta(old, new):
+    """on_hand deltas for a movement edited from (product_id, qty) old to new."""
+    deltas = {old[0]: -old[1]}
+    deltas[new[0]] = deltas.get(new[0], 0) + new[1]
+    return deltas
+
     
\ No newline at end of file
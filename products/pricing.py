@@ -0,0 +1,144 @@
+"""
+StockIn totals in exact decimal arithmetic.
+
+    total_buying_amount  = buying_price_item * stock_quantity * (1 + buying_percent / 100)
+    total_selling_amount = selling_price_item * stock_quantity
+
+both rounded half-up to the cent. Inputs that are not numbers, negative,
+or too large for their column raise ValidationError keyed by field name,
+instead of being stored as 0.
+
+stockin_totals() prices one batch (StockIn.save / clean). price_stockins()
+prices a list of unsaved rows and reports failures per row (imports), and
+recompute_totals() re-prices stored rows in chunks with one bulk UPDATE
+per chunk (re-pricing jobs).
+"""
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import transaction
+
+from logs.models import DailyLog
+from .models import StockIn
+
+CENT = Decimal('0.01')
+HUNDRED = Decimal('100')
+CHUNK_SIZE = 2000
+
+INPUTS = ('buying_price_item', 'buying_percent', 'stock_quantity', 'selling_price_item')
+TOTALS = ('total_buying_amount', 'total_selling_amount')
+
+Totals = namedtuple('Totals', TOTALS)
+
+
+def _limit(field_name):
+    """Smallest value that no longer fits the StockIn column."""
+    field = StockIn._meta.get_field(field_name)
+    return Decimal(10) ** (field.max_digits - field.decimal_places)
+
+
+def money(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_decimal(value, field_name):
+    """
+    Decimal for a form, file or database value. Floats go through str() so
+    0.1 stays 0.1. Empty means 0.
+    """
+    if value is None or value == '':
+        return Decimal('0')
+    if isinstance(value, float):
+        value = str(value)
+    try:
+        number = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValidationError({field_name: f"{value!r} is not a number."}, code='invalid') from None
+    if not number.is_finite():
+        raise ValidationError({field_name: f"{value!r} is not a number."}, code='invalid')
+    return number
+
+
+def stockin_totals(buying_price_item, buying_percent, stock_quantity, selling_price_item):
+    """Totals for one batch; raises ValidationError naming every bad input."""
+    values, errors = {}, {}
+    for field_name, value in zip(INPUTS, (buying_price_item, buying_percent, stock_quantity, selling_price_item)):
+        try:
+            values[field_name] = number = to_decimal(value, field_name)
+        except ValidationError as exc:
+            errors.update(exc.message_dict)
+            continue
+        if number < 0:
+            errors[field_name] = ["Must be zero or more."]
+        # compared before money(), which overflows the decimal context on huge input
+        elif number >= _limit(field_name) or money(number) >= _limit(field_name):
+            errors[field_name] = [f"{number} is too large."]
+    if errors:
+        raise ValidationError(errors)
+
+    quantity = values['stock_quantity']
+    totals = Totals(
+        money(values['buying_price_item'] * quantity * (1 + values['buying_percent'] / HUNDRED)),
+        money(values['selling_price_item'] * quantity),
+    )
+    for field_name, total in zip(TOTALS, totals):
+        if total >= _limit(field_name):
+            # not an input, so not tied to a form field
+            errors.setdefault(NON_FIELD_ERRORS, []).append(
+                f"{StockIn._meta.get_field(field_name).verbose_name.capitalize()} {total} is too large; "
+                "lower the price or the quantity.")
+    if errors:
+        raise ValidationError(errors)
+    return totals
+
+
+def price_stockins(stockins):
+    """
+    Set the totals on a list of StockIn instances. Rows that fail are left
+    as they were; returns [(index, ValidationError)] for them.
+    """
+    failures = []
+    for index, stockin in enumerate(stockins):
+        try:
+            totals = stockin_totals(*(getattr(stockin, field_name) for field_name in INPUTS))
+        except ValidationError as exc:
+            failures.append((index, exc))
+            continue
+        stockin.total_buying_amount, stockin.total_selling_amount = totals
+    return failures
+
+
+def recompute_totals(queryset=None, chunk_size=CHUNK_SIZE):
+    """
+    Re-price stored StockIn rows (all of them by default). Reads the
+    inputs chunk by chunk and writes only the rows whose totals change,
+    one bulk UPDATE per chunk; bulk_update() skips the post_save rollups,
+    so the DailyLog purchase totals are corrected once per date. Returns
+    (changed, failures) where failures are [(pk, ValidationError)].
+    """
+    queryset = StockIn.objects.all() if queryset is None else queryset
+
+    changed, failures, chunk, purchases = 0, [], [], {}
+    with transaction.atomic():
+        rows = queryset.order_by('pk').values_list('pk', 'date', *INPUTS, *TOTALS).iterator(chunk_size=chunk_size)
+        for pk, date, *inputs, total_buying, total_selling in rows:
+            try:
+                totals = stockin_totals(*inputs)
+            except ValidationError as exc:
+                failures.append((pk, exc))
+                continue
+            if totals == (total_buying, total_selling):
+                continue
+            chunk.append(StockIn(pk=pk, **totals._asdict()))
+            purchases[date] = purchases.get(date, 0) + totals.total_buying_amount - total_buying
+            if len(chunk) == chunk_size:
+                StockIn.objects.bulk_update(chunk, TOTALS)
+                changed += len(chunk)
+                chunk = []
+        if chunk:
+            StockIn.objects.bulk_update(chunk, TOTALS)
+            changed += len(chunk)
+        for date, delta in purchases.items():
+            DailyLog.post(date, total_purchases=delta)
+    return changed, failures
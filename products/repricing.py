@@ -0,0 +1,133 @@
+"""
+Bulk re-pricing by category.
+
+A supplier price change is applied to every product of the chosen
+categories at once, as one UPDATE per table, so the number of queries
+does not depend on how many products change:
+
+  * selling: StockIn.selling_price_item (and total_selling_amount) of the
+    batches still in stock, i.e. with remaining_quantity > 0. Batches
+    already sold through keep the price they were sold at;
+  * buying: Product.buying_price. StockIn buying prices are the cost of
+    goods already received and are left alone (see products.costing).
+
+Adjustments are a percentage or an absolute amount; results are rounded
+to the cent and never go below zero. Every applied change writes a
+PriceChange audit row.
+"""
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Round
+
+from .models import PriceChange, Product, StockIn
+
+PREVIEW_ROWS = 20
+CENT = Decimal('0.01')
+
+_money = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _decimal(value):
+    try:
+        value = Decimal(str(value))
+    except ArithmeticError:
+        raise ValidationError(f"{value!r} is not a number.") from None
+    if not value.is_finite():
+        raise ValidationError(f"{value!r} is not a number.")
+    return value
+
+
+def adjusted(field, mode, value):
+    """SQL expression for `field` after the adjustment."""
+    value = _decimal(value)
+    if mode == PriceChange.MODE_PERCENT:
+        if value <= -100:
+            raise ValidationError("A percentage cut must be smaller than 100%.")
+        expression = F(field) * Value(1 + value / 100)
+    elif mode == PriceChange.MODE_AMOUNT:
+        expression = F(field) + Value(value)
+    else:
+        raise ValidationError(f"Unknown adjustment mode {mode!r}.")
+    return Greatest(Round(expression, 2, output_field=_money), Value(Decimal('0')), output_field=_money)
+
+
+def _targets(target):
+    if target not in dict(PriceChange.TARGETS):
+        raise ValidationError(f"Unknown re-pricing target {target!r}.")
+    return (
+        target in (PriceChange.TARGET_SELLING, PriceChange.TARGET_BOTH),
+        target in (PriceChange.TARGET_BUYING, PriceChange.TARGET_BOTH),
+    )
+
+
+def _querysets(categories):
+    products = Product.objects.all()
+    stockins = StockIn.objects.filter(remaining_quantity__gt=0)
+    if categories is not None:
+        products = products.filter(category__in=categories)
+        stockins = stockins.filter(product__category__in=categories)
+    return products, stockins
+
+
+def preview(categories, target, mode, value, rows=PREVIEW_ROWS):
+    """
+    What apply_reprice() would change, without changing it: affected row
+    counts and the first `rows` rows of each table with old and new
+    prices. `categories` is a queryset or list (None = all categories).
+    """
+    selling, buying = _targets(target)
+    products, stockins = _querysets(categories)
+    result = {'products': 0, 'stockins': 0, 'product_rows': [], 'stockin_rows': []}
+    if buying:
+        result['products'] = products.count()
+        result['product_rows'] = _quantized(
+            products.order_by('category__name', 'name')
+            .annotate(new_price=adjusted('buying_price', mode, value))
+            .values('id', 'name', 'category__name', 'buying_price', 'new_price')[:rows]
+        )
+    if selling:
+        result['stockins'] = stockins.count()
+        result['stockin_rows'] = _quantized(
+            stockins.order_by('product__category__name', 'product__name', '-date', '-id')
+            .annotate(new_price=adjusted('selling_price_item', mode, value))
+            .values('id', 'product__name', 'product__category__name', 'date', 'remaining_quantity',
+                    'selling_price_item', 'new_price')[:rows]
+        )
+    return result
+
+
+def _quantized(rows):
+    # SQLite hands computed decimals back with float noise
+    rows = list(rows)
+    for row in rows:
+        row['new_price'] = Decimal(row['new_price']).quantize(CENT)
+    return rows
+
+
+def apply_reprice(categories, target, mode, value, user=None, note=''):
+    """
+    Apply the adjustment with one UPDATE per table and record it.
+    Returns the PriceChange.
+    """
+    selling, buying = _targets(target)
+    value = _decimal(value)
+    products, stockins = _querysets(categories)
+    products_changed = stockins_changed = 0
+    with transaction.atomic():
+        if buying:
+            products_changed = products.update(buying_price=adjusted('buying_price', mode, value))
+        if selling:
+            new_price = adjusted('selling_price_item', mode, value)
+            stockins_changed = stockins.update(
+                selling_price_item=new_price,
+                total_selling_amount=Round(new_price * F('stock_quantity'), 2, output_field=_money),
+            )
+        names = [] if categories is None else sorted(category.name for category in categories)
+        return PriceChange.objects.create(
+            categories=names, target=target, mode=mode, value=value,
+            products_changed=products_changed, stockins_changed=stockins_changed,
+            user=user, note=note,
+        )
@@ -0,0 +1,76 @@
+# products/services.py
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+
+from .models import Product
+
+
+class InsufficientStock(Exception):
+    """
+    Raised when a reservation asks for more units than a product has.
+    `shortages` maps product id -> (requested, available).
+    """
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        names = dict(Product.objects.filter(pk__in=shortages).values_list('pk', 'name'))
+        detail = ", ".join(
+            f"{names.get(pk, pk)} (requested {requested}, available {available})"
+            for pk, (requested, available) in sorted(shortages.items())
+        )
+        super().__init__(f"Insufficient stock for {detail}")
+
+
+class _Shortfall(Exception):
+    pass
+
+
+def reserve_stock(quantities):
+    """
+    Take {product_id: qty} off Product.on_hand or fail as a whole.
+
+    Must run inside transaction.atomic(). On backends with row locks the
+    rows are locked in primary-key order first, so concurrent tills cannot
+    deadlock on each other. The UPDATE itself is a compare-and-set guarded
+    by on_hand >= qty; if any product falls short nothing is changed and
+    InsufficientStock is raised so the caller's transaction rolls back.
+    Product ids that do not exist raise ValidationError the same way.
+    """
+    quantities = {pk: qty for pk, qty in quantities.items() if qty > 0}
+    if not quantities:
+        return
+
+    if connection.features.has_select_for_update:
+        list(Product.objects.select_for_update().filter(pk__in=quantities).order_by('pk').values_list('pk'))
+
+    # one branch per distinct quantity keeps the statement small
+    by_qty = {}
+    for pk, qty in quantities.items():
+        by_qty.setdefault(qty, []).append(pk)
+
+    guard = Q()
+    for qty, pks in by_qty.items():
+        guard |= Q(pk__in=pks, on_hand__gte=qty)
+
+    try:
+        with transaction.atomic():
+            updated = Product.objects.filter(guard).update(on_hand=Case(
+                *[When(pk__in=pks, then=F('on_hand') - Value(qty)) for qty, pks in by_qty.items()],
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ))
+            if updated != len(quantities):
+                # undo the rows that did pass the guard
+                raise _Shortfall()
+    except _Shortfall:
+        pass
+    else:
+        return
+
+    available = dict(Product.objects.filter(pk__in=quantities).values_list('pk', 'on_hand'))
+    missing = set(quantities) - set(available)
+    if missing:
+        raise ValidationError(f"Product(s) not found: {', '.join(map(str, sorted(missing)))}.", code='invalid')
+    raise InsufficientStock({
+        pk: (qty, available[pk]) for pk, qty in quantities.items() if available[pk] < qty
+    })
@@ -0,0 +1,19 @@
+# products/signals.py
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .costing import release
+from .models import Product, StockIn, StockOut
+
+
+# post_delete also fires for cascades (e.g. deleting an invoice removes
+# its stock-outs), which a delete() override would miss.
+@receiver(post_delete, sender=StockIn)
+def stockin_deleted(sender, instance, **kwargs):
+    Product.adjust_on_hand({instance.product_id: -instance.stock_quantity})
+
+
+@receiver(post_delete, sender=StockOut)
+def stockout_deleted(sender, instance, **kwargs):
+    Product.adjust_on_hand({instance.product_id: instance.stock_out_quantity})
+    release(instance.product_id, instance.stock_out_quantity)
@@ -0,0 +1,236 @@
+"""
+Bulk StockIn import from CSV / XLSX.
+
+Receiving a container means hundreds of batches; entering them one by
+one costs a form post and several UPDATEs each. import_stockins() reads
+the file as a stream (earthshop.imports), resolves product names through
+one in-memory lookup built with a single query, prices each batch with
+products.pricing and writes it with bulk_create(). bulk_create() skips
+StockIn.save() and the post_save handlers, so the side effects a save
+would have are applied once for the whole file instead:
+
+  * Product.on_hand: one grouped UPDATE (Product.adjust_on_hand);
+  * cost layers: remaining_quantity starts at the batch quantity;
+  * DailyLog.total_purchases: one post per stock-in date.
+
+Rows that fail validation are collected with their line number. By
+default any bad row rolls the whole import back; skip_invalid=True
+imports the good rows and reports the rest.
+"""
+import datetime
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.db import transaction
+from django.utils import timezone
+
+from earthshop.imports import ImportFormatError, read_table
+from earthshop.metrics import record_stock_movements
+from logs.models import DailyLog
+from .models import Product, StockIn
+from .pricing import price_stockins
+
+BATCH_SIZE = 2000
+CENT = Decimal('0.01')
+
+# accepted header names per value, first one is the documented one
+COLUMNS = {
+    'product': ('product', 'product_name', 'name'),
+    'category': ('category', 'category_name'),
+    'quantity': ('quantity', 'stock_quantity', 'qty'),
+    'buying_price': ('buying_price', 'buying_price_item'),
+    'buying_percent': ('buying_percent',),
+    'selling_price': ('selling_price', 'selling_price_item'),
+    'date': ('date',),
+}
+REQUIRED = ('product', 'quantity', 'buying_price')
+
+# first day of spreadsheet date serials (Excel's 1900 date system)
+_SERIAL_EPOCH = datetime.date(1899, 12, 30)
+
+
+@dataclass
+class RowError:
+    line: int
+    message: str
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    valid: int = 0
+    created: int = 0
+    products: int = 0
+    dry_run: bool = False
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+
+
+class ProductLookup:
+    """Case-insensitive product resolution by name, or by (category, name)."""
+
+    def __init__(self):
+        self.by_category = {}
+        self.by_name = {}
+        for pk, name, category in Product.objects.values_list('pk', 'name', 'category__name'):
+            name = _key(name)
+            self.by_category[(_key(category), name)] = pk
+            self.by_name.setdefault(name, []).append(pk)
+
+    def resolve(self, name, category=''):
+        if category:
+            pk = self.by_category.get((_key(category), _key(name)))
+            if pk is None:
+                raise ValueError(f"no product {name!r} in category {category!r}")
+            return pk
+        pks = self.by_name.get(_key(name), [])
+        if not pks:
+            raise ValueError(f"no product named {name!r}")
+        if len(pks) > 1:
+            raise ValueError(f"{len(pks)} products are named {name!r}; add a category column")
+        return pks[0]
+
+
+def _key(text):
+    return ' '.join((text or '').split()).casefold()
+
+
+def _columns(header):
+    """{value: header name in the file}; raises if a required column is missing."""
+    found = {}
+    for column, aliases in COLUMNS.items():
+        for alias in aliases:
+            if alias in header:
+                found[column] = alias
+                break
+    missing = [COLUMNS[column][0] for column in REQUIRED if column not in found]
+    if missing:
+        raise ImportFormatError(f"Missing column(s): {', '.join(missing)}.")
+    return found
+
+
+def _decimal(text, label, field_name, default=None):
+    """The value of a `field_name` cell; raises ValueError unless it is a number the column can hold."""
+    if not text:
+        if default is None:
+            raise ValueError(f"{label} is required")
+        return default
+    try:
+        value = Decimal(text.replace(' ', ''))
+    except ArithmeticError:
+        raise ValueError(f"{label} {text!r} is not a number") from None
+    if not value.is_finite() or value < 0:
+        raise ValueError(f"{label} must be zero or more, not {text!r}")
+    field = StockIn._meta.get_field(field_name)
+    # checked before quantize(), which overflows the decimal context first
+    if value >= Decimal(10) ** (field.max_digits - field.decimal_places):
+        raise ValueError(f"{label} {text!r} is too large")
+    return value.quantize(CENT)
+
+
+def _message(error):
+    """'field: message' text for a pricing ValidationError."""
+    return "; ".join(
+        ' '.join(messages) if name == NON_FIELD_ERRORS else f"{name}: {' '.join(messages)}"
+        for name, messages in error.message_dict.items()
+    )
+
+
+def _date(text, default):
+    if not text:
+        return default
+    try:
+        return datetime.date.fromisoformat(text[:10])
+    except ValueError:
+        pass
+    try:
+        # XLSX stores dates as a day count
+        return _SERIAL_EPOCH + datetime.timedelta(days=int(float(text)))
+    except (ValueError, OverflowError):
+        raise ValueError(f"date {text!r} is not YYYY-MM-DD") from None
+
+
+def build_stockin(row, columns, lookup, today):
+    """Validated, unsaved StockIn for one file row; raises ValueError."""
+    def value(column):
+        return row.get(columns[column], '') if column in columns else ''
+
+    name = value('product')
+    if not name:
+        raise ValueError("product is required")
+    product_id = lookup.resolve(name, value('category'))
+    quantity = _decimal(value('quantity'), 'quantity', 'stock_quantity')
+    if not quantity:
+        raise ValueError("quantity must be more than zero")
+    # totals are filled in by pricing.price_stockins(), a batch at a time
+    return StockIn(
+        product_id=product_id,
+        buying_price_item=_decimal(value('buying_price'), 'buying_price', 'buying_price_item'),
+        buying_percent=_decimal(value('buying_percent'), 'buying_percent', 'buying_percent', Decimal('0')),
+        stock_quantity=quantity,
+        selling_price_item=_decimal(value('selling_price'), 'selling_price', 'selling_price_item', Decimal('0')),
+        remaining_quantity=quantity,
+        date=_date(value('date'), today),
+    )
+
+
+def import_stockins(file, filename, dry_run=False, skip_invalid=False, batch_size=BATCH_SIZE):
+    """
+    Import the StockIn rows of a CSV / XLSX file. Returns an ImportResult;
+    raises ImportFormatError if the file itself cannot be read.
+    """
+    start = time.perf_counter()
+    result = ImportResult(dry_run=dry_run)
+    lookup = ProductLookup()
+    today = timezone.localdate()
+    columns = None
+    quantities, purchases = {}, {}
+
+    def write(pending):
+        """Price a batch of parsed rows and insert the ones that price."""
+        stockins = [stockin for _, stockin in pending]
+        failed = dict(price_stockins(stockins))
+        batch = []
+        for index, (line, stockin) in enumerate(pending):
+            if index in failed:
+                result.errors.append(RowError(line, _message(failed[index])))
+                continue
+            result.valid += 1
+            quantities[stockin.product_id] = quantities.get(stockin.product_id, 0) + stockin.stock_quantity
+            purchases[stockin.date] = purchases.get(stockin.date, 0) + stockin.total_buying_amount
+            batch.append(stockin)
+        # nothing is written once the import is known to roll back
+        if batch and not dry_run and (skip_invalid or not result.errors):
+            StockIn.objects.bulk_create(batch)
+            result.created += len(batch)
+
+    with transaction.atomic():
+        pending = []
+        for line, row in read_table(file, filename):
+            if columns is None:
+                columns = _columns(row)
+            result.rows += 1
+            try:
+                pending.append((line, build_stockin(row, columns, lookup, today)))
+            except ValueError as exc:
+                result.errors.append(RowError(line, str(exc)))
+            if len(pending) >= batch_size:
+                write(pending)
+                pending = []
+        write(pending)
+
+        if dry_run or (result.errors and not skip_invalid):
+            transaction.set_rollback(True)
+            result.created = 0
+        else:
+            Product.adjust_on_hand(quantities)
+            for date, amount in purchases.items():
+                DailyLog.post(date, total_purchases=amount)
+            result.products = len(quantities)
+
+    record_stock_movements('in', result.created)
+    result.errors.sort(key=lambda error: error.line)
+    result.seconds = time.perf_counter() - start
+    return result
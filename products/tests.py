@@ -1,3 +1,456 @@
-from django.test import TestCase
+import datetime
+import io
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, connection, transaction
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from earthshop.imports import read_table
+from sales.services import commit_invoice
+from .costing import replay
+from logs.models import DailyLog
+from .models import Category, PriceChange, Product, StockIn, StockOut
+from .pricing import INPUTS, price_stockins, recompute_totals, stockin_totals, to_decimal
+from .repricing import apply_reprice, preview
+from .services import InsufficientStock, reserve_stock
+from .stock_import import import_stockins
+
+
+def stocked_product(units):
+    category = Category.objects.create(name='Tools')
+    product = Product.objects.create(category=category, name='Hammer', buying_price=Decimal('4.00'))
+    StockIn.objects.create(product=product, buying_price_item=Decimal('4.00'),
+                           selling_price_item=Decimal('6.00'), stock_quantity=Decimal(units))
+    return product
+
+
+def reserve_retrying(quantities):
+    """reserve_stock in its own transaction, waiting out SQLite's write lock like a till would."""
+    while True:
+        try:
+            with transaction.atomic():
+                reserve_stock(quantities)
+            return
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+            time.sleep(0.001)
+
+
+class OnHandTests(TestCase):
+    """on_hand is the one stock counter: every movement path keeps it equal to the movement tables."""
+
+    def assertOnHand(self, product, expected):
+        product.refresh_from_db()
+        from_movements = Product.objects.annotate(expected=Product.on_hand_from_movements()).get(pk=product.pk).expected
+        self.assertEqual(product.on_hand, expected)
+        self.assertEqual(from_movements, expected)
+
+    def test_movements(self):
+        product = stocked_product(10)
+        other = Product.objects.create(category=product.category, name='Saw', buying_price=Decimal('9.00'))
+        self.assertOnHand(product, 10)
+
+        batch = StockIn.objects.create(product=product, buying_price_item=Decimal('4.00'), stock_quantity=Decimal('5'))
+        self.assertOnHand(product, 15)
+        batch.stock_quantity = Decimal('8')
+        batch.save()
+        self.assertOnHand(product, 18)
+        batch.product = other
+        batch.save()
+        self.assertOnHand(product, 10)
+        self.assertOnHand(other, 8)
+        batch.delete()
+        self.assertOnHand(other, 0)
+
+        stock_out = StockOut.objects.create(product=product, stock_out_quantity=3)
+        self.assertOnHand(product, 7)
+        stock_out.stock_out_quantity = 1
+        stock_out.save()
+        self.assertOnHand(product, 9)
+        stock_out.delete()
+        self.assertOnHand(product, 10)
+
+        invoice = commit_invoice([(product.pk, Decimal('4'), Decimal('6.00')), (product.pk, Decimal('2'), Decimal('6.00'))],
+                                 date=timezone.now().date())
+        self.assertOnHand(product, 4)
+        invoice.delete()
+        self.assertOnHand(product, 10)
+
+    def test_sales_reserve_what_is_on_hand(self):
+        product = stocked_product(3)
+        with self.assertRaises(InsufficientStock), transaction.atomic():
+            commit_invoice([(product.pk, Decimal('4'), Decimal('6.00'))], date=timezone.now().date())
+        self.assertOnHand(product, 3)
+        commit_invoice([(product.pk, Decimal('3'), Decimal('6.00'))], date=timezone.now().date())
+        self.assertOnHand(product, 0)
+
+
+class ReserveStockTests(TestCase):
+    def test_reserves(self):
+        product = stocked_product(5)
+        with transaction.atomic():
+            reserve_stock({product.pk: 3})
+        product.refresh_from_db()
+        self.assertEqual(product.on_hand, 2)
+
+    def test_shortfall_changes_nothing(self):
+        product = stocked_product(5)
+        other = Product.objects.create(category=product.category, name='Saw', buying_price=Decimal('9.00'))
+        StockIn.objects.create(product=other, buying_price_item=Decimal('9.00'), stock_quantity=Decimal('1'))
+        with self.assertRaises(InsufficientStock) as caught, transaction.atomic():
+            reserve_stock({product.pk: 3, other.pk: 2})
+        self.assertEqual(caught.exception.shortages, {other.pk: (2, 1)})
+        product.refresh_from_db()
+        self.assertEqual(product.on_hand, 5)
+
+    def test_unknown_product(self):
+        with self.assertRaises(ValidationError), transaction.atomic():
+            reserve_stock({987654: 1})
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    """Two tills reaching for the last units at the same time."""
+
+    def run_threads(self, *targets):
+        errors = []
+
+        def run(target):
+            try:
+                target()
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+        self.assertFalse(errors, errors)
+
+    def test_overlapping_reservations(self):
+        product = stocked_product(3)
+        first_reserved, second_started = threading.Event(), threading.Event()
+        outcomes = {}
+
+        def first():
+            with transaction.atomic():
+                reserve_stock({product.pk: 3})
+                first_reserved.set()
+                # hold the reservation open while the second till tries
+                second_started.wait(timeout=10)
+                time.sleep(0.05)
+            outcomes['first'] = 'sold'
+
+        def second():
+            first_reserved.wait(timeout=10)
+            second_started.set()
+            try:
+                reserve_retrying({product.pk: 2})
+            except InsufficientStock:
+                outcomes['second'] = 'rejected'
+            else:
+                outcomes['second'] = 'sold'
+
+        self.run_threads(first, second)
+        self.assertEqual(outcomes, {'first': 'sold', 'second': 'rejected'})
+        product.refresh_from_db()
+        self.assertEqual(product.on_hand, 0)
+
+    def test_racing_for_the_last_units(self):
+        product = stocked_product(3)
+        start = threading.Barrier(2)
+        outcomes = []
+
+        def till():
+            start.wait(timeout=10)
+            try:
+                reserve_retrying({product.pk: 2})
+            except InsufficientStock:
+                outcomes.append('rejected')
+            else:
+                outcomes.append('sold')
+
+        self.run_threads(till, till)
+        self.assertEqual(sorted(outcomes), ['rejected', 'sold'])
+        product.refresh_from_db()
+        self.assertEqual(product.on_hand, 1)
+
+
+class StockImportTests(TestCase):
+    def setUp(self):
+        self.product = stocked_product(0)
+
+    def csv(self, *rows):
+        lines = ['product,quantity,buying_price,selling_price', *rows]
+        return io.BytesIO('\n'.join(lines).encode())
+
+    def test_oversized_numbers_are_row_errors(self):
+        result = import_stockins(self.csv(
+            'Hammer,2,4.00,6.00',
+            'Hammer,1e27,4.00,6.00',
+            'Hammer,2,99999999999999999999999999999,6.00',
+            'Hammer,2,4.00,1e400000000',
+            'Hammer,10000000000,4.00,6.00',
+            'Hammer,2,4.00,lots',
+        ), 'stock.csv', skip_invalid=True)
+        self.assertEqual(result.created, 1)
+        self.assertEqual([error.line for error in result.errors], [3, 4, 5, 6, 7])
+        self.assertIn('quantity', result.errors[0].message)
+        self.assertIn('buying_price', result.errors[1].message)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.on_hand, Decimal('2'))
+
+    def test_upload_with_oversized_number(self):
+        user = get_user_model().objects.create_superuser(username='owner', password='owner', email='owner@example.com')
+        self.client.force_login(user)
+        upload = SimpleUploadedFile('stock.csv', self.csv('Hammer,1e27,4.00,6.00').getvalue())
+        response = self.client.post(reverse('products:import_stock'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([error.line for error in response.context['errors']], [2])
+        self.assertFalse(StockIn.objects.filter(product=self.product, stock_quantity__gt=0).exists())
+
+    def test_reader_tolerates_a_closed_file(self):
+        file = self.csv('Hammer,2,4.00,6.00')
+        rows = read_table(file, 'stock.csv')
+        next(rows)
+        file.close()
+        rows.close()
+
+    def test_oversized_form_input_is_a_validation_error(self):
+        with self.assertRaises(ValidationError):
+            StockIn(product=self.product, buying_price_item=Decimal('1e27'), stock_quantity=Decimal('1')).save()
+
+
+class CostLayerTests(TestCase):
+    """Stock-outs are costed from the StockIn batches they draw, oldest first."""
+
+    def setUp(self):
+        self.product = stocked_product(0)  # fallback buying_price 4.00
+        self.old = self.batch(5, '2.00', days_ago=10)
+        self.new = self.batch(5, '6.00', days_ago=5)
+
+    def batch(self, units, price, days_ago=0):
+        return StockIn.objects.create(product=self.product, buying_price_item=Decimal(price),
+                                      stock_quantity=Decimal(units),
+                                      date=timezone.localdate() - datetime.timedelta(days=days_ago))
+
+    def out(self, units):
+        return StockOut.objects.create(product=self.product, stock_out_quantity=units)
+
+    def remaining(self):
+        for batch in (self.old, self.new):
+            batch.refresh_from_db()
+        return [self.old.remaining_quantity, self.new.remaining_quantity]
+
+    def assertLayersMatchOnHand(self):
+        self.product.refresh_from_db()
+        held = sum(StockIn.objects.filter(product=self.product).values_list('remaining_quantity', flat=True))
+        self.assertEqual(held, self.product.on_hand)
+
+    def test_fifo_across_batches(self):
+        self.assertEqual(self.out(7).cost, Decimal('22.00'))  # 5 x 2.00 + 2 x 6.00
+        self.assertEqual(self.remaining(), [Decimal('0'), Decimal('3')])
+        self.assertEqual(self.out(3).cost, Decimal('18.00'))
+        self.assertLayersMatchOnHand()
+
+    @override_settings(COST_METHOD='average')
+    def test_average_across_batches(self):
+        self.assertEqual(self.out(7).cost, Decimal('28.00'))  # 7 x (10.00 + 30.00) / 10
+        self.assertEqual(self.remaining(), [Decimal('0'), Decimal('3')])
+        self.assertEqual(self.out(3).cost, Decimal('18.00'))  # only the 6.00 batch is left
+
+    def test_beyond_the_batches_costs_the_buying_price(self):
+        self.assertEqual(self.out(12).cost, Decimal('48.00'))  # 10 from batches + 2 x 4.00
+
+    def test_sale_lines_carry_the_cost(self):
+        invoice = commit_invoice([(self.product.pk, Decimal('6'), Decimal('9.00'))], date=timezone.localdate())
+        self.assertEqual(invoice.invoice_items.get().cost, Decimal('16.00'))
+
+    def test_delete_releases_the_units(self):
+        first, second = self.out(3), self.out(4)
+        self.assertEqual(self.remaining(), [Decimal('0'), Decimal('3')])
+        second.delete()
+        self.assertEqual(self.remaining(), [Decimal('2'), Decimal('5')])
+        first.delete()
+        self.assertEqual(self.remaining(), [Decimal('5'), Decimal('5')])
+        self.assertLayersMatchOnHand()
+
+    def test_replay_matches_the_running_layers(self):
+        self.out(3)
+        self.out(4)
+        remaining, costs = replay(
+            StockIn.objects.values_list('pk', 'product_id', 'date', 'stock_quantity', 'total_buying_amount'),
+            StockOut.objects.values_list('pk', 'product_id', 'date', 'stock_out_quantity'),
+            {self.product.pk: self.product.buying_price},
+        )
+        self.assertEqual(remaining, dict(StockIn.objects.values_list('pk', 'remaining_quantity')))
+        self.assertEqual(costs, dict(StockOut.objects.values_list('pk', 'cost')))
+        call_command('rebuild_cost_layers', '--check', stdout=StringIO())
+
+    def test_rebuild_after_a_back_dated_batch(self):
+        sold = self.out(7)
+        self.batch(5, '1.00', days_ago=20)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_cost_layers', '--check', stdout=StringIO())
+        call_command('rebuild_cost_layers', stdout=StringIO())
+        sold.refresh_from_db()
+        self.assertEqual(sold.cost, Decimal('9.00'))  # 5 x 1.00 + 2 x 2.00
+        self.assertLayersMatchOnHand()
+
+    def test_edit_cannot_shrink_below_what_went_out(self):
+        self.out(4)
+        self.old.stock_quantity = Decimal('2')
+        with self.assertRaises(ValidationError):
+            self.old.save()
+        with self.assertRaises(ValidationError):
+            self.old.full_clean()
+        self.old.refresh_from_db()
+        self.assertEqual((self.old.stock_quantity, self.old.remaining_quantity), (Decimal('5'), Decimal('1')))
+        self.assertLayersMatchOnHand()
+
+        self.old.stock_quantity = Decimal('4')
+        self.old.save()
+        self.assertEqual(self.remaining(), [Decimal('0'), Decimal('5')])
+        self.old.stock_quantity = Decimal('8')
+        self.old.save()
+        self.assertEqual(self.remaining(), [Decimal('4'), Decimal('5')])
+        self.assertLayersMatchOnHand()
+
+    def test_edit_cannot_move_a_consumed_batch(self):
+        self.out(1)
+        self.old.product = Product.objects.create(category=self.product.category, name='Saw', buying_price=1)
+        with self.assertRaises(ValidationError):
+            self.old.save()
+
+
+class PricingTests(TestCase):
+    def test_totals_are_exact_and_round_half_up(self):
+        self.assertEqual(stockin_totals(0.1, 0, 3, '0.125'), (Decimal('0.30'), Decimal('0.38')))
+        self.assertEqual(stockin_totals('10.00', '5', '3', '12.50'), (Decimal('31.50'), Decimal('37.50')))
+        self.assertEqual(stockin_totals('', None, '2', '1'), (Decimal('0.00'), Decimal('2.00')))
+
+    def test_bad_inputs_are_named(self):
+        with self.assertRaises(ValidationError) as caught:
+            stockin_totals('abc', '-1', 'nan', '1e27')
+        self.assertEqual(set(caught.exception.message_dict), set(INPUTS))
+        with self.assertRaises(ValidationError) as caught:
+            stockin_totals('9999999999', 0, '99999', 0)
+        self.assertIn('__all__', caught.exception.message_dict)
+        with self.assertRaises(ValidationError):
+            to_decimal('Infinity', 'stock_quantity')
+        self.assertEqual(to_decimal(0.1, 'stock_quantity'), Decimal('0.1'))
+
+    def test_save_prices_the_batch(self):
+        product = stocked_product(0)
+        batch = StockIn.objects.create(product=product, buying_price_item=0.1, stock_quantity=3,
+                                       selling_price_item='0.125')
+        batch.refresh_from_db()
+        self.assertEqual((batch.total_buying_amount, batch.total_selling_amount), (Decimal('0.30'), Decimal('0.38')))
+
+    def test_price_stockins_reports_failures_per_row(self):
+        good = StockIn(buying_price_item='2.00', stock_quantity='3', selling_price_item='2.50')
+        bad = StockIn(buying_price_item='-2', stock_quantity='3', selling_price_item='2.50')
+        failures = price_stockins([good, bad])
+        self.assertEqual([index for index, _ in failures], [1])
+        self.assertEqual((good.total_buying_amount, good.total_selling_amount), (Decimal('6.00'), Decimal('7.50')))
+
+    def test_recompute_fixes_stale_totals_and_the_daily_log(self):
+        product = stocked_product(0)
+        batches = [StockIn.objects.create(product=product, buying_price_item='0.10', stock_quantity=3,
+                                          selling_price_item='1.00') for _ in range(5)]
+        # what the old float rounding left behind, in the rows and in the log
+        stale = StockIn.objects.filter(pk__in=[batch.pk for batch in batches[:3]])
+        stale.update(total_buying_amount=Decimal('0.29'), total_selling_amount=Decimal('3.01'))
+        DailyLog.post(timezone.localdate(), total_purchases=Decimal('-0.03'))
+
+        self.assertEqual(recompute_totals(chunk_size=2), (3, []))
+        self.assertEqual(set(StockIn.objects.filter(stock_quantity=3)
+                             .values_list('total_buying_amount', 'total_selling_amount')),
+                         {(Decimal('0.30'), Decimal('3.00'))})
+        log = DailyLog.objects.get(date=timezone.localdate())
+        self.assertEqual(log.total_purchases, DailyLog.totals_from_history()[log.date]['total_purchases'])
+        self.assertEqual(recompute_totals(), (0, []))
+        call_command('rebuild_stockin_totals', '--check', stdout=StringIO())
+
+
+class RepricingTests(TestCase):
+    def setUp(self):
+        self.tools = Category.objects.create(name='Tools')
+        self.paint = Category.objects.create(name='Paint')
+        self.hammer = Product.objects.create(category=self.tools, name='Hammer', buying_price=Decimal('4.00'))
+        self.brush = Product.objects.create(category=self.paint, name='Brush', buying_price=Decimal('2.00'))
+        self.sold_out = self.batch(self.hammer, 2, '8.00')
+        self.in_stock = self.batch(self.hammer, 3, '10.00')
+        StockOut.objects.create(product=self.hammer, stock_out_quantity=2)  # draws the older batch
+        self.brushes = self.batch(self.brush, 4, '3.00')
+
+    def batch(self, product, units, price):
+        return StockIn.objects.create(product=product, buying_price_item=Decimal('1.00'),
+                                      selling_price_item=Decimal(price), stock_quantity=Decimal(units))
+
+    def selling(self, batch):
+        batch.refresh_from_db()
+        return batch.selling_price_item, batch.total_selling_amount
+
+    def test_percent_on_stock_in_hand(self):
+        self.sold_out.refresh_from_db()
+        self.assertEqual(self.sold_out.remaining_quantity, Decimal('0'))
+        change = apply_reprice([self.tools], PriceChange.TARGET_SELLING, PriceChange.MODE_PERCENT, '12.5')
+        self.assertEqual(self.selling(self.in_stock), (Decimal('11.25'), Decimal('33.75')))
+        self.assertEqual(self.selling(self.sold_out), (Decimal('8.00'), Decimal('16.00')))
+        self.assertEqual(self.selling(self.brushes), (Decimal('3.00'), Decimal('12.00')))
+        self.hammer.refresh_from_db()
+        self.assertEqual(self.hammer.buying_price, Decimal('4.00'))
+        self.assertEqual((change.categories, change.products_changed, change.stockins_changed), (['Tools'], 0, 1))
+
+    def test_amount_on_buying_price_never_goes_below_zero(self):
+        change = apply_reprice(None, PriceChange.TARGET_BUYING, PriceChange.MODE_AMOUNT, '-3')
+        self.assertEqual(dict(Product.objects.values_list('name', 'buying_price')),
+                         {'Hammer': Decimal('1.00'), 'Brush': Decimal('0.00')})
+        self.assertEqual(self.selling(self.in_stock), (Decimal('10.00'), Decimal('30.00')))
+        self.assertEqual((change.categories, change.products_changed, change.stockins_changed), ([], 2, 0))
+
+    def test_preview_changes_nothing(self):
+        result = preview([self.tools, self.paint], PriceChange.TARGET_BOTH, PriceChange.MODE_PERCENT, '-10')
+        self.assertEqual((result['products'], result['stockins']), (2, 2))
+        self.assertEqual([(row['product__name'], row['new_price']) for row in result['stockin_rows']],
+                         [('Brush', Decimal('2.70')), ('Hammer', Decimal('9.00'))])
+        self.assertEqual(self.selling(self.in_stock), (Decimal('10.00'), Decimal('30.00')))
+        self.assertFalse(PriceChange.objects.exists())
+
+    def test_bad_adjustments_are_refused(self):
+        for target, mode, value in ((PriceChange.TARGET_SELLING, PriceChange.MODE_PERCENT, '-100'),
+                                    (PriceChange.TARGET_SELLING, PriceChange.MODE_AMOUNT, 'abc'),
+                                    (PriceChange.TARGET_SELLING, 'double', '1'),
+                                    ('everything', PriceChange.MODE_AMOUNT, '1')):
+            with self.subTest(target=target, mode=mode, value=value):
+                with self.assertRaises(ValidationError):
+                    apply_reprice(None, target, mode, value)
+        self.assertFalse(PriceChange.objects.exists())
+
+    def test_command(self):
+        out = StringIO()
+        call_command('reprice_categories', '--category', 'tools', '--percent', '10', '--dry-run', stdout=out)
+        self.assertIn('would change', out.getvalue())
+        self.assertFalse(PriceChange.objects.exists())
+        call_command('reprice_categories', '--category', str(self.tools.pk), '--amount', '1', '--target', 'both',
+                     '--note', 'supplier list', stdout=StringIO())
+        self.assertEqual(self.selling(self.in_stock), (Decimal('11.00'), Decimal('33.00')))
+        self.assertEqual(PriceChange.objects.get().note, 'supplier list')
+        for args in (['--percent', '5'], ['--all', '--category', 'tools', '--percent', '5'],
+                     ['--category', 'garden', '--percent', '5'], ['--all', '--percent', '-100']):
+            with self.subTest(args=args):
+                with self.assertRaises(CommandError):
+                    call_command('reprice_categories', *args, stdout=StringIO())
@@ -12,10 +12,12 @@ urlpatterns = [
     # Products
     path('list/', views.product_list, name='product_list'),
     path('add-product/', views.add_product, name='add_product'),
+    path('search/', views.product_search, name='product_search'),
     path('update/<int:pk>/', views.update_product, name='update_product'),
     path('delete/<int:pk>/', views.delete_product, name='delete_product'),
         # Global stockin/out pages
     path('add-stock/', views.add_stock, name='add_stock'),
+    path('stockin/import/', views.import_stock, name='import_stock'),
     path('stockin/', views.stockin_list, name='stockin_list'),
     path('stockin/<int:pk>/', views.stockin_detail, name='stockin_detail'),
 
@@ -1,10 +1,17 @@
 # products/views.py
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from .forms import CategoryForm, ProductForm, StockInForm, StockOutForm 
+from .forms import CategoryForm, ProductForm, StockImportForm, StockInForm, StockOutForm
 from .models import Product, Category, StockIn, StockOut
 from django.utils import timezone
+from django.db.models import OuterRef, Subquery
+from django.views.decorators.http import require_GET
 from .forms import StockOutForm
+from earthshop.typeahead import etag_json_response, parse_limit, rows_in_order
+from search.services import search_ids
+from earthshop.pagination import keyset_paginate
+from earthshop.imports import ImportFormatError
+from .stock_import import import_stockins
 
 
 
@@ -40,9 +47,35 @@ def add_product(request):
     return render(request, 'products/add_product.html', {'form': form})
 
 def product_list(request):
-    products = Product.objects.all()
+    # on_hand is stored on the row, so the whole list is a single query
+    products = Product.objects.select_related('category').all()
     return render(request, 'products/product_list.html', {'products': products})
 
+@require_GET
+def product_search(request):
+    """
+    Typeahead for the POS screen: GET ?q=<text>&limit=<n>
+    Returns [{id, name, category, on_hand, price}], best matches first.
+    `price` is the selling price of the latest stock-in batch.
+    """
+    term = (request.GET.get('q') or '').strip()
+    if not term:
+        return etag_json_response(request, [])
+    latest_price = StockIn.objects.filter(product=OuterRef('pk')).order_by('-date', '-id').values('selling_price_item')[:1]
+    qs = Product.objects.annotate(price=Subquery(latest_price)).values(
+        'id', 'name', 'category__name', 'on_hand', 'price')
+    rows = rows_in_order(qs, search_ids('product', term, parse_limit(request)))
+    return etag_json_response(request, [
+        {
+            'id': r['id'],
+            'name': r['name'],
+            'category': r['category__name'],
+            'on_hand': r['on_hand'],
+            'price': r['price'] or 0,
+        }
+        for r in rows
+    ])
+
 def update_product(request, pk):
     product = get_object_or_404(Product, pk=pk)
     if request.method == "POST":
@@ -70,7 +103,7 @@ def product_stockins(request, product_id):
     URL: /products/product/<product_id>/stockin/
     """
     product = get_object_or_404(Product, pk=product_id)
-    stockins = StockIn.objects.filter(product=product).order_by('-date', '-id')
+    stockins = keyset_paginate(StockIn.objects.filter(product=product).select_related('product'), request)
     return render(request, 'products/stockin_list.html', {
         'product': product,
         'stockins': stockins,
@@ -112,13 +145,52 @@ def add_stock(request):
     })
 
 
+# errors listed on the result page; the command writes them all
+MAX_LISTED_ERRORS = 500
+
+
+def import_stock(request):
+    """
+    Bulk stock-in from an uploaded CSV/XLSX file (products.stock_import).
+    The result page lists the rows that could not be imported.
+    """
+    result = None
+    if request.method == 'POST':
+        form = StockImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_stockins(
+                    upload, upload.name,
+                    dry_run=form.cleaned_data['dry_run'],
+                    skip_invalid=form.cleaned_data['skip_invalid'],
+                )
+            except ImportFormatError as exc:
+                form.add_error('file', str(exc))
+            else:
+                if result.created:
+                    messages.success(request, f"Imported {result.created} stock-in rows for {result.products} products.")
+                elif result.dry_run and not result.errors:
+                    messages.success(request, f"All {result.valid} rows are valid; nothing was imported (check only).")
+                elif result.errors:
+                    messages.error(request, f"{len(result.errors)} rows have errors; nothing was imported.")
+    else:
+        form = StockImportForm()
+
+    return render(request, 'products/import_stock.html', {
+        'form': form,
+        'result': result,
+        'errors': result.errors[:MAX_LISTED_ERRORS] if result else [],
+    })
+
+
 def product_stockouts(request, product_id):
     """
     Show the product-specific StockOut list (newest first).
     URL: /products/product/<product_id>/stockout/
     """
     product = get_object_or_404(Product, pk=product_id)
-    stockouts = StockOut.objects.filter(product=product).order_by('-date', '-id')
+    stockouts = keyset_paginate(StockOut.objects.filter(product=product).select_related('product'), request)
     return render(request, 'products/stockout_list.html', {
         'product': product,
         'stockouts': stockouts,
@@ -160,7 +232,7 @@ def add_stock_out(request, product_id):
 
 # List all stockins
 def stockin_list(request):
-    stockins = StockIn.objects.select_related('product', 'product__category').all().order_by('-date', '-id')
+    stockins = keyset_paginate(StockIn.objects.select_related('product', 'product__category'), request)
     return render(request, 'products/stockin_list.html', {'stockins': stockins, 'product_specific': False})
 
 # StockIn detail (shows related stockins for a product or a specific record)
@@ -172,7 +244,7 @@ def stockin_detail(request, pk):
 
 
 def stockout_list(request):
-    stockouts = StockOut.objects.select_related('product', 'invoice').all().order_by('-date', '-id')
+    stockouts = keyset_paginate(StockOut.objects.select_related('product', 'invoice'), request)
     return render(request, 'products/stockout_list.html', {'stockouts': stockouts, 'product_specific': False})
 
 
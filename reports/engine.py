@@ -0,0 +1,217 @@
+"""
+Monthly figures built from grouped SQL aggregates.
+
+compute_months() answers any span of months with one GROUP BY month
+query per source table (invoices, invoice items, stock-ins, expenses,
+installments); nothing is summed in Python row by row. Cost of goods
+is the cost recorded on each sale line from the StockIn batches it
+consumed (products.costing).
+
+Closed months are computed once and stored in MonthlyReport; after that
+a report only reads those rows and recomputes the open (current) month.
+A closed month changes only through `manage.py rebuild_monthly_reports`,
+e.g. after a back-dated correction.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Min, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from expenses.models import Expense
+from products.models import StockIn
+from sales.models import Invoice, InvoiceInstallment, InvoiceItem
+from .models import MonthlyReport
+
+TOP_PRODUCTS = 10
+ZERO = Decimal('0')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(first):
+    return (first + datetime.timedelta(days=32)).replace(day=1)
+
+
+def open_month():
+    """First day of the month that is still being written to."""
+    return month_start(timezone.localdate())
+
+
+def first_month():
+    """First day of the month of the earliest transaction, or None before there is any."""
+    firsts = [
+        model.objects.aggregate(first=Min('date'))['first']
+        for model in (Invoice, InvoiceInstallment, StockIn, Expense)
+    ]
+    firsts = [first for first in firsts if first]
+    return month_start(min(firsts)) if firsts else None
+
+
+def _by_month(queryset, date_field, *group_by, **aggregates):
+    return (
+        queryset.order_by().annotate(period=TruncMonth(date_field))
+        .values('period', *group_by).annotate(**aggregates)
+    )
+
+
+def _money(value):
+    return str((value or ZERO).quantize(Decimal('0.01')))
+
+
+def compute_months(start, end):
+    """
+    Figures for every month in [start, end) (first days of months), as
+    {month_first_day: {figure: value, 'breakdown': {...}}}. Months without
+    any activity are included with zeros.
+    """
+    months = {}
+    first = start
+    while first < end:
+        months[first] = {figure: ZERO for figure in MonthlyReport.FIGURES}
+        months[first]['invoice_count'] = 0
+        months[first]['breakdown'] = {'categories': [], 'products': [], 'expense_categories': []}
+        first = next_month(first)
+
+    def period(row):
+        value = row.pop('period')
+        return value.date() if isinstance(value, datetime.datetime) else value
+
+    invoices = Invoice.objects.filter(date__gte=start, date__lt=end)
+    for row in _by_month(invoices, 'date', invoice_count=Count('id'), total_sales=Sum('grand_total')):
+        months[period(row)].update({key: value or 0 for key, value in row.items()})
+
+    items = InvoiceItem.objects.filter(invoice__date__gte=start, invoice__date__lt=end)
+    for row in _by_month(items, 'invoice__date', cost_of_goods=Sum('cost')):
+        months[period(row)]['cost_of_goods'] = row['cost_of_goods'] or ZERO
+    for row in _by_month(items, 'invoice__date', 'item__category__name',
+                         revenue=Sum('total'), cost=Sum('cost'), quantity=Sum('quantity')):
+        months[period(row)]['breakdown']['categories'].append(row)
+    for row in _by_month(items, 'invoice__date', 'item_id', 'item__name',
+                         revenue=Sum('total'), cost=Sum('cost'), quantity=Sum('quantity')):
+        months[period(row)]['breakdown']['products'].append(row)
+
+    stockins = StockIn.objects.filter(date__gte=start, date__lt=end)
+    for row in _by_month(stockins, 'date', total_purchases=Sum('total_buying_amount')):
+        months[period(row)]['total_purchases'] = row['total_purchases'] or ZERO
+
+    installments = InvoiceInstallment.objects.filter(date__gte=start, date__lt=end)
+    for row in _by_month(installments, 'date', installments_received=Sum('paid_amount')):
+        months[period(row)]['installments_received'] = row['installments_received'] or ZERO
+
+    expenses = Expense.objects.filter(date__gte=start, date__lt=end)
+    for row in _by_month(expenses, 'date', 'category__name', amount=Sum('amount')):
+        month = months[period(row)]
+        month['total_expenses'] += row['amount'] or ZERO
+        month['breakdown']['expense_categories'].append(row)
+
+    for figures in months.values():
+        figures['gross_margin'] = figures['total_sales'] - figures['cost_of_goods']
+        figures['profit_loss'] = figures['gross_margin'] - figures['total_expenses']
+        figures['breakdown'] = _format_breakdown(figures['breakdown'])
+    return months
+
+
+def _format_breakdown(breakdown):
+    """JSON-ready breakdown rows, largest first; products cut to TOP_PRODUCTS."""
+    def rows(items, name_key, amount_key):
+        items = sorted(items, key=lambda row: row[amount_key] or ZERO, reverse=True)
+        return [
+            {
+                'name': row[name_key] or '(none)',
+                **{key: _money(value) for key, value in row.items() if key not in (name_key, 'item_id')},
+            }
+            for row in items
+        ]
+
+    return {
+        'categories': rows(breakdown['categories'], 'item__category__name', 'revenue'),
+        'products': rows(breakdown['products'], 'item__name', 'revenue')[:TOP_PRODUCTS],
+        'expense_categories': rows(breakdown['expense_categories'], 'category__name', 'amount'),
+    }
+
+
+def close_months(start, end, force=False):
+    """
+    Store MonthlyReport rows for the closed months in [start, end) that do
+    not have one yet (all of them with force=True), computing the missing
+    span in a single pass. Months before the first transaction are never
+    stored. Returns the number of rows written.
+    """
+    end = min(end, open_month())
+    if start >= end:
+        return 0
+    existing = set(
+        MonthlyReport.objects.filter(year__gte=start.year, year__lte=end.year).values_list('year', 'month')
+    )
+    first = start
+    missing = []
+    while first < end:
+        if force or (first.year, first.month) not in existing:
+            missing.append(first)
+        first = next_month(first)
+    if not missing:
+        return 0
+    # force also drops rows cached for months before the first transaction
+    stale = missing
+    since = first_month()
+    missing = [first for first in missing if since and first >= since]
+    if not (missing or force):
+        return 0
+
+    computed = compute_months(missing[0], next_month(missing[-1])) if missing else {}
+    now = timezone.now()
+    with transaction.atomic():
+        if force:
+            months = Q()
+            for first in stale:
+                months |= Q(year=first.year, month=first.month)
+            MonthlyReport.objects.filter(months).delete()
+        # ignore_conflicts: another request may have closed the same month first
+        MonthlyReport.objects.bulk_create([
+            MonthlyReport(year=first.year, month=first.month, generated_at=now, **computed[first])
+            for first in missing
+        ], ignore_conflicts=True)
+    return len(missing)
+
+
+def year_report(year):
+    """
+    Figure rows for a calendar year, newest month first. Closed
+    months come from MonthlyReport (computed and stored on first use); the
+    open month, if it falls in `year`, is computed live. Future months
+    and months before the first transaction are left out; a year outside
+    that span raises ValueError.
+    """
+    current = open_month()
+    first = first_month() or current
+    if not first.year <= year <= current.year:
+        raise ValueError(f"No report for {year}: the books run from {first.year} to {current.year}.")
+    start = max(datetime.date(year, 1, 1), first)
+    end = min(datetime.date(year + 1, 1, 1), next_month(current))
+    close_months(start, end)
+
+    rows = [
+        {'month': datetime.date(report.year, report.month, 1), 'closed': True,
+         **{figure: getattr(report, figure) for figure in MonthlyReport.FIGURES},
+         'breakdown': report.breakdown}
+        for report in MonthlyReport.objects.filter(year=year)
+    ]
+    if current.year == year:
+        live = compute_months(current, next_month(current))[current]
+        rows.insert(0, {'month': current, 'closed': False, **live})
+    return rows
+
+
+def outstanding_receivables():
+    """
+    Amount still owed on all invoices right now: one aggregate over the
+    maintained payment columns of the unpaid invoices only (a partial index).
+    """
+    owed = ExpressionWrapper(F('grand_total') - F('paid_amount') - F('installments_paid'),
+                             output_field=DecimalField(max_digits=20, decimal_places=2))
+    return Invoice.objects.outstanding().aggregate(total=Sum(owed), invoices=Count('id'))
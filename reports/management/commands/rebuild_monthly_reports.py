@@ -0,0 +1,35 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from reports.engine import close_months, first_month, open_month
+from reports.models import MonthlyReport
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the cached MonthlyReport rows of closed months, e.g. after a "
+        "back-dated correction. The open month is always computed live."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help="Only this year (default: all history).")
+        parser.add_argument('--month', type=int, help="Only this month of --year.")
+
+    def handle(self, *args, **options):
+        year, month = options['year'], options['month']
+        if year and month:
+            start = datetime.date(year, month, 1)
+            end = (start + datetime.timedelta(days=32)).replace(day=1)
+        elif year:
+            start, end = datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+        else:
+            start, end = first_month(), open_month()
+            if start is None:
+                self.stdout.write("No transactions yet; nothing to report.")
+                return
+
+        written = close_months(start, end, force=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {written} closed month(s); {MonthlyReport.objects.count()} cached in total."
+        ))
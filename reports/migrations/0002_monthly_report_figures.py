@@ -0,0 +1,74 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:04
+
+from django.db import migrations, models
+
+
+def drop_stale_reports(apps, schema_editor):
+    # rows from before the engine lack most figures and would be served
+    # as cached closed months; they are recomputed on first view instead
+    db = schema_editor.connection.alias
+    apps.get_model('reports', 'MonthlyReport').objects.using(db).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_stale_reports, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='monthlyreport',
+            options={'ordering': ['-year', '-month']},
+        ),
+        migrations.AddField(
+            model_name='monthlyreport',
+            name='breakdown',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='monthlyreport',
+            name='cost_of_goods',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='monthlyreport',
+            name='gross_margin',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='monthlyreport',
+            name='installments_received',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='monthlyreport',
+            name='invoice_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='monthlyreport',
+            name='total_purchases',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='monthlyreport',
+            name='profit_loss',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='monthlyreport',
+            name='total_expenses',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='monthlyreport',
+            name='total_sales',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyreport',
+            constraint=models.UniqueConstraint(fields=('year', 'month'), name='monthlyreport_year_month_uniq'),
+        ),
+    ]
@@ -2,14 +2,34 @@ from django.db import models
 from django.utils import timezone
 
 class MonthlyReport(models.Model):
+    """
+    Figures for one closed month, computed once by reports.engine and
+    then served as is. The open (current) month is never stored.
+    """
     month = models.IntegerField()  # 1-12
     year = models.IntegerField()
-    total_sales = models.DecimalField(max_digits=12, decimal_places=2, default=0)
-    total_expenses = models.DecimalField(max_digits=12, decimal_places=2, default=0)
-    profit_loss = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    invoice_count = models.IntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cost_of_goods = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    gross_margin = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_purchases = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    installments_received = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_expenses = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit_loss = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # per category / product / expense category rows, see reports.engine
+    breakdown = models.JSONField(default=dict)
     generated_at = models.DateTimeField(default=timezone.now)
 
+    FIGURES = (
+        'invoice_count', 'total_sales', 'cost_of_goods', 'gross_margin', 'total_purchases',
+        'installments_received', 'total_expenses', 'profit_loss',
+    )
+
+    class Meta:
+        ordering = ['-year', '-month']
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month'], name='monthlyreport_year_month_uniq'),
+        ]
+
     def __str__(self):
         return f"{self.month}/{self.year} - Profit: {self.profit_loss}"
-
-# Create your models here.
@@ -1,3 +1,108 @@
+import datetime
+import unittest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from expenses.models import Expense
+from sales.models import Invoice, InvoiceInstallment
+from .engine import close_months, open_month, outstanding_receivables, year_report
+from .models import MonthlyReport
+
+FIRST = datetime.date(2024, 3, 5)
+
+
+class ReportSpanTests(TestCase):
+    def setUp(self):
+        Expense.objects.create(description='Rent', amount=Decimal('500.00'), date=FIRST)
+
+    def test_years_outside_the_books_are_refused(self):
+        for year in (0, 1, 1800, FIRST.year - 1, 9999, timezone.localdate().year + 1):
+            with self.subTest(year=year):
+                with self.assertRaises(ValueError):
+                    year_report(year)
+        self.assertFalse(MonthlyReport.objects.exists())
+
+    def test_first_year_starts_at_the_first_transaction(self):
+        rows = year_report(FIRST.year)
+        months = [row['month'] for row in rows]
+        self.assertEqual(months[-1], datetime.date(2024, 3, 1))
+        self.assertEqual(rows[-1]['total_expenses'], Decimal('500.00'))
+        self.assertFalse(MonthlyReport.objects.filter(year=2024, month__lt=3).exists())
+
+    def test_nothing_is_cached_before_the_first_transaction(self):
+        close_months(datetime.date(1800, 1, 1), datetime.date(2024, 6, 1))
+        self.assertEqual(
+            list(MonthlyReport.objects.order_by('month').values_list('year', 'month')),
+            [(2024, 3), (2024, 4), (2024, 5)],
+        )
+        # a forced rebuild also drops rows cached before the first transaction
+        MonthlyReport.objects.create(year=2023, month=12, generated_at=timezone.now())
+        self.assertEqual(close_months(datetime.date(2023, 1, 1), datetime.date(2024, 4, 1), force=True), 1)
+        self.assertFalse(MonthlyReport.objects.filter(year=2023).exists())
+
+
+class MonthlyReportPageTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser(username='owner', password='owner', email='owner@example.com')
+        self.client.force_login(user)
+        Expense.objects.create(description='Rent', amount=Decimal('500.00'), date=FIRST)
+
+    def test_out_of_range_year_shows_this_year(self):
+        this_year = timezone.localdate().year
+        for year in ('0', '-5', '1800', '2023', '9999', '99999999999999999999', 'soon'):
+            with self.subTest(year=year):
+                response = self.client.get(reverse('reports:monthly'), {'year': year})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['year'], this_year)
+        self.assertFalse(MonthlyReport.objects.filter(year__lt=FIRST.year).exists())
+        response = self.client.get(reverse('reports:monthly'), {'year': '2024'})
+        self.assertEqual(response.context['year'], 2024)
+
+    def test_bad_month_shows_no_breakdown(self):
+        for month in ('0', '13', '-1', '99999999999999999999', 'soon', ''):
+            with self.subTest(month=month):
+                response = self.client.get(reverse('reports:monthly'), {'year': '2024', 'month': month})
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNone(response.context['selected'])
+        response = self.client.get(reverse('reports:monthly'), {'year': '2024', 'month': '3'})
+        self.assertEqual(response.context['selected']['total_expenses'], Decimal('500.00'))
+
+    def test_open_month_without_any_transactions(self):
+        Expense.objects.all().delete()
+        response = self.client.get(reverse('reports:monthly'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['month'] for row in response.context['rows']], [open_month()])
+        self.assertFalse(MonthlyReport.objects.exists())
+
+
+class ReceivablesTests(TestCase):
+    def invoice(self, total, paid, *installments):
+        invoice = Invoice.objects.create(grand_total=Decimal(total), paid_amount=Decimal(paid))
+        for amount in installments:
+            InvoiceInstallment.objects.create(invoice=invoice, paid_amount=Decimal(amount))
+        return invoice
+
+    def test_owed_after_payments_and_installments(self):
+        self.invoice('100.00', '100.00')
+        self.invoice('100.00', '20.00', '30.00', '50.00')
+        self.invoice('100.00', '20.00', '30.00')
+        partly = self.invoice('250.00', '0.00', '50.00')
+        self.assertEqual(outstanding_receivables(), {'total': Decimal('250.00'), 'invoices': 2})
+
+        partly.invoice_installment.first().delete()
+        self.assertEqual(outstanding_receivables(), {'total': Decimal('300.00'), 'invoices': 2})
+        expected = Invoice.objects.with_payment_status().filter(remaining__gt=0)
+        self.assertEqual(outstanding_receivables()['invoices'], expected.count())
 
-# Create your tests here.
+    @unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite's")
+    def test_reads_only_the_unpaid_invoices(self):
+        with connection.cursor() as cursor:
+            query, params = Invoice.objects.outstanding().order_by().values('id').query.sql_with_params()
+            cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('invoice_outstanding_idx', plan)
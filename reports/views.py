@@ -1,7 +1,40 @@
+import datetime
+
 from django.shortcuts import render
+from django.utils import timezone
+
+from .engine import compute_months, next_month, open_month, outstanding_receivables, year_report
+
 
 def index(request):
-    return render(request, 'reports/index.html')
+    current = open_month()
+    return render(request, 'reports/index.html', {
+        'month': current,
+        'figures': compute_months(current, next_month(current))[current],
+        'receivables': outstanding_receivables(),
+    })
+
 
 def monthly_report(request):
-    return render(request, 'reports/monthly.html')
+    """ Month-by-month figures for ?year=YYYY; ?month=M adds that month's breakdown. """
+    try:
+        year = int(request.GET.get('year', ''))
+        rows = year_report(year)
+    except ValueError:
+        year = timezone.localdate().year
+        rows = year_report(year)
+    selected = None
+    try:
+        month = int(request.GET.get('month', ''))
+    except ValueError:
+        month = None
+    if month in range(1, 13):
+        wanted = datetime.date(year, month, 1)
+        selected = next((row for row in rows if row['month'] == wanted), None)
+
+    return render(request, 'reports/monthly.html', {
+        'year': year,
+        'rows': rows,
+        'selected': selected,
+        'receivables': outstanding_receivables(),
+    })
@@ -0,0 +1,56 @@
+import json
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from earthshop.benchmarking import scratch_database, stopwatch, summarize
+from products.models import Category, Product
+from sales.services import commit_invoice
+
+
+class Command(BaseCommand):
+    help = "Benchmark invoice commit latency for baskets of different sizes on a scratch database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[1, 10, 50, 200],
+                            help="Basket sizes to benchmark (default: 1 10 50 200).")
+        parser.add_argument('--runs', type=int, default=20, help="Invoices committed per basket size.")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        sizes = options['lines']
+        runs = options['runs']
+        results = []
+
+        with scratch_database():
+            category = Category.objects.create(name='Benchmark')
+            products = Product.objects.bulk_create([
+                Product(category=category, name=f'Bench product {i}', on_hand=10 ** 9, buying_price=Decimal('10.00'))
+                for i in range(max(sizes))
+            ])
+            today = timezone.now().date()
+
+            for size in sizes:
+                lines = [(p.pk, Decimal('1'), Decimal('15.00')) for p in products[:size]]
+                samples = []
+                with CaptureQueriesContext(connection) as ctx:
+                    for _ in range(runs):
+                        with stopwatch(samples):
+                            commit_invoice(lines, date=today)
+                row = {'lines': size, 'queries_per_invoice': len(ctx.captured_queries) // runs}
+                row.update(summarize(samples))
+                results.append(row)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'lines':>6} {'queries':>8} {'median ms':>10} {'p95 ms':>8} {'max ms':>8}")
+        for row in results:
+            self.stdout.write(
+                f"{row['lines']:>6} {row['queries_per_invoice']:>8} "
+                f"{row['median_ms']:>10.3f} {row['p95_ms']:>8.3f} {row['max_ms']:>8.3f}"
+            )
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0004_bankaccount_bankdetail_name_and_more'),
+        ('customers', '0004_alter_ledger_options_remove_ledger_created_at_and_more'),
+        ('sales', '0004_rename_payment_date_invoiceinstallment_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['-date', '-id'], name='invoice_date_id_idx'),
+        ),
+    ]
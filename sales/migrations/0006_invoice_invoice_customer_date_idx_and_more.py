@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0005_banktransaction_banktxn_account_date_idx_and_more'),
+        ('customers', '0005_ledger_ledger_customer_date_idx'),
+        ('sales', '0005_invoice_invoice_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['customer', '-date', '-id'], name='invoice_customer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoiceinstallment',
+            index=models.Index(fields=['invoice', '-date', '-id'], name='installment_invoice_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoiceinstallment',
+            index=models.Index(fields=['-date', '-id'], name='installment_date_id_idx'),
+        ),
+    ]
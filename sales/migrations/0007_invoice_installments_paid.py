@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:52
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_installments_paid(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Invoice = apps.get_model('sales', 'Invoice')
+    InvoiceInstallment = apps.get_model('sales', 'InvoiceInstallment')
+    paid = (
+        InvoiceInstallment.objects.using(db).filter(invoice=OuterRef('pk'))
+        .order_by().values('invoice').annotate(total=Sum('paid_amount')).values('total')
+    )
+    Invoice.objects.using(db).update(installments_paid=Coalesce(
+        Subquery(paid, output_field=models.DecimalField(max_digits=20, decimal_places=2)),
+        Value(Decimal('0')),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0006_invoice_invoice_customer_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='installments_paid',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=20),
+        ),
+        migrations.RunPython(backfill_installments_paid, migrations.RunPython.noop),
+    ]
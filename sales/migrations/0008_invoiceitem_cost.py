@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:07
+
+from django.db import migrations, models
+
+from products.costing import line_costs
+
+
+def backfill_line_costs(apps, schema_editor):
+    db = schema_editor.connection.alias
+    InvoiceItem = apps.get_model('sales', 'InvoiceItem')
+    StockOut = apps.get_model('products', 'StockOut')
+    costs = line_costs(
+        InvoiceItem.objects.using(db).order_by('id')
+        .values_list('pk', 'invoice_id', 'item_id', 'quantity', 'item__buying_price'),
+        StockOut.objects.using(db).filter(invoice__isnull=False).order_by('id')
+        .values_list('invoice_id', 'product_id', 'cost'),
+    )
+    InvoiceItem.objects.using(db).bulk_update(
+        [InvoiceItem(pk=pk, cost=value) for pk, value in costs.items()], ['cost'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_invoice_installments_paid'),
+        ('products', '0013_stockin_remaining_quantity_stockout_cost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoiceitem',
+            name='cost',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=20),
+        ),
+        migrations.RunPython(backfill_line_costs, migrations.RunPython.noop),
+    ]
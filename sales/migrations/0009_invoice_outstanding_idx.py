@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:06
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0005_banktransaction_banktxn_account_date_idx_and_more'),
+        ('customers', '0007_ledger_balance_date_order'),
+        ('sales', '0008_invoiceitem_cost'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('grand_total__gt', django.db.models.expressions.CombinedExpression(models.F('paid_amount'), '+', models.F('installments_paid')))), fields=['id'], name='invoice_outstanding_idx'),
+        ),
+    ]
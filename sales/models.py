@@ -1,11 +1,43 @@
 # sales/models.py
 from decimal import Decimal
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction
+from django.db.models import BooleanField, DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.conf import settings
 
 
+# still owed on the invoice, from the maintained columns; the partial
+# index invoice_outstanding_idx covers exactly these rows
+OUTSTANDING = Q(grand_total__gt=F('paid_amount') + F('installments_paid'))
+
+
+class InvoiceQuerySet(models.QuerySet):
+    def outstanding(self):
+        """Invoices not fully paid, read through invoice_outstanding_idx."""
+        return self.filter(OUTSTANDING)
+
+    def with_payment_status(self):
+        """
+        Annotate installments_total, paid_to_date, remaining and fully_paid
+        from one grouped subquery over the installments, so a list can show
+        payment status without a query per invoice.
+        """
+        money = DecimalField(max_digits=20, decimal_places=2)
+        installments = (
+            InvoiceInstallment.objects.filter(invoice=OuterRef('pk'))
+            .order_by().values('invoice').annotate(total=Sum('paid_amount')).values('total')
+        )
+        return self.annotate(
+            installments_total=Coalesce(Subquery(installments, output_field=money), Value(Decimal('0')), output_field=money),
+        ).annotate(
+            paid_to_date=ExpressionWrapper(F('installments_total') + F('paid_amount'), output_field=money),
+        ).annotate(
+            remaining=ExpressionWrapper(F('grand_total') - F('paid_to_date'), output_field=money),
+            fully_paid=ExpressionWrapper(Q(paid_to_date__gte=F('grand_total')), output_field=BooleanField()),
+        )
+
+
 class Invoice(models.Model):
     PAYMENT_CASH = 'Cash'
     PAYMENT_INSTALLMENT = 'Installment'
@@ -39,12 +71,23 @@ class Invoice(models.Model):
     remaining_payment = models.DecimalField(max_digits=20, decimal_places=2, default=0)
     cash_payment = models.DecimalField(max_digits=20, decimal_places=2, default=0)
     cash_returned = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    # sum of invoice_installment.paid_amount, maintained by InvoiceInstallment.save() and sales.signals
+    installments_paid = models.DecimalField(max_digits=20, decimal_places=2, default=0, editable=False)
 
     date = models.DateField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = InvoiceQuerySet.as_manager()
+
     class Meta:
         ordering = ['-date', '-id']
+        indexes = [
+            # backs keyset pagination of invoice_list (earthshop.pagination)
+            models.Index(fields=['-date', '-id'], name='invoice_date_id_idx'),
+            models.Index(fields=['customer', '-date', '-id'], name='invoice_customer_date_idx'),
+            # receivables (reports.engine.outstanding_receivables); most invoices are paid
+            models.Index(fields=['id'], condition=OUTSTANDING, name='invoice_outstanding_idx'),
+        ]
 
     def __str__(self):
         return str(self.id).zfill(7)
@@ -68,9 +111,14 @@ class Invoice(models.Model):
         self.remaining_payment = (self.grand_total - (self.paid_amount or Decimal('0.00')))
         self.save(update_fields=['sub_total', 'total_quantity', 'grand_total', 'remaining_payment'])
 
+    @classmethod
+    def add_installments_paid(cls, invoice_id, amount):
+        cls.objects.filter(pk=invoice_id).update(installments_paid=F('installments_paid') + amount)
+
     def total_paid_installments(self):
-        agg = self.invoice_installment.aggregate(total=Sum('paid_amount'))
-        return Decimal(agg.get('total') or 0)
+        # prefer the with_payment_status() annotation, then the maintained column
+        total = getattr(self, 'installments_total', None)
+        return Decimal(total if total is not None else self.installments_paid or 0)
 
     def is_fully_paid(self):
         return (self.total_paid_installments() + (self.paid_amount or Decimal('0'))) >= (self.grand_total or Decimal('0'))
@@ -88,6 +136,8 @@ class InvoiceItem(models.Model):
     quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     price = models.DecimalField(max_digits=20, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=20, decimal_places=2, default=0)  # quantity * price
+    # cost of goods sold for this line, from the stock-out's cost layers
+    cost = models.DecimalField(max_digits=20, decimal_places=2, default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -109,9 +159,32 @@ class InvoiceInstallment(models.Model):
     date = models.DateField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['invoice', '-date', '-id'], name='installment_invoice_date_idx'),
+            models.Index(fields=['-date', '-id'], name='installment_date_id_idx'),
+        ]
+
     def __str__(self):
         return f"Installment for {self.invoice} - {self.paid_amount}"
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.pk is None:
+                delta = self.paid_amount or Decimal('0')
+                old_invoice_id = None
+            else:
+                old = InvoiceInstallment.objects.filter(pk=self.pk).values('invoice_id', 'paid_amount').first()
+                old_invoice_id = old and old['invoice_id']
+                delta = (self.paid_amount or Decimal('0')) - (old['paid_amount'] if old else Decimal('0'))
+            super().save(*args, **kwargs)
+            if old_invoice_id is not None and old_invoice_id != self.invoice_id:
+                # moved to another invoice
+                Invoice.add_installments_paid(old_invoice_id, -old['paid_amount'])
+                delta = self.paid_amount or Decimal('0')
+            if delta:
+                Invoice.add_installments_paid(self.invoice_id, delta)
+
 
 # from django.db import models
 # from django.db.models import Sum
@@ -0,0 +1,112 @@
+# sales/services.py
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from earthshop.metrics import record_stock_movements
+from products.costing import consume
+from products.models import Product, StockOut
+from products.services import reserve_stock
+from .models import Invoice, InvoiceItem, InvoiceInstallment
+
+
+def parse_invoice_lines(items):
+    """
+    Normalise the POS 'items' payload (list of {item_id, qty, price})
+    into (product_id, qty, price) tuples. Lines without an item are skipped.
+    Raises ValidationError, naming every bad line, for an item id that is
+    not a number, a qty that is not a positive whole number or a price
+    that is not a non-negative amount.
+    """
+    lines, errors = [], []
+    for number, it in enumerate(items, start=1):
+        item_id = it.get('item_id')
+        if not item_id:
+            continue
+        try:
+            product_id = int(item_id)
+            qty = Decimal(str(it.get('qty') or '0'))
+            price = Decimal(str(it.get('price') or '0'))
+        except (InvalidOperation, TypeError, ValueError):
+            errors.append(f"Line {number}: item, quantity and price must be numbers.")
+            continue
+        if not qty.is_finite() or qty <= 0 or qty != qty.to_integral_value():
+            errors.append(f"Line {number}: quantity must be a whole number above zero.")
+        elif not price.is_finite() or price < 0:
+            errors.append(f"Line {number}: price cannot be negative.")
+        else:
+            lines.append((product_id, qty, price))
+    if errors:
+        raise ValidationError(errors)
+    return lines
+
+
+def commit_invoice(lines, date, payment_type=Invoice.PAYMENT_CASH, paid_amount=Decimal('0'), **invoice_fields):
+    """
+    Create an invoice with its items, stock-outs and advance installment.
+
+    The number of queries does not depend on the number of lines:
+    stock is reserved with a single guarded UPDATE (see
+    products.services.reserve_stock), cost layers are consumed with one
+    read and one bulk update (products.costing), products are fetched
+    with one in_bulk() and items and stock-outs are written with bulk_create().
+    Raises InsufficientStock, leaving nothing written, if any line
+    cannot be covered.
+    """
+    sub_total = Decimal('0')
+    total_qty = Decimal('0')
+    for _, qty, price in lines:
+        sub_total += qty * price
+        total_qty += qty
+
+    discount = invoice_fields.get('discount') or Decimal('0')
+    shipping = invoice_fields.get('shipping') or Decimal('0')
+    grand_total = (sub_total - discount + shipping)
+
+    # one product can appear on several lines
+    quantities = {}
+    for product_id, qty, _ in lines:
+        quantities[product_id] = quantities.get(product_id, 0) + int(qty)
+
+    with transaction.atomic():
+        # reserve first: a shortfall raises InsufficientStock before anything is written.
+        # This is also the on_hand update that bulk_create() skips for the stock-outs.
+        reserve_stock(quantities)
+        products = Product.objects.in_bulk(quantities)
+        # cost of goods per line, taken from the StockIn batches
+        costs = consume([(product_id, int(qty)) for product_id, qty, _ in lines])
+
+        invoice = Invoice.objects.create(
+            payment_type=payment_type,
+            total_quantity=total_qty,
+            sub_total=sub_total,
+            grand_total=grand_total,
+            paid_amount=paid_amount,
+            remaining_payment=(grand_total - paid_amount),
+            date=date,
+            **invoice_fields
+        )
+
+        # bulk_create() skips InvoiceItem.save(), so totals are set here
+        InvoiceItem.objects.bulk_create([
+            InvoiceItem(invoice=invoice, item=products[product_id], quantity=qty, price=price,
+                        total=qty * price, cost=cost)
+            for (product_id, qty, price), cost in zip(lines, costs)
+        ])
+        StockOut.objects.bulk_create([
+            StockOut(product=products[product_id], stock_out_quantity=int(qty), invoice=invoice, date=date, cost=cost)
+            for (product_id, qty, _), cost in zip(lines, costs)
+        ])
+        transaction.on_commit(lambda: record_stock_movements('out', len(lines)))
+
+        # If Installment and some paid amount, create installment record
+        if payment_type == Invoice.PAYMENT_INSTALLMENT and paid_amount > 0:
+            InvoiceInstallment.objects.create(
+                invoice=invoice,
+                paid_amount=paid_amount,
+                description='Advance Payment',
+                date=date
+            )
+
+    return invoice
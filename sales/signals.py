@@ -0,0 +1,13 @@
+# sales/signals.py
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Invoice, InvoiceInstallment
+
+
+@receiver(post_delete, sender=InvoiceInstallment)
+def installment_deleted(sender, instance, origin=None, **kwargs):
+    # nothing to keep in step when the invoice itself is being deleted
+    if isinstance(origin, Invoice) or getattr(origin, 'model', None) is Invoice:
+        return
+    Invoice.add_installments_paid(instance.invoice_id, -(instance.paid_amount or 0))
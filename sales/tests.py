@@ -1,3 +1,161 @@
+import datetime
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from django.urls import reverse
+
+from products.models import Category, Product, StockIn
+from .models import Invoice, InvoiceInstallment
+from .services import commit_invoice, parse_invoice_lines
+
+
+class ParseInvoiceLinesTests(TestCase):
+    def test_lines(self):
+        lines = parse_invoice_lines([
+            {'item_id': '3', 'qty': '2', 'price': '9.50'},
+            {'item_id': '', 'qty': '1', 'price': '1'},
+            {'item_id': 4, 'qty': 1, 'price': 0},
+        ])
+        self.assertEqual(lines, [(3, Decimal('2'), Decimal('9.50')), (4, Decimal('1'), Decimal('0'))])
+
+    def test_rejected_lines(self):
+        for line in (
+            {'item_id': '1', 'qty': 'two', 'price': '1'},
+            {'item_id': '1', 'qty': '0', 'price': '1'},
+            {'item_id': '1', 'qty': '-3', 'price': '1'},
+            {'item_id': '1', 'qty': '1.5', 'price': '1'},
+            {'item_id': '1', 'qty': 'NaN', 'price': '1'},
+            {'item_id': '1', 'qty': '1', 'price': '-0.01'},
+            {'item_id': '1', 'qty': '1', 'price': 'free'},
+            {'item_id': 'x', 'qty': '1', 'price': '1'},
+        ):
+            with self.subTest(line=line), self.assertRaises(ValidationError):
+                parse_invoice_lines([line])
+
+    def test_every_bad_line_is_named(self):
+        with self.assertRaises(ValidationError) as caught:
+            parse_invoice_lines([
+                {'item_id': '1', 'qty': '1', 'price': '1'},
+                {'item_id': '1', 'qty': '0', 'price': '1'},
+                {'item_id': '1', 'qty': '1', 'price': '-1'},
+            ])
+        self.assertEqual(len(caught.exception.messages), 2)
+        self.assertIn('Line 2', caught.exception.messages[0])
+        self.assertIn('Line 3', caught.exception.messages[1])
+
+
+class CreateInvoiceViewTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser(username='till', password='till', email='till@example.com')
+        self.client.force_login(user)
+        category = Category.objects.create(name='Tools')
+        self.product = Product.objects.create(category=category, name='Hammer', buying_price=Decimal('4.00'))
+        StockIn.objects.create(product=self.product, buying_price_item=Decimal('4.00'),
+                               selling_price_item=Decimal('6.00'), stock_quantity=Decimal('10'))
+
+    def post(self, qty, price='6.00', item_id=None):
+        return self.client.post(reverse('sales:create_invoice'), {
+            'items': json.dumps([{'item_id': item_id or self.product.pk, 'qty': qty, 'price': price}]),
+            'payment_type': Invoice.PAYMENT_CASH,
+        }, follow=True)
+
+    def test_rejected_line_is_a_message(self):
+        response = self.post('-2')
+        self.assertRedirects(response, reverse('sales:create_invoice'))
+        errors = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertEqual(errors, ["Line 1: quantity must be a whole number above zero."])
+        self.assertFalse(Invoice.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.on_hand, Decimal('10'))
+
+    def test_unknown_product_is_a_message(self):
+        response = self.post('1', item_id=987654)
+        self.assertRedirects(response, reverse('sales:create_invoice'))
+        errors = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertEqual(errors, ["Product(s) not found: 987654."])
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_valid_line_creates_the_invoice(self):
+        response = self.post('2')
+        invoice = Invoice.objects.get()
+        self.assertRedirects(response, reverse('sales:invoice_detail', kwargs={'pk': invoice.pk}))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.on_hand, Decimal('8'))
+
+
+class InstallmentsPaidTests(TestCase):
+    """Invoice.installments_paid always equals the sum of the invoice's installment rows."""
+
+    def setUp(self):
+        self.invoice = Invoice.objects.create(grand_total=Decimal('100.00'), paid_amount=Decimal('10.00'))
+        self.other = Invoice.objects.create(grand_total=Decimal('50.00'))
+
+    def pay(self, amount, invoice=None):
+        return InvoiceInstallment.objects.create(invoice=invoice or self.invoice, paid_amount=Decimal(amount))
+
+    def assertInStep(self):
+        for invoice in Invoice.objects.all():
+            rows = sum(invoice.invoice_installment.values_list('paid_amount', flat=True), Decimal('0'))
+            self.assertEqual(invoice.installments_paid, rows, f"invoice {invoice.pk}")
+
+    def test_create_edit_move_delete(self):
+        first, second = self.pay('20.00'), self.pay('30.00')
+        self.assertInStep()
+        first.paid_amount = Decimal('25.00')
+        first.save()
+        self.assertInStep()
+        second.invoice = self.other
+        second.save()
+        self.assertInStep()
+        first.delete()
+        self.assertInStep()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.installments_paid, Decimal('0'))
+
+    def test_deleting_the_invoice(self):
+        self.pay('20.00')
+        self.pay('20.00', self.other)
+        self.invoice.delete()
+        self.assertInStep()
+
+    def test_advance_payment_of_a_new_invoice(self):
+        category = Category.objects.create(name='Tools')
+        product = Product.objects.create(category=category, name='Hammer', buying_price=Decimal('4.00'))
+        StockIn.objects.create(product=product, buying_price_item=Decimal('4.00'), stock_quantity=Decimal('5'))
+        invoice = commit_invoice([(product.pk, Decimal('2'), Decimal('9.00'))], date=datetime.date(2025, 6, 1),
+                                 payment_type=Invoice.PAYMENT_INSTALLMENT, paid_amount=Decimal('8.00'))
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.installments_paid, Decimal('8.00'))
+        self.assertInStep()
+
+    def test_payment_status(self):
+        self.pay('20.00')
+        self.pay('70.00', self.other)
+        invoices = {invoice.pk: invoice for invoice in Invoice.objects.with_payment_status()}
+        unpaid, paid = invoices[self.invoice.pk], invoices[self.other.pk]
+        self.assertEqual((unpaid.installments_total, unpaid.paid_to_date, unpaid.remaining, unpaid.fully_paid),
+                         (Decimal('20.00'), Decimal('30.00'), Decimal('70.00'), False))
+        self.assertEqual((paid.remaining, paid.fully_paid), (Decimal('-20.00'), True))
+
+        # the methods give the same answers from the maintained column
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.total_paid_installments(), Decimal('20.00'))
+        self.assertEqual(self.invoice.remaining_installment_amount(), Decimal('70.00'))
+        self.assertFalse(self.invoice.is_fully_paid())
+        self.assertEqual(unpaid.remaining_installment_amount(), Decimal('70.00'))
 
-# Create your tests here.
+    def test_installment_pages(self):
+        user = get_user_model().objects.create_superuser(username='owner', password='owner', email='owner@example.com')
+        self.client.force_login(user)
+        response = self.client.post(reverse('sales:installment_add', args=[self.invoice.pk]),
+                                    {'paid_amount': '15.00', 'date': '2025-06-01'})
+        self.assertRedirects(response, reverse('sales:installment_list', args=[self.invoice.pk]))
+        response = self.client.get(reverse('sales:installment_list', args=[self.invoice.pk]))
+        self.assertEqual(response.context['remaining_amount'], Decimal('75.00'))
+        installment = self.invoice.invoice_installment.get()
+        self.client.post(reverse('sales:installment_delete', args=[installment.pk]))
+        self.assertInStep()
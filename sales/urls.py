@@ -12,6 +12,7 @@ urlpatterns = [
     # installments
     path('installments/<int:invoice_id>/', views.installment_list, name='installment_list'),
     path('installments/<int:invoice_id>/add/', views.installment_add, name='installment_add'),
+    path('installments/delete/<int:pk>/', views.installment_delete, name='installment_delete'),
 ]
 
 
@@ -3,17 +3,19 @@ import json
 from decimal import Decimal
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
-from django.core.paginator import Paginator
-from django.db import transaction
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 
 from .models import Invoice, InvoiceItem, InvoiceInstallment
 from .forms import InvoiceForm, InvoiceItemForm, InvoiceInstallmentForm
-from products.models import Product
+from .services import commit_invoice, parse_invoice_lines
+from products.services import InsufficientStock
 from customers.models import Customer
-from products.models import StockOut  # adjust path if your app is named differently
 from banking.models import Bank  # adjust if app label differs
+from search.services import matching_ids
+from earthshop.pagination import keyset_paginate
 
 
 def create_invoice(request):
@@ -40,102 +42,52 @@ def create_invoice(request):
         cash_returned = Decimal(request.POST.get('returned_cash') or '0')
         date = request.POST.get('date') or timezone.now().date()
 
-        # compute sub_total and total_quantity from items
-        sub_total = Decimal('0')
-        total_qty = Decimal('0')
-        for it in items:
-            q = Decimal(str(it.get('qty') or '0'))
-            p = Decimal(str(it.get('price') or '0'))
-            sub_total += (q * p)
-            total_qty += q
-
-        grand_total = (sub_total - discount + shipping)
-
-        # Start atomic transaction
-        with transaction.atomic():
-            customer = None
-            if customer_id:
-                try:
-                    customer = Customer.objects.get(pk=int(customer_id))
-                except Exception:
-                    customer = None
-
-            bank_obj = None
-            if bank_id:
-                try:
-                    bank_obj = Bank.objects.get(pk=int(bank_id))
-                except Exception:
-                    bank_obj = None
-
-            invoice = Invoice.objects.create(
-                customer=customer,
+        customer = None
+        if customer_id:
+            try:
+                customer = Customer.objects.get(pk=int(customer_id))
+            except Exception:
+                customer = None
+
+        bank_obj = None
+        if bank_id:
+            try:
+                bank_obj = Bank.objects.get(pk=int(bank_id))
+            except Exception:
+                bank_obj = None
+
+        try:
+            invoice = commit_invoice(
+                parse_invoice_lines(items),
+                date=date,
                 payment_type=payment_type,
+                paid_amount=paid_amount,
+                customer=customer,
                 bank_details=bank_obj,
-                total_quantity=total_qty,
-                sub_total=sub_total,
                 discount=discount,
                 shipping=shipping,
-                grand_total=grand_total,
-                paid_amount=paid_amount,
-                remaining_payment=(grand_total - paid_amount),
                 cash_payment=cash_payment,
                 cash_returned=cash_returned,
-                date=date
             )
-
-            # create invoice items and stockouts
-            for it in items:
-                item_id = it.get('item_id')
-                qty = Decimal(str(it.get('qty') or '0'))
-                price = Decimal(str(it.get('price') or '0'))
-                total = qty * price
-                if not item_id:
-                    continue
-                product = Product.objects.get(pk=int(item_id))
-                InvoiceItem.objects.create(
-                    invoice=invoice,
-                    item=product,
-                    quantity=qty,
-                    price=price,
-                    total=total
-                )
-                # Create a StockOut entry and decrement product.stock
-                try:
-                    StockOut.objects.create(
-                        product=product,
-                        stock_out_quantity=int(qty),
-                        invoice=invoice,
-                        date=date
-                    )
-                    # decrement product.stock if field exists
-                    if hasattr(product, 'stock'):
-                        product.stock = max(0, int(product.stock or 0) - int(qty))
-                        product.save(update_fields=['stock'])
-                except Exception:
-                    # if StockOut model or product.stock not present, ignore but log via messages
-                    pass
-
-            # If Installment and some paid amount, create installment record
-            if payment_type == Invoice.PAYMENT_INSTALLMENT and paid_amount > 0:
-                InvoiceInstallment.objects.create(
-                    invoice=invoice,
-                    paid_amount=paid_amount,
-                    description='Advance Payment',
-                    date=date
-                )
+        except ValidationError as exc:
+            # bad lines or unknown products; nothing was written
+            for message in exc.messages:
+                messages.error(request, message)
+            return redirect('sales:create_invoice')
+        except InsufficientStock as exc:
+            # nothing was written; let the cashier fix the basket
+            messages.error(request, str(exc))
+            return redirect('sales:create_invoice')
 
         messages.success(request, f"Invoice {str(invoice)} created successfully.")
         return redirect('sales:invoice_detail', pk=invoice.pk)
 
-    # GET - render form
-    products = Product.objects.all().order_by('name')
-    customers = Customer.objects.all().order_by('name')
+    # GET - render form. Products and customers are looked up through the
+    # products:product_search / customers:search typeahead endpoints.
     banks = Bank.objects.all().order_by('name')
     invoice_form = InvoiceForm(initial={'date': timezone.now().date()})
 
     return render(request, 'sales/create_invoice.html', {
-        'products': products,
-        'customers': customers,
         'banks': banks,
         'invoice_form': invoice_form,
         'today_date': timezone.now().date()
@@ -143,22 +95,22 @@ def create_invoice(request):
 
 
 def invoice_list(request):
-    qs = Invoice.objects.select_related('customer').all().order_by('-date', '-id')
+    # payment status comes from one grouped subquery, not three aggregates per row
+    qs = Invoice.objects.select_related('customer').with_payment_status().order_by('-date', '-id')
     # Filters
     q_name = request.GET.get('q_name')
     q_invoice = request.GET.get('q_invoice')
     q_date = request.GET.get('q_date')
 
     if q_name:
-        qs = qs.filter(customer__name__icontains=q_name)
+        # full-text index instead of a LIKE scan over customers
+        qs = qs.filter(customer_id__in=matching_ids('customer', q_name))
     if q_invoice:
         qs = qs.filter(id=int(q_invoice.lstrip('0') or 0))
     if q_date:
         qs = qs.filter(date=q_date)
 
-    paginator = Paginator(qs, 20)
-    page = request.GET.get('page')
-    invoices = paginator.get_page(page)
+    invoices = keyset_paginate(qs, request)
 
     return render(request, 'sales/invoice_list.html', {
         'invoices': invoices
@@ -180,7 +132,12 @@ def installment_list(request, invoice_id):
     installments = invoice.invoice_installment.all().order_by('-date', '-id')
     return render(request, 'sales/installment_list.html', {
         'invoice': invoice,
-        'installments': installments
+        'invoice_id': invoice.id,
+        'installments': installments,
+        'object_list': installments,
+        # read from Invoice.installments_paid, no aggregate
+        'total_paid_amount': invoice.total_paid_installments() + invoice.paid_amount,
+        'remaining_amount': invoice.remaining_installment_amount(),
     })
 
 
@@ -191,6 +148,7 @@ def installment_add(request, invoice_id):
         if form.is_valid():
             inst = form.save(commit=False)
             inst.invoice = invoice
+            # InvoiceInstallment.save() also adds the amount to invoice.installments_paid
             inst.save()
             messages.success(request, "Installment added.")
             return redirect('sales:installment_list', invoice_id=invoice.id)
@@ -202,6 +160,16 @@ def installment_add(request, invoice_id):
     })
 
 
+@require_POST
+def installment_delete(request, pk):
+    inst = get_object_or_404(InvoiceInstallment, pk=pk)
+    invoice_id = inst.invoice_id
+    # sales.signals takes the amount off invoice.installments_paid
+    inst.delete()
+    messages.success(request, "Installment deleted.")
+    return redirect('sales:installment_list', invoice_id=invoice_id)
+
+
 
 
 
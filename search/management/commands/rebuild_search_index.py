@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from search.services import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the FTS5 sync triggers and repopulate the search index from products, customers and invoices."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuilt = rebuild_index()
+        if rebuilt:
+            self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
+        else:
+            self.stdout.write("Not on SQLite: searches use LIKE queries and there is no index to rebuild.")
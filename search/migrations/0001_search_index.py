@@ -0,0 +1,35 @@
+from django.db import migrations
+
+from search import schema
+
+
+def create_index(apps, schema_editor):
+    # FTS5 is SQLite-only; other backends fall back to LIKE queries in
+    # search.services
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(schema.CREATE_TABLE)
+    for statement in schema.CREATE_TRIGGERS:
+        schema_editor.execute(statement)
+    for statement in schema.POPULATE:
+        schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in schema.DROP:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_on_hand'),
+        ('customers', '0004_alter_ledger_options_remove_ledger_created_at_and_more'),
+        ('sales', '0004_rename_payment_date_invoiceinstallment_date_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from search import schema
+
+
+def recreate_triggers(apps, schema_editor):
+    # sales.0007 rebuilds sales_invoice, which drops its triggers on a
+    # database that ran 0001 first; recreate them all and reindex the
+    # rows written in between
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in schema.DROP_TRIGGERS + schema.CREATE_TRIGGERS + schema.POPULATE:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_search_index'),
+        ('products', '0015_remove_product_stock'),
+        ('customers', '0007_ledger_balance_date_order'),
+        ('sales', '0008_invoiceitem_cost'),
+    ]
+
+    operations = [
+        migrations.RunPython(recreate_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,3 @@
+# The index is a raw FTS5 table (search.schema), not a model. This module
+# exists so Django sends this app post_migrate, which restores the sync
+# triggers (search.apps).
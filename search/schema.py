@@ -0,0 +1,132 @@
+"""
+SQLite FTS5 index over products, customers and invoices.
+
+Every indexed row lives in one `search_index` table. Its rowid is
+`<kind code> * KIND_SPAN + <source id>`: triggers replace or delete a
+row by rowid instead of scanning the index, and a search for one kind
+is a rowid range, which FTS5 applies while walking its doclists. The triggers keep the index
+in step with plain SQL writes too (bulk_create, update(), raw SQL).
+Product rows carry their category name, so searching for a category
+finds its products.
+
+SQLite drops a table's triggers with the table, and Django's schema
+editor rebuilds a table for many ALTERs (e.g. adding a NOT NULL column).
+The triggers are therefore recreated after every `migrate` (see
+search.apps) and by `manage.py rebuild_search_index`, not only by the
+migration that first created them.
+"""
+
+KIND_CODES = {
+    'product': 1,
+    'customer': 2,
+    'invoice': 3,
+}
+KIND_SPAN = 2 ** 40  # 1099511627776, spelled out in the SQL below
+
+CREATE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    kind UNINDEXED,
+    title,
+    body,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '1 2 3'
+)
+"""
+
+_PRODUCT_ROW = """
+    SELECT p.id + 1 * 1099511627776, 'product', p.name, COALESCE(c.name, '')
+    FROM products_product p LEFT JOIN products_category c ON c.id = p.category_id
+"""
+
+_CUSTOMER_ROW = """
+    SELECT c.id + 2 * 1099511627776, 'customer', c.name,
+           COALESCE(c.father_name, '') || ' ' || COALESCE(c.cnic, '') || ' ' ||
+           COALESCE(c.mobile, '') || ' ' || COALESCE(c.city, '')
+    FROM customers_customer c
+"""
+
+# invoices are searchable by their printed number (0000123) and plain id
+_INVOICE_ROW = """
+    SELECT i.id + 3 * 1099511627776, 'invoice', printf('%07d', i.id), CAST(i.id AS TEXT)
+    FROM sales_invoice i
+"""
+
+POPULATE = [
+    "DELETE FROM search_index",
+    "INSERT INTO search_index(rowid, kind, title, body) " + _PRODUCT_ROW,
+    "INSERT INTO search_index(rowid, kind, title, body) " + _CUSTOMER_ROW,
+    "INSERT INTO search_index(rowid, kind, title, body) " + _INVOICE_ROW,
+]
+
+CREATE_TRIGGERS = [
+    # products: only name/category changes touch the index, not stock updates
+    """
+    CREATE TRIGGER IF NOT EXISTS search_product_ai AFTER INSERT ON products_product BEGIN
+        INSERT INTO search_index(rowid, kind, title, body) """ + _PRODUCT_ROW + """ WHERE p.id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_product_au AFTER UPDATE OF name, category_id ON products_product
+    WHEN old.name IS NOT new.name OR old.category_id IS NOT new.category_id BEGIN
+        DELETE FROM search_index WHERE rowid = old.id + 1 * 1099511627776;
+        INSERT INTO search_index(rowid, kind, title, body) """ + _PRODUCT_ROW + """ WHERE p.id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_product_ad AFTER DELETE ON products_product BEGIN
+        DELETE FROM search_index WHERE rowid = old.id + 1 * 1099511627776;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_category_au AFTER UPDATE OF name ON products_category
+    WHEN old.name IS NOT new.name BEGIN
+        DELETE FROM search_index WHERE rowid IN (
+            SELECT id + 1 * 1099511627776 FROM products_product WHERE category_id = new.id);
+        INSERT INTO search_index(rowid, kind, title, body) """ + _PRODUCT_ROW + """ WHERE p.category_id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_customer_ai AFTER INSERT ON customers_customer BEGIN
+        INSERT INTO search_index(rowid, kind, title, body) """ + _CUSTOMER_ROW + """ WHERE c.id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_customer_au AFTER UPDATE ON customers_customer
+    WHEN old.name IS NOT new.name OR old.father_name IS NOT new.father_name OR old.cnic IS NOT new.cnic
+      OR old.mobile IS NOT new.mobile OR old.city IS NOT new.city BEGIN
+        DELETE FROM search_index WHERE rowid = old.id + 2 * 1099511627776;
+        INSERT INTO search_index(rowid, kind, title, body) """ + _CUSTOMER_ROW + """ WHERE c.id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_customer_ad AFTER DELETE ON customers_customer BEGIN
+        DELETE FROM search_index WHERE rowid = old.id + 2 * 1099511627776;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_invoice_ai AFTER INSERT ON sales_invoice BEGIN
+        INSERT INTO search_index(rowid, kind, title, body) """ + _INVOICE_ROW + """ WHERE i.id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_invoice_ad AFTER DELETE ON sales_invoice BEGIN
+        DELETE FROM search_index WHERE rowid = old.id + 3 * 1099511627776;
+    END
+    """,
+]
+
+TRIGGER_NAMES = [
+    'search_product_ai',
+    'search_product_au',
+    'search_product_ad',
+    'search_category_au',
+    'search_customer_ai',
+    'search_customer_au',
+    'search_customer_ad',
+    'search_invoice_ai',
+    'search_invoice_ad',
+]
+
+DROP_TRIGGERS = [f"DROP TRIGGER IF EXISTS {name}" for name in TRIGGER_NAMES]
+
+DROP = DROP_TRIGGERS + ["DROP TABLE IF EXISTS search_index"]
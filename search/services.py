@@ -0,0 +1,151 @@
+# search/services.py
+"""
+One entry point for text search over products, customers and invoices.
+
+On SQLite the lookups go through the FTS5 `search_index` table (see
+search.schema); other backends fall back to istartswith/icontains
+filters. Either way, search_ids() tops up word-prefix matches with
+substring matches.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from customers.models import Customer
+from products.models import Product
+from sales.models import Invoice
+from .schema import CREATE_TABLE, CREATE_TRIGGERS, DROP_TRIGGERS, KIND_CODES, KIND_SPAN, POPULATE, TRIGGER_NAMES
+
+# model and fallback fields for each indexed kind
+KINDS = {
+    'product': (Product, 'name', ('name', 'category__name')),
+    'customer': (Customer, 'name', ('name', 'father_name', 'cnic', 'mobile', 'city')),
+    'invoice': (Invoice, 'id', ()),
+}
+
+
+def use_fts():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(term):
+    """
+    Turn free text into an FTS5 query: every word must match as a prefix.
+    Returns '' when the text has no searchable words.
+    """
+    words = re.findall(r'\w+', term.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching_ids(kind, term):
+    """
+    Expression for `<fk>__in=` filters selecting the ids of `kind` rows
+    that match `term`, e.g. Invoice.objects.filter(customer_id__in=matching_ids('customer', q)).
+    """
+    model, _, fields = KINDS[kind]
+    if use_fts():
+        low, high = _rowid_range(kind)
+        return RawSQL(
+            "SELECT rowid - %s FROM search_index WHERE search_index MATCH %s AND rowid BETWEEN %s AND %s",
+            (low, match_expression(term) or '""', low, high),
+        )
+    return model.objects.filter(_fallback_filter(kind, term)).values('id')
+
+
+def search_ids(kind, term, limit=20):
+    """
+    Ids of `kind` rows matching `term`, at most `limit`: rows where every
+    word starts a word of the row first, best match first, then rows that
+    merely contain the text (so 'iker' still finds 'Hiker').
+    """
+    expression = match_expression(term)
+    if not expression:
+        return []
+    model, order_field, _ = KINDS[kind]
+    if use_fts():
+        low, high = _rowid_range(kind)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT rowid - %s FROM search_index"
+                " WHERE search_index MATCH %s AND rowid BETWEEN %s AND %s"
+                " ORDER BY rank LIMIT %s",
+                [low, expression, low, high, limit],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+    else:
+        prefix = model.objects.filter(_fallback_filter(kind, term, 'istartswith')).order_by(order_field)
+        ids = list(prefix.values_list('id', flat=True)[:limit])
+    if len(ids) < limit:
+        # substring matches are a LIMITed scan, only run when the index
+        # did not fill the page
+        rest = model.objects.filter(_fallback_filter(kind, term)).exclude(id__in=ids).order_by(order_field)
+        ids += list(rest.values_list('id', flat=True)[:limit - len(ids)])
+    return ids
+
+
+def search(term, kinds=None, limit=20):
+    """
+    Search every kind (or the given ones) and return a list of
+    {'kind', 'id', 'title'} dicts, best matches first within each kind.
+    """
+    results = []
+    for kind in kinds or KINDS:
+        model, _, _ = KINDS[kind]
+        ids = search_ids(kind, term, limit)
+        objects = model.objects.in_bulk(ids)
+        results += [
+            {'kind': kind, 'id': pk, 'title': str(objects[pk])}
+            for pk in ids if pk in objects
+        ]
+    return results
+
+
+def rebuild_index():
+    """
+    Recreate the sync triggers and repopulate search_index from the source
+    tables (SQLite only).
+    """
+    if not use_fts():
+        return False
+    with connection.cursor() as cursor:
+        for statement in [CREATE_TABLE, *DROP_TRIGGERS, *CREATE_TRIGGERS, *POPULATE]:
+            cursor.execute(statement)
+    return True
+
+
+def missing_triggers():
+    """Names of the sync triggers that are not in the database."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        present = {row[0] for row in cursor.fetchall()}
+    return [name for name in TRIGGER_NAMES if name not in present]
+
+
+def ensure_index(**kwargs):
+    """
+    post_migrate receiver: a migration that rebuilt an indexed table took
+    its triggers with it, and rows written since are missing from the
+    index, so recreate the triggers and repopulate.
+    """
+    if not use_fts() or 'search_index' not in connection.introspection.table_names():
+        return
+    if missing_triggers():
+        rebuild_index()
+
+
+def _rowid_range(kind):
+    low = KIND_CODES[kind] * KIND_SPAN
+    return low, low + KIND_SPAN - 1
+
+
+def _fallback_filter(kind, term, lookup='icontains'):
+    if kind == 'invoice':
+        digits = term.strip().lstrip('0')
+        return Q(id=int(digits)) if digits.isdigit() else Q(pk__in=[])
+    _, _, fields = KINDS[kind]
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__{lookup}': term})
+    return condition
@@ -0,0 +1,127 @@
+import unittest
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from customers.models import Customer
+from products.models import Category, Product
+from sales.models import Invoice
+from .schema import TRIGGER_NAMES
+from .services import missing_triggers, search, search_ids
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "the FTS5 index is SQLite-only")
+class IndexSyncTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Stationery')
+
+    def drop_trigger(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TRIGGER {name}")
+
+    def test_triggers_exist_after_migrate(self):
+        self.assertEqual(missing_triggers(), [])
+
+    def test_writes_reach_the_index(self):
+        product = Product.objects.create(category=self.category, name='Blue pen', buying_price=1)
+        customer = Customer.objects.create(name='Aslam', city='Lahore')
+        invoice = Invoice.objects.create()
+        self.assertEqual(search_ids('product', 'blue'), [product.pk])
+        self.assertEqual(search_ids('product', 'stationery'), [product.pk])
+        self.assertEqual(search_ids('customer', 'lahore'), [customer.pk])
+        self.assertEqual(search_ids('invoice', f'{invoice.pk:07d}'), [invoice.pk])
+
+        product.name = 'Red marker'
+        product.save()
+        self.category.name = 'Office'
+        self.category.save()
+        self.assertEqual(search_ids('product', 'blue'), [])
+        self.assertEqual(search_ids('product', 'office marker'), [product.pk])
+
+        number = f'{invoice.pk:07d}'
+        product.delete()
+        customer.delete()
+        invoice.delete()
+        self.assertEqual(search_ids('product', 'marker'), [])
+        self.assertEqual(search_ids('customer', 'aslam'), [])
+        self.assertEqual(search_ids('invoice', number), [])
+
+    def test_migrate_restores_dropped_triggers(self):
+        # what a table rebuild by the schema editor does
+        self.drop_trigger('search_invoice_ai')
+        invoice = Invoice.objects.create()
+        call_command('migrate', verbosity=0)
+        self.assertEqual(missing_triggers(), [])
+        self.assertEqual(search_ids('invoice', str(invoice.pk)), [invoice.pk])
+        later = Invoice.objects.create()
+        self.assertEqual(search_ids('invoice', str(later.pk)), [later.pk])
+
+    def test_rebuild_command_restores_triggers(self):
+        for name in TRIGGER_NAMES:
+            self.drop_trigger(name)
+        product = Product.objects.create(category=self.category, name='Stapler', buying_price=1)
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(missing_triggers(), [])
+        self.assertEqual(search_ids('product', 'stapler'), [product.pk])
+
+
+class SearchIdsTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Shoes')
+        self.make = lambda name: Product.objects.create(category=category, name=name, buying_price=1).pk
+
+    def test_prefix_matches_then_substring_matches(self):
+        hiker, jiker, iker = self.make('HIKER boots'), self.make('jiker'), self.make('Iker sandals')
+        self.make('Slippers')
+        self.assertEqual(search_ids('product', 'iker'), [iker, hiker, jiker])
+        self.assertEqual(search_ids('product', 'iker', limit=2), [iker, hiker])
+
+    def test_ranks_every_match(self):
+        pen = self.make('Pen')
+        for i in range(300):
+            self.make(f'Pen holder stand {i}')
+        self.assertEqual(search_ids('product', 'pe', limit=1), [pen])
+
+    def test_no_words(self):
+        self.make('Pen')
+        self.assertEqual(search_ids('product', ' -- '), [])
+
+
+class TypeaheadTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Shoes')
+        self.hiker = Product.objects.create(category=category, name='HIKER boots', buying_price=1)
+        self.iker = Product.objects.create(category=category, name='Iker sandals', buying_price=1)
+        self.customer = Customer.objects.create(name='Aslam', father_name='Akram', mobile='03001234567')
+
+    def test_product_search(self):
+        response = self.client.get(reverse('products:product_search'), {'q': 'iker'})
+        self.assertEqual([row['name'] for row in response.json()], ['Iker sandals', 'HIKER boots'])
+        self.assertEqual(set(response.json()[0]), {'id', 'name', 'category', 'on_hand', 'price'})
+        response = self.client.get(reverse('products:product_search'), {'q': 'iker', 'limit': '1'})
+        self.assertEqual([row['id'] for row in response.json()], [self.iker.pk])
+        self.assertEqual(self.client.get(reverse('products:product_search')).json(), [])
+
+    def test_customer_search(self):
+        for term in ('asl', 'akram', '0300'):
+            with self.subTest(term=term):
+                response = self.client.get(reverse('customers:search'), {'q': term})
+                self.assertEqual([row['id'] for row in response.json()], [self.customer.pk])
+
+    def test_etag(self):
+        url = reverse('products:product_search')
+        first = self.client.get(url, {'q': 'iker'})
+        again = self.client.get(url, {'q': 'iker'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.iker.name = 'Iker flip-flops'
+        self.iker.save()
+        changed = self.client.get(url, {'q': 'iker'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+
+    def test_search_endpoint(self):
+        self.assertEqual(search('aslam'), [{'kind': 'customer', 'id': self.customer.pk, 'title': 'Aslam'}])
+        response = self.client.get(reverse('search:query'), {'q': 'iker', 'kind': 'product'})
+        self.assertEqual([row['id'] for row in response.json()], [self.iker.pk, self.hiker.pk])
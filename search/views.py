@@ -0,0 +1,15 @@
+from django.views.decorators.http import require_GET
+
+from earthshop.typeahead import etag_json_response, parse_limit
+from .services import KINDS, search
+
+
+@require_GET
+def query(request):
+    """
+    GET ?q=<text>[&kind=product&kind=customer&kind=invoice][&limit=<n>]
+    Returns [{kind, id, title}] from the full-text index.
+    """
+    term = (request.GET.get('q') or '').strip()
+    kinds = [kind for kind in request.GET.getlist('kind') if kind in KINDS] or None
+    return etag_json_response(request, search(term, kinds, parse_limit(request)) if term else [])